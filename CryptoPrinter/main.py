@@ -1,223 +1,204 @@
+import asyncio
 import logging
+import os
 import ccxt
-import time
 from openai import OpenAI
-import re
-from datetime import datetime
 
 from src.utils.config import Config
 from src.utils.logger import setup_logger
+from src.utils.metrics import metrics
 from src.trading.mock_portfolio import MockPortfolio
 from src.trading.technical_analysis import TechnicalAnalysis
+from src.trading.indicator_engine import PARITY_LOOKBACK
 from src.trading.trade_executor import TradeExecutor
+from src.trading.execution_pipeline import ExecutionPipeline, min_order_amounts_from_markets
 from src.data.market_data import MarketData
+from src.data.candle_store import CandleStore
+from src.data.candle_archive import CandleArchive
+from src.data.market_feed import MarketFeed
+from src.data.request_scheduler import RequestScheduler, ScheduledExchange
+from src.data.cycle_store import CycleStore
+from src.data.universe import Universe
 from src.ai.advisor import TradingAdvisor
+from src.ai.decision_gate import DecisionGate, ResponseCache
+from src.ai.signal_screener import SignalScreener
+from src.ai.prompt_serializer import tick_sizes_from_markets
 from src.trading.live_portfolio import LivePortfolio
+from src.trading.scheduler import MarketScheduler, TradingScheduler, run_strategies
+from src.trading.strategy import Strategy, load_strategy_specs
 
-def parse_and_execute_response(response, trade_executor, ai_logger):
-    lines = response.split('\n')
-    commands_executed = 0
-    success = False
-    summary = ""
-
-    # Process all lines except the last few (which should be the summary)
-    command_lines = []
-    summary_lines = []
-    in_summary = False
-
-    for line in lines:
-        if not line.strip():
-            continue
-        
-        # Check if we've hit the summary section
-        if any(cmd in line.lower() for cmd in ["buy_crypto_price", "sell_crypto_price", "buy_crypto_limit", "sell_crypto_limit", "cancel_order", "do_nothing"]):
-            command_lines.append(line)
-        else:
-            summary_lines.append(line)
-
-    # Process commands
-    for line in command_lines:
-        match = re.match(r'.*?(buy_crypto_price|sell_crypto_price|buy_crypto_limit|sell_crypto_limit|cancel_order|do_nothing)\((.*)\)', line)
-        
-        if not match:
-            logging.error(f"Invalid response format in line: {line}")
-            continue
-
-        command = match.group(1)
-        args_str = match.group(2)
-        args = []
-        current_arg = ''
-        in_quotes = False
-        quote_char = None
-        
-        for char in args_str:
-            if char in ['"', "'"]:
-                if not in_quotes:
-                    in_quotes = True
-                    quote_char = char
-                elif char == quote_char:
-                    in_quotes = False
-                current_arg += char
-            elif char == ',' and not in_quotes:
-                args.append(current_arg.strip().strip('"\''))
-                current_arg = ''
-            else:
-                current_arg += char
-        
-        if current_arg:
-            args.append(current_arg.strip().strip('"\''))
-
-        command_map = {
-            "buy_crypto_price": trade_executor.execute_buy_market,
-            "buy_crypto_limit": trade_executor.execute_buy_limit,
-            "sell_crypto_price": trade_executor.execute_sell_market,
-            "sell_crypto_limit": trade_executor.execute_sell_limit,
-            "cancel_order": trade_executor.cancel_order,
-            "do_nothing": lambda: None
-        }
-
-        function_to_execute = command_map.get(command)
-        if function_to_execute:
-            logging.info(f"Executing command {command} with args {args}")
-            try:
-                if function_to_execute(*args):
-                    commands_executed += 1
-                    success = True
-            except Exception as e:
-                logging.error(f"Error executing command {command}: {e}")
-
-    # Log the AI's summary
-    if summary_lines:
-        summary = ' '.join(summary_lines)
-        ai_logger.info("=== AI Trading Summary ===")
-        ai_logger.info(summary)
-        ai_logger.info("=" * 50)
-
-    logging.info(f"Executed {commands_executed} commands successfully")
-    return success, summary
+def create_strategy(spec, config, exchange, market_feed, markets, cache, cycle_store):
+    """Portfolio, executor, order pipeline and advisor for one strategy definition"""
+    name = spec['name']
+    mode = spec.get('mode', 'mock')
+    if mode == 'live':
+        logging.info(f"[{name}] Initializing LIVE trading mode")
+        portfolio = LivePortfolio(
+            exchange,
+            market_feed,
+            cache_ttl=config.PORTFOLIO_CACHE_TTL,
+            ledger_file=config.TRADE_LEDGER_FILE,
+            ledger_lookback_days=config.TRADE_LEDGER_LOOKBACK_DAYS
+        )
+    else:
+        logging.info(f"[{name}] Initializing MOCK trading mode")
+        portfolio = MockPortfolio(
+            initial_balance=spec.get('initial_balance', config.INITIAL_MOCK_BALANCE),
+            data_file=spec.get('data_file', os.path.join(config.BASE_DIR, 'data', f'mock_portfolio_{name}.json')),
+            fee_rate=config.MOCK_FEE_RATE,
+            trade_history_limit=config.MOCK_TRADE_HISTORY_LIMIT
+        )
+    trade_executor = TradeExecutor(portfolio, exchange, market_feed)
+    pipeline = ExecutionPipeline(
+        trade_executor,
+        max_workers=config.TICKER_CONCURRENCY,
+        max_trades_per_hour=config.MAX_TRADES_PER_HOUR,
+        min_order_usd=config.MIN_ORDER_USD,
+        min_order_amounts=min_order_amounts_from_markets(markets),
+        fee_rate=config.MOCK_FEE_RATE if mode == 'mock' else 0.0
+    )
+    gate = None
+    if config.LLM_GATE_ENABLED:
+        gate = DecisionGate(
+            max_distance=config.LLM_GATE_MAX_DISTANCE,
+            price_step_pct=config.LLM_GATE_PRICE_STEP_PCT,
+            indicator_step=config.LLM_GATE_INDICATOR_STEP,
+            max_skips=config.LLM_GATE_MAX_SKIPS
+        )
+    screener = None
+    if config.SCREENER_ENABLED:
+        screener = SignalScreener(
+            rsi_low=config.SCREENER_RSI_LOW,
+            rsi_high=config.SCREENER_RSI_HIGH,
+            macd_cross=config.SCREENER_MACD_CROSS,
+            bollinger=config.SCREENER_BOLLINGER,
+            vwap_deviation_pct=config.SCREENER_VWAP_DEVIATION_PCT
+        )
+    symbols = spec.get('symbols', config.SYMBOLS)  # None: the trading universe
+    advisor = TradingAdvisor(
+        OpenAI(),
+        gate=gate,
+        screener=screener,
+        cache=cache,
+        model=spec.get('model', 'gpt-4o'),
+        temperature=spec.get('temperature', 0.2),
+        tick_sizes=tick_sizes_from_markets(markets),
+        protocol=config.LLM_PROTOCOL,
+        symbols=symbols,
+        instructions=spec.get('instructions')
+    )
+    return Strategy(
+        name,
+        symbols,
+        portfolio,
+        trade_executor,
+        pipeline,
+        advisor,
+        config,
+        cycle_store=cycle_store,
+        trade_interval=spec.get('trade_interval')
+    )
 
 def main():
     # Initialize configuration and logging
     config = Config()
-    logger = setup_logger()
+    logger = setup_logger(config.LOG_LEVEL, config.PAYLOAD_ARCHIVE_DIR, config.PAYLOAD_ARCHIVE_DAYS)
+    
+    if config.METRICS_PORT:
+        metrics.serve(config.METRICS_PORT)
     
-    # Add a separate logger for AI interactions
-    ai_logger = logging.getLogger('ai_interactions')
-    ai_handler = logging.FileHandler('logs/ai_interactions.log')
-    ai_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-    ai_logger.addHandler(ai_handler)
-    ai_logger.setLevel(logging.DEBUG)
+    specs = load_strategy_specs(config)
     
     # Initialize exchange
-    exchange = ccxt.kraken({
-        'apiKey': config.KRAKEN_API_KEY,
-        'secret': config.KRAKEN_API_SECRET,
-    })
+    # Every REST call goes through one scheduler that tracks Kraken's rate counters
+    exchange = ScheduledExchange(
+        ccxt.kraken({
+            'apiKey': config.KRAKEN_API_KEY,
+            'secret': config.KRAKEN_API_SECRET,
+            'enableRateLimit': False,  # the RequestScheduler paces requests
+        }),
+        RequestScheduler(tier=config.KRAKEN_TIER)
+    )
     
-    # Initialize portfolio based on trading mode
-    if config.TRADING_MODE == 'live':
-        logger.info("Initializing LIVE trading mode")
-        portfolio = LivePortfolio(exchange)
-    else:
-        logger.info("Initializing MOCK trading mode")
-        portfolio = MockPortfolio(
-            initial_balance=config.INITIAL_MOCK_BALANCE,
-            data_file='data/mock_portfolio_data.json'
+    # Markets are cached on disk for a day; the tradable symbols are re-ranked from one bulk ticker request
+    universe = Universe(
+        exchange,
+        cache_file=config.MARKETS_CACHE_FILE,
+        markets_ttl=config.MARKETS_CACHE_TTL,
+        size=config.UNIVERSE_SIZE,
+        min_volume_usd=config.UNIVERSE_MIN_VOLUME_USD,
+        max_spread_pct=config.UNIVERSE_MAX_SPREAD_PCT,
+        refresh_interval=config.UNIVERSE_REFRESH_INTERVAL,
+        pinned=config.UNIVERSE_PINNED,
+        exclude=config.UNIVERSE_EXCLUDE,
+        retry_interval=config.ERROR_RETRY_DELAY
+    )
+    try:
+        markets = universe.markets()
+    except Exception as e:
+        logger.error(f"Could not load markets, prompt prices use significant digits and exchange minimums are unchecked: {e}")
+        markets = {}
+    
+    # Stream tickers, top of book and candles so most reads skip REST.
+    # The market scheduler subscribes it to the traded symbols as they change.
+    market_feed = None
+    if config.MARKET_FEED_ENABLED:
+        market_feed = MarketFeed(
+            exchange,
+            [],
+            url=config.KRAKEN_WS_URL,
+            max_age=config.TICKER_MAX_AGE,
+            ohlc_interval=exchange.parse_timeframe(config.CANDLE_TIMEFRAME) // 60
         )
-    technical_analyzer = TechnicalAnalysis(exchange)
-    market_data = MarketData(exchange)
-    trade_executor = TradeExecutor(portfolio, exchange)
-    advisor = TradingAdvisor(OpenAI())
     
-    logger.info("Trading bot initialized successfully.")
-
-    while True:
-        try:
-            start_time = time.time()
-            
-            # Log the start of a new trading cycle
-            logger.info("Starting new trading cycle")
-            
-            # Gather all necessary data
-            crypto_infos = market_data.get_crypto_infos(config.SYMBOLS)
-            logger.debug(f"Gathered crypto info: {crypto_infos}")
-            
-            technical_analysis = technical_analyzer.get_all_indicators(config.SYMBOLS)
-            logger.debug(f"Technical analysis results: {technical_analysis}")
-            
-            # Get portfolio status
-            portfolio_data = {
-                'balance': float(portfolio.get_balance()),
-                'positions': portfolio.get_positions(),
-                'open_orders': portfolio.get_open_orders(),
-                'trade_history': portfolio.get_trade_history(),
-                'total_value': float(portfolio.get_total_portfolio_value())
-            }
-            logger.debug(f"Current portfolio status: {portfolio_data}")
-            
-            # Log AI input data
-            ai_logger.info("=== New AI Consultation ===")
-            ai_logger.info(f"Input - Crypto Info: {crypto_infos}")
-            ai_logger.info("=== Portfolio Status ===")
-            ai_logger.info(f"Cash Balance: ${portfolio_data['balance']:.2f}")
-            ai_logger.info(f"Total Portfolio Value: ${portfolio_data['total_value']:.2f}")
-            ai_logger.info("Positions:")
-            for position in portfolio_data['positions']:
-                ai_logger.info(f"  {position['symbol']}: {position['quantity']:.8f} (${float(position['dollar_amount']):.2f})")
-            ai_logger.info("Open Orders:")
-            for order in portfolio_data['open_orders']:
-                ai_logger.info(f"  {order['side'].upper()} {order['type']} - {order['quantity']} {order['id']} @ ${float(order['price']):.2f}")
-            ai_logger.info(f"Input - Technical Analysis: {technical_analysis}")
-            
-            # Get AI advice
-            advice = advisor.get_advice(crypto_infos, portfolio_data, technical_analysis)
-            
-            # Log AI response and execution
-            ai_logger.info(f"=== AI Response ===")
-            ai_logger.info(f"Full Response:\n{advice}")
-            
-            if advice:
-                # Split advice into individual commands
-                ai_logger.info(f"=== AI Response ===")
-                ai_logger.info(f"Full Response:\n{advice}")
-                
-                success, ai_summary = parse_and_execute_response(advice, trade_executor, ai_logger)
-                ai_logger.info(f"Execution success: {success}")
-                ai_logger.info(f"AI Summary: {ai_summary}")
-                
-                # Log updated portfolio status after all commands
-                updated_portfolio = {
-                    'balance': float(portfolio.get_balance()),
-                    'positions': portfolio.get_positions(),
-                    'open_orders': portfolio.get_open_orders()
-                }
-                ai_logger.info("=== Portfolio After Execution ===")
-                ai_logger.info(f"Cash Balance: ${updated_portfolio['balance']:.2f}")
-                ai_logger.info("Positions:")
-                for position in updated_portfolio['positions']:
-                    ai_logger.info(f"  {position['symbol']}: {position['quantity']:.8f} (${float(position['dollar_amount']):.2f})")
-                ai_logger.info("Open Orders:")
-                for order in updated_portfolio['open_orders']:
-                    ai_logger.info(f"  {order['side'].upper()} {order['type']} - {order['quantity']} {order['id']} @ ${float(order['price']):.2f}")
-            
-            # Calculate and log wait time
-            elapsed_time = time.time() - start_time
-            wait_time = max(0, config.TRADE_INTERVAL - elapsed_time)
-            logger.info(f"Cycle completed in {elapsed_time:.2f}s. Waiting {wait_time:.2f}s until next cycle")
-            
-            # Log cycle summary
-            ai_logger.info(f"=== Cycle Summary ===")
-            ai_logger.info(f"Cycle duration: {elapsed_time:.2f}s")
-            ai_logger.info(f"Total Portfolio Value after cycle: ${portfolio_data['total_value']:.2f}")
-            ai_logger.info("=" * 50 + "\n")
-            
-            time.sleep(wait_time)
-            
-        except Exception as e:
-            error_msg = f"Error in main loop: {str(e)}"
-            logger.error(error_msg)
-            ai_logger.error(error_msg)
-            time.sleep(60)
+    if config.INDICATOR_ENGINE == 'streaming' and config.CANDLE_LOOKBACK < PARITY_LOOKBACK:
+        logging.warning(
+            f"CANDLE_LOOKBACK={config.CANDLE_LOOKBACK} is below {PARITY_LOOKBACK}: streaming EMA, MACD and RSI "
+            f"will differ from the ta engine once the window starts sliding"
+        )
+    candle_store = CandleStore(
+        exchange,
+        timeframe=config.CANDLE_TIMEFRAME,
+        lookback=config.CANDLE_LOOKBACK,
+        cache_file=config.CANDLE_CACHE_FILE
+    )
+    technical_analyzer = TechnicalAnalysis(exchange, candle_store, engine=config.INDICATOR_ENGINE)
+    market_data = MarketData(
+        exchange,
+        market_feed=market_feed,
+        candle_archive=CandleArchive(exchange, config.CANDLE_ARCHIVE_DIR, timeframe=config.CANDLE_TIMEFRAME)
+    )
+    if market_feed:
+        market_feed.on_candle.append(candle_store.apply_candle)
+        market_feed.start()
+    
+    # One response cache and cycle store for every strategy
+    cache = ResponseCache(
+        max_entries=config.LLM_CACHE_SIZE,
+        cache_file=config.LLM_CACHE_FILE,
+        save_interval=config.LLM_CACHE_SAVE_INTERVAL
+    )
+    cycle_store = CycleStore(config.CYCLE_DB_FILE, batch_size=config.CYCLE_DB_BATCH)
+    strategies = [
+        create_strategy(spec, config, exchange, market_feed, markets, cache, cycle_store)
+        for spec in specs
+    ]
+    
+    logger.info(f"Trading bot initialized successfully with {len(strategies)} strategies: {[s.name for s in strategies]}")
+    
+    # Data collection and indicators run once for everyone; each strategy refreshes its
+    # portfolio, consults and executes on its own cadence, so LLM calls run concurrently.
+    # Price moves and fills trigger early consultations.
+    # Only rank the universe if some strategy trades it
+    if all(strategy.symbols for strategy in strategies):
+        universe = None
+    market = MarketScheduler(config, market_data, technical_analyzer, universe, market_feed)
+    schedulers = [TradingScheduler(config, market, strategy) for strategy in strategies]
+    try:
+        asyncio.run(run_strategies(market, schedulers))
+    finally:
+        cache.save()
+        cycle_store.close()
 
 if __name__ == "__main__":
     main()
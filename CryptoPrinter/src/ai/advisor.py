@@ -1,16 +1,43 @@
 from datetime import datetime
+import hashlib
+import json
 import logging
+import time
+
+from src.ai.decision_gate import DecisionGate, ResponseCache
+from src.ai.prompt_serializer import serialize_data_prompt, count_tokens
+from src.trading.command_parser import TOOLS
+from src.utils.metrics import metrics
+
+DO_NOTHING_LINE = '{"name":"do_nothing","arguments":{}}'
 
 class TradingAdvisor:
-    def __init__(self, client):
+    def __init__(self, client, clock=None, gate=None, cache=None, model="gpt-4o", temperature=0.2, tick_sizes=None,
+                 protocol='text', symbols=None, instructions=None, screener=None):
         self.client = client
+        self.clock = clock or datetime.now
+        self.screener = screener  # SignalScreener: only flagged and held symbols reach the prompt
+        self.gate = gate  # DecisionGate: skip consultations when inputs haven't moved
+        self.cache = cache  # ResponseCache: static prompt + quantized inputs -> response
+        # Quantizes the inputs for the cache key, with the gate's buckets when there is one
+        self.fingerprinter = gate or DecisionGate()
+        self.model = model
+        self.temperature = temperature
+        self.tick_sizes = tick_sizes or {}  # {symbol: price tick size} for prompt precision
+        # tiktoken is optional and the chat format adds tokens per message; the API's usage is exact
+        self.last_prompt_tokens_estimate = None
+        self.last_prompt_hash = None  # hash of the last prompt built, for the cycle store
+        # 'text': commands as text lines; 'tools': OpenAI tool calls, turned into JSON command lines
+        self.protocol = protocol
+        self.symbols = symbols  # symbols this advisor trades; None: whatever is in the market table
+        self.instructions = instructions  # strategy-specific guidance appended to the base prompt
         self.setup_prompt()
 
     def setup_prompt(self):
         self.base_prompt = """
 You are an advanced trading AI designed to maximize profits while minimizing risks in cryptocurrency trading. 
 
-Your mission is to achieve the highest possible return over one week, trading the following cryptocurrencies: BTC, ETH, XRP, SOL, DOGE, ADA, AVAX, LINK, SHIB, XLM, and XTZ. 
+Your mission is to achieve the highest possible return over one week, trading the following cryptocurrencies: {symbols}. 
 You have access to real-time market data and technical indicators.
 
 CURRENT PORTFOLIO STATUS:
@@ -39,32 +66,68 @@ EXAMPLES:
 - If you hold 40 XTZ, you cannot sell 50 XTZ.
 - If you have $100 cash, you cannot buy $150 worth of BTC.
 """
+        if self.instructions:
+            # Escaped so braces in the instructions survive the format() in _prepare
+            self.base_prompt += "\nSTRATEGY:\n" + self.instructions.replace('{', '{{').replace('}', '}}') + "\n"
 
         self.user_prompt = """
 What actions should we take to maximize profit over the next week based on the provided information?
 
-You can respond with MULTIPLE COMMANDS, one per line. Valid commands are:
-buy_crypto_price("symbol", units, "single summary string")
-buy_crypto_limit("symbol", units, "single summary string", limit)
-sell_crypto_price("symbol", units, "single summary string")
-sell_crypto_limit("symbol", units, "single summary string", limit)
+You can respond with MULTIPLE COMMANDS, one per line. Amounts are in USD. Valid commands are:
+buy_crypto_price("symbol", usd_amount, "single summary string")
+buy_crypto_limit("symbol", usd_amount, "single summary string", limit)
+sell_crypto_price("symbol", usd_amount, "single summary string")
+sell_crypto_limit("symbol", usd_amount, "single summary string", limit)
 cancel_order(orderId)
 do_nothing()
 
 Example of multiple commands:
-buy_crypto_price("BTC", 0.0003, "Strong bullish momentum")
-sell_crypto_limit("ETH", 1.2, "Taking profits at resistance", 2250)
+buy_crypto_price("BTC", 25, "Strong bullish momentum")
+sell_crypto_limit("ETH", 2700, "Taking profits at resistance", 2250)
 cancel_order(123)
 
-So in this case, we're buying 0.0003 BTC at the current price, and selling 1.2 ETH at 2250.
+So in this case, we're buying $25 of BTC at the current price, and selling $2700 of ETH (1.2 ETH) at 2250.
 
 IMPORTANT: Each command must be on a new line and include a summary string in quotes for trades.
 
 Finally, on the last line, respond with a five sentence summary of the actions you're taking and the reasoning behind them.
 """
 
-    def get_advice(self, market_data, portfolio_data, technical_analysis):
-        current_time = datetime.now().isoformat()
+        self.tools_user_prompt = """
+What actions should we take to maximize profit over the next week based on the provided information?
+
+Call one function per action (amounts are in USD), or do_nothing if no action is warranted.
+Finally, call summary with a five sentence summary of the actions you're taking and the reasoning behind them.
+"""
+
+    def _prepare(self, market_data, portfolio_data, technical_analysis):
+        """
+        Build the request for this consultation. Returns (response, request): response
+        is set when the screener, the gate or the cache already answers it, otherwise request holds
+        what is needed to call the model and remember the answer.
+        """
+        current_time = self.clock().isoformat()
+        self.last_prompt_hash = None
+
+        signals = None
+        if self.screener:
+            signals = self.screener.screen(technical_analysis)
+            if not signals:
+                metrics.count('llm_consultations', outcome='screened')
+                return "do_nothing()\nNo symbol flagged by the signal screener; holding.", None
+            # Held symbols stay in so the model can still manage those positions
+            keep = set(signals) | {position['symbol'] for position in portfolio_data['positions']}
+            market_data = {symbol: info for symbol, info in market_data.items() if symbol in keep}
+            technical_analysis = {symbol: indicators for symbol, indicators in technical_analysis.items() if symbol in keep}
+
+        fingerprint = None
+        if self.gate or self.cache:
+            fingerprint = self.fingerprinter.fingerprint(market_data, portfolio_data, technical_analysis)
+        if self.gate:
+            gated_response = self.gate.check(fingerprint)
+            if gated_response:
+                metrics.count('llm_consultations', outcome='gated')
+                return gated_response, None
         
         # Initialize strings and ensure total_value exists
         holdings_str = ""
@@ -72,15 +135,12 @@ Finally, on the last line, respond with a five sentence summary of the actions y
         total_value = portfolio_data.get('total_value', 0.0)
         
         # Log the input data
-        logging.info("=== AI Trading Analysis Start ===")
-        logging.info(f"Time: {current_time}")
-        logging.info(f"Portfolio Balance: ${portfolio_data['balance']:.2f}")
-        logging.info("Current Positions:")
+        logging.info("AI trading analysis at %s, balance $%.2f, %d positions",
+                     current_time, portfolio_data['balance'], len(portfolio_data['positions']))
         
         # Build the holdings string
         for position in portfolio_data['positions']:
             holdings_str += f"- {position['symbol']}: {position['quantity']:.8f} (${float(position['dollar_amount']):.2f})\n"
-            logging.info(f"  {position['symbol']}: {position['quantity']:.8f} units")
             
         # Format trade history (last 10 trades)
         if 'trade_history' in portfolio_data and portfolio_data['trade_history']:
@@ -97,36 +157,176 @@ Finally, on the last line, respond with a five sentence summary of the actions y
 
         # Construct the full prompt with current data
         full_prompt = self.base_prompt.format(
+            symbols=', '.join(self.symbols) if self.symbols else ', '.join(sorted(market_data)),
             current_time=current_time,
             balance=portfolio_data['balance'],
             total_value=total_value,
             holdings=holdings_str,
             trade_history=trade_history_str
         )
-        data_prompt = f"""
-Current Market Data: {market_data}
-Technical Analysis: {technical_analysis}
-Portfolio Status: {portfolio_data}
-"""
+        data_prompt = serialize_data_prompt(market_data, technical_analysis, portfolio_data, self.tick_sizes, signals)
+
+        messages = [
+            {"role": "system", "content": full_prompt + data_prompt},
+            {"role": "user", "content": self.tools_user_prompt if self.protocol == 'tools' else self.user_prompt}
+        ]
+        self.last_prompt_tokens_estimate = sum(count_tokens(message["content"], self.model) for message in messages)
+        logging.info("Prompt tokens (estimate): %d", self.last_prompt_tokens_estimate)
+        self.last_prompt_hash = hashlib.sha256(json.dumps(messages, sort_keys=True).encode()).hexdigest()
+        cache_key = None
+        if self.cache:
+            # The static prompt parts and the quantized inputs; the timestamp in the
+            # prompt changes every cycle and would never hit
+            prompts = [self.base_prompt, messages[1]['content'], self.protocol, sorted(signals or [])]
+            cache_key = ResponseCache.key(self.model, self.temperature, prompts, fingerprint)
+        cached_response = self.cache.get(cache_key) if self.cache else None
+        if cached_response:
+            logging.info("AI decision served from cache")
+            if self.gate:
+                self.gate.record(fingerprint, cached_response)
+            metrics.count('llm_consultations', outcome='cached')
+            return cached_response, None
+        metrics.count('llm_consultations', outcome='requested')
+        metrics.count('llm_tokens', self.last_prompt_tokens_estimate, kind='prompt_estimate')
+        return None, (messages, cache_key, fingerprint)
+
+    def _remember(self, request, ai_response):
+        _, cache_key, fingerprint = request
+        logging.debug("AI decision:\n%s", ai_response)
 
+        if self.cache:
+            self.cache.put(cache_key, ai_response)
+        if self.gate:
+            self.gate.record(fingerprint, ai_response)
+
+    def _tool_options(self):
+        return {'tools': TOOLS, 'tool_choice': 'auto'} if self.protocol == 'tools' else {}
+
+    def _tool_line(self, name, arguments):
+        """One response line for a tool call: a JSON command, or the summary text"""
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": full_prompt + data_prompt},
-                    {"role": "user", "content": self.user_prompt}
-                ],
-                temperature=0.2,
-            )
-            
-            ai_response = response.choices[0].message.content
-            
-            # Log the AI's response
-            logging.info("=== AI Decision ===")
-            logging.info(f"Full Response:\n{ai_response}")
-            logging.info("==================\n")
+            parsed = json.loads(arguments or '{}')
+        except json.JSONDecodeError:
+            parsed = None
+        if name == 'summary' and isinstance(parsed, dict):
+            return str(parsed.get('summary', '')).replace('\n', ' ')
+        if parsed is None:
+            # Leave it for the decoder to reject and log
+            return json.dumps({'name': name, 'arguments': arguments})
+        return json.dumps({'name': name, 'arguments': parsed}, separators=(',', ':'))
+
+    def _summary_lines(self, content, calls):
+        return [text for text in [content] + [self._tool_line(*call) for call in calls if call[0] == 'summary'] if text]
+
+    def _tool_response(self, content, calls):
+        """Tool calls as JSON command lines, followed by any summary"""
+        commands = [self._tool_line(*call) for call in calls if call[0] != 'summary']
+        return '\n'.join((commands or [DO_NOTHING_LINE]) + self._summary_lines(content, calls))
+
+    def get_advice(self, market_data, portfolio_data, technical_analysis):
+        response, request = self._prepare(market_data, portfolio_data, technical_analysis)
+        if request is None:
+            return response
+
+        try:
+            with metrics.span('llm_request', model=self.model):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=request[0],
+                    temperature=self.temperature,
+                    **self._tool_options()
+                )
+            usage = getattr(response, 'usage', None)  # not every compatible backend reports it
+            if usage:
+                metrics.count('llm_tokens', usage.prompt_tokens, kind='prompt')
+                metrics.count('llm_tokens', usage.completion_tokens, kind='completion')
             
+            message = response.choices[0].message
+            if self.protocol == 'tools':
+                ai_response = self._tool_response(message.content, [
+                    (call.function.name, call.function.arguments) for call in message.tool_calls or []
+                ])
+            else:
+                ai_response = message.content
+            self._remember(request, ai_response)
             return ai_response
         except Exception as e:
             logging.error(f"Error getting AI advice: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def stream_advice(self, market_data, portfolio_data, technical_analysis):
+        """
+        Same as get_advice, but yields the response text as the model generates it so
+        commands can be acted on before the summary is finished. Gated and cached
+        answers are yielded in one piece.
+        """
+        response, request = self._prepare(market_data, portfolio_data, technical_analysis)
+        if request is None:
+            if response:
+                yield response
+            return
+
+        parts = []
+        start_time = time.perf_counter()
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=request[0],
+                temperature=self.temperature,
+                stream=True,
+                **self._tool_options()
+            )
+            if self.protocol == 'tools':
+                deltas = self._stream_tool_lines(stream)
+            else:
+                deltas = (
+                    chunk.choices[0].delta.content
+                    for chunk in stream if chunk.choices and chunk.choices[0].delta.content
+                )
+            for delta in deltas:
+                if not parts:
+                    metrics.observe('llm_first_line', time.perf_counter() - start_time, model=self.model)
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            # Commands already yielded may have been executed; don't cache a partial answer
+            logging.error(f"Error streaming AI advice: {e}")
+            metrics.count('llm_stream_errors', model=self.model, error=type(e).__name__)
+            return
+        # Includes the time spent executing the commands yielded along the way
+        metrics.observe('llm_stream', time.perf_counter() - start_time, model=self.model)
+        self._remember(request, ''.join(parts))
+
+    def _stream_tool_lines(self, stream):
+        """
+        Assemble streamed tool-call fragments and yield each call as a complete line
+        as soon as the next one starts. Summary text is held until the end.
+        """
+        calls = {}  # index -> [name, arguments]
+        current = None
+        content = []
+        command_count = 0
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                content.append(delta.content)
+            for call in delta.tool_calls or []:
+                if call.index != current:
+                    if current is not None and calls[current][0] != 'summary':
+                        command_count += 1
+                        yield self._tool_line(*calls[current]) + '\n'
+                    current = call.index
+                    calls[current] = ['', '']
+                if call.function and call.function.name:
+                    calls[current][0] += call.function.name
+                if call.function and call.function.arguments:
+                    calls[current][1] += call.function.arguments
+        if current is not None and calls[current][0] != 'summary':
+            command_count += 1
+            yield self._tool_line(*calls[current]) + '\n'
+
+        closing = ([] if command_count else [DO_NOTHING_LINE]) + self._summary_lines(''.join(content), list(calls.values()))
+        if closing:
+            yield '\n'.join(closing)
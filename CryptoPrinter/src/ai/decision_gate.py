@@ -0,0 +1,201 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+def _bucket(value, step):
+    """Index of the `step`-wide bucket holding value, or None when there is no value"""
+    if value is None:
+        return None
+    value = float(value)
+    if math.isnan(value):
+        return None
+    return math.floor(value / step)
+
+
+class DecisionGate:
+    """
+    Skips LLM consultations when nothing material has changed since the last one.
+
+    Inputs are quantized into a fingerprint: prices in `price_step_pct` log buckets,
+    oscillators (RSI, stochastic, Bollinger position) in `indicator_step` point buckets,
+    the sign of each MACD histogram and position weights in `weight_step_pct` buckets.
+    Which symbols are held and which orders are open must match exactly. Two
+    fingerprints are within reach when no bucket moved by more than `max_distance`.
+    After `max_skips` consecutive skips the next consultation always goes through.
+    """
+
+    def __init__(self, max_distance=0, price_step_pct=0.5, indicator_step=5, weight_step_pct=5, max_skips=3):
+        self.max_distance = max_distance
+        self.price_step = math.log(1 + price_step_pct / 100)
+        self.indicator_step = indicator_step
+        self.weight_step = weight_step_pct / 100
+        self.max_skips = max_skips
+
+        self.last_fingerprint = None
+        self.last_response = None
+        self.skips = 0
+
+    def fingerprint(self, market_data, portfolio_data, technical_analysis):
+        features = {}
+        for symbol, info in market_data.items():
+            if info.get('bid_price') and info.get('ask_price'):
+                features[f'{symbol}.price'] = _bucket(math.log((info['bid_price'] + info['ask_price']) / 2), self.price_step)
+
+        for symbol, indicators in technical_analysis.items():
+            if not indicators:
+                continue
+            momentum = indicators['momentum']
+            bands = indicators['volatility']['bollinger_bands']
+            histogram = indicators['trend']['macd']['histogram']
+            features[f'{symbol}.rsi'] = _bucket(momentum['rsi'], self.indicator_step)
+            features[f'{symbol}.stoch'] = _bucket(momentum['stochastic']['k'], self.indicator_step)
+            features[f'{symbol}.macd'] = None if histogram is None or math.isnan(histogram) else int(histogram > 0) - int(histogram < 0)
+            width = bands['high'] - bands['low']
+            if width and not math.isnan(width):
+                position = (indicators['price']['current'] - bands['low']) / width * 100
+                features[f'{symbol}.bb'] = _bucket(position, self.indicator_step)
+
+        total_value = portfolio_data.get('total_value') or 0
+        if total_value:
+            features['cash'] = _bucket(portfolio_data['balance'] / total_value, self.weight_step)
+            for position in portfolio_data['positions']:
+                features[f"{position['symbol']}.weight"] = _bucket(position['dollar_amount'] / total_value, self.weight_step)
+
+        state = (
+            tuple(sorted(position['symbol'] for position in portfolio_data['positions'])),
+            tuple(sorted(str(order['id']) for order in portfolio_data.get('open_orders', []))),
+        )
+        return state, features
+
+    def distance(self, previous, current):
+        """Largest bucket move between two fingerprints; infinite when their structure differs"""
+        (previous_state, previous_features), (state, features) = previous, current
+        if previous_state != state or previous_features.keys() != features.keys():
+            return math.inf
+        distance = 0
+        for name, value in features.items():
+            if (value is None) != (previous_features[name] is None):
+                return math.inf
+            if value is not None:
+                distance = max(distance, abs(value - previous_features[name]))
+        return distance
+
+    def check(self, fingerprint):
+        """
+        Response to use instead of consulting, or None to consult. A previous
+        do_nothing() response is reused as is; one that traded is not replayed, as
+        that would place the same orders again.
+        """
+        if self.last_fingerprint is None or self.skips >= self.max_skips:
+            return None
+        distance = self.distance(self.last_fingerprint, fingerprint)
+        if distance > self.max_distance:
+            return None
+
+        self.skips += 1
+        logging.info(f"Skipping consultation: inputs within {distance} buckets of the last one ({self.skips}/{self.max_skips})")
+        if self.last_response and 'do_nothing' in self.last_response and not any(
+            command in self.last_response for command in ('buy_crypto', 'sell_crypto', 'cancel_order')
+        ):
+            return self.last_response
+        return "do_nothing()\nMarket and portfolio unchanged since the last consultation; holding."
+
+    def record(self, fingerprint, response):
+        self.last_fingerprint = fingerprint
+        self.last_response = response
+        self.skips = 0
+
+
+class ResponseCache:
+    """
+    Bounded LRU of request key -> LLM response. With a cache file it survives
+    restarts, so a replayed backtest gets the same answers without new API calls.
+    The file is rewritten at most every `save_interval` seconds and on save(), not
+    on every put. One cache can be shared by advisors consulting concurrently.
+    """
+
+    def __init__(self, max_entries=256, cache_file=None, save_interval=300):
+        self.max_entries = max_entries
+        self.cache_file = cache_file
+        self.save_interval = save_interval
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False  # entries changed since the last save
+        self.saved_at = time.monotonic()
+        self.lock = threading.RLock()
+        self.save_lock = threading.Lock()
+
+        if cache_file and os.path.exists(cache_file):
+            self.load()
+
+    @staticmethod
+    def key(model, temperature, prompts, fingerprint):
+        """
+        Hash of the static prompt text and the quantized inputs (see
+        DecisionGate.fingerprint). The prompt's timestamp and exact prices stay out,
+        so a cycle whose inputs land in the same buckets hits.
+        """
+        payload = json.dumps(
+            {'model': model, 'temperature': temperature, 'prompts': prompts, 'fingerprint': fingerprint},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def load(self):
+        try:
+            with open(self.cache_file, 'r') as f:
+                for key, response in json.load(f):
+                    self.entries[key] = response
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        except Exception as e:
+            logging.error(f"Error loading response cache: {e}")
+
+    def save(self):
+        if not self.cache_file:
+            return
+        # Written outside self.lock so advisors sharing the cache aren't held up by the
+        # disk; save_lock keeps an older copy from landing after a newer one
+        with self.save_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                entries = list(self.entries.items())
+                self.dirty = False
+                self.saved_at = time.monotonic()
+            try:
+                tmp_file = f"{self.cache_file}.tmp"
+                with open(tmp_file, 'w') as f:
+                    json.dump(entries, f)
+                os.replace(tmp_file, self.cache_file)
+            except Exception as e:
+                logging.error(f"Error saving response cache: {e}")
+                with self.lock:
+                    self.dirty = True
+
+    def get(self, key):
+        with self.lock:
+            response = self.entries.get(key)
+            if response is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return response
+
+    def put(self, key, response):
+        with self.lock:
+            self.entries[key] = response
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.dirty = True
+            due = time.monotonic() - self.saved_at >= self.save_interval
+        if due:
+            self.save()
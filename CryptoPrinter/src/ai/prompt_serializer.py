@@ -0,0 +1,145 @@
+import math
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a character-based estimate
+    tiktoken = None
+
+SIGNIFICANT_DIGITS = 5  # price precision when an asset's tick size is unknown
+MARKET_COLUMNS = (
+    'sym', 'bid', 'ask', 'hi24', 'lo24', 'vol24', 'macd', 'sig', 'hist', 'sma20', 'ema20',
+    'rsi', 'k', 'd', 'bb_hi', 'bb_mid', 'bb_lo', 'vwap'
+)
+
+_encodings = {}
+
+
+def tick_sizes_from_markets(markets, quote='USD'):
+    """{base: price tick size} from ccxt load_markets() output (TICK_SIZE precision mode)"""
+    return {
+        market['base']: market['precision']['price']
+        for market in markets.values()
+        if market.get('quote') == quote and market.get('precision', {}).get('price')
+    }
+
+
+def price_decimals(price, tick_size=None):
+    if tick_size:
+        return max(0, round(-math.log10(tick_size)))
+    if not price:
+        return 2
+    return max(0, SIGNIFICANT_DIGITS - 1 - math.floor(math.log10(abs(price))))
+
+
+def _format(value, decimals):
+    if value is None:
+        return '-'
+    value = float(value)
+    if math.isnan(value):
+        return '-'
+    return f'{value:.{decimals}f}'
+
+
+def _format_volume(value):
+    if value is None or math.isnan(float(value)):
+        return '-'
+    for limit, suffix in ((1e9, 'B'), (1e6, 'M'), (1e3, 'K')):
+        if abs(value) >= limit:
+            return f'{value / limit:.1f}{suffix}'
+    return f'{value:.1f}'
+
+
+def serialize_market(market_data, technical_analysis, tick_sizes=None):
+    """
+    One pipe-separated row per symbol with prices at the asset's tick precision
+    and oscillators to one decimal. Symbols with no indicators get '-' there.
+    """
+    tick_sizes = tick_sizes or {}
+    rows = ['|'.join(MARKET_COLUMNS)]
+    for symbol in sorted(set(market_data) | set(technical_analysis)):
+        info = market_data.get(symbol, {})
+        indicators = technical_analysis.get(symbol) or {}
+        reference = info.get('bid_price') or indicators.get('price', {}).get('current')
+        decimals = price_decimals(reference, tick_sizes.get(symbol))
+
+        trend = indicators.get('trend', {})
+        macd = trend.get('macd', {})
+        momentum = indicators.get('momentum', {})
+        bands = indicators.get('volatility', {}).get('bollinger_bands', {})
+        # MACD values are small differences of prices; keep a few more digits than the price
+        macd_decimals = decimals + 2
+
+        rows.append('|'.join([
+            symbol,
+            _format(info.get('bid_price'), decimals),
+            _format(info.get('ask_price'), decimals),
+            _format(info.get('high_price'), decimals),
+            _format(info.get('low_price'), decimals),
+            _format_volume(info.get('volume')),
+            _format(macd.get('value'), macd_decimals),
+            _format(macd.get('signal'), macd_decimals),
+            _format(macd.get('histogram'), macd_decimals),
+            _format(trend.get('sma_20'), decimals),
+            _format(trend.get('ema_20'), decimals),
+            _format(momentum.get('rsi'), 1),
+            _format(momentum.get('stochastic', {}).get('k'), 1),
+            _format(momentum.get('stochastic', {}).get('d'), 1),
+            _format(bands.get('high'), decimals),
+            _format(bands.get('mid'), decimals),
+            _format(bands.get('low'), decimals),
+            _format(indicators.get('volume', {}).get('vwap'), decimals),
+        ]))
+    return '\n'.join(rows)
+
+
+def serialize_open_orders(open_orders, tick_sizes=None):
+    """Order sizes in USD, the unit the trading commands use"""
+    if not open_orders:
+        return 'none'
+    tick_sizes = tick_sizes or {}
+    rows = ['id|sym|side|type|usd|price']
+    for order in open_orders:
+        decimals = price_decimals(order.get('price'), tick_sizes.get(order['symbol']))
+        rows.append('|'.join([
+            str(order['id']),
+            order['symbol'],
+            order['side'],
+            order['type'],
+            _format(order['amount'], 2),
+            _format(order.get('price'), decimals),
+        ]))
+    return '\n'.join(rows)
+
+
+def serialize_signals(signals):
+    """One line per screened-in symbol with the rules it tripped"""
+    return '\n'.join(f"{symbol}: {'; '.join(reasons)}" for symbol, reasons in sorted(signals.items()))
+
+
+def serialize_data_prompt(market_data, technical_analysis, portfolio_data, tick_sizes=None, signals=None):
+    """
+    Market and indicator table plus open orders, and the screener's signals when
+    given. Balance, holdings and trade history are already in the base prompt, so
+    they are not repeated here.
+    """
+    prompt = (
+        "\nMARKET (24h ticker, indicators from the latest candles):\n"
+        f"{serialize_market(market_data, technical_analysis, tick_sizes)}\n"
+        "\nOPEN ORDERS:\n"
+        f"{serialize_open_orders(portfolio_data.get('open_orders'), tick_sizes)}\n"
+    )
+    if signals:
+        prompt += f"\nSIGNALS (why each symbol was screened in; held symbols without one are listed so you can manage them):\n{serialize_signals(signals)}\n"
+    return prompt
+
+
+def count_tokens(text, model='gpt-4o'):
+    """Token count with tiktoken when installed, otherwise about four characters per token"""
+    if tiktoken is None:
+        return math.ceil(len(text) / 4)
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding('o200k_base')
+    return len(_encodings[model].encode(text))
@@ -0,0 +1,82 @@
+import logging
+import math
+
+def _value(value):
+    """Float, or None when the indicator has no value yet"""
+    if value is None:
+        return None
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+class SignalScreener:
+    """
+    Deterministic pre-screen of the indicator output, so only symbols showing a
+    setup reach the LLM. A symbol is flagged when any enabled rule fires:
+    - RSI at or below `rsi_low` or at or above `rsi_high`
+    - MACD crossover: the histogram changed sign since the last screen
+    - price outside the Bollinger bands
+    - price more than `vwap_deviation_pct` percent away from VWAP
+    A threshold of None (or False for the MACD and Bollinger rules) disables the rule.
+    """
+
+    def __init__(self, rsi_low=30, rsi_high=70, macd_cross=True, bollinger=True, vwap_deviation_pct=2.0):
+        self.rsi_low = rsi_low
+        self.rsi_high = rsi_high
+        self.macd_cross = macd_cross
+        self.bollinger = bollinger
+        self.vwap_deviation_pct = vwap_deviation_pct
+
+        self.histogram_signs = {}  # {symbol: sign of the MACD histogram at the last screen}
+
+    def signals(self, symbol, indicators):
+        """Reasons `symbol` is flagged, empty when nothing fires"""
+        if not indicators:
+            return []
+        reasons = []
+        price = _value(indicators['price']['current'])
+
+        rsi = _value(indicators['momentum']['rsi'])
+        if rsi is not None:
+            if self.rsi_low is not None and rsi <= self.rsi_low:
+                reasons.append(f"RSI {rsi:.0f} oversold")
+            elif self.rsi_high is not None and rsi >= self.rsi_high:
+                reasons.append(f"RSI {rsi:.0f} overbought")
+
+        histogram = _value(indicators['trend']['macd']['histogram'])
+        if histogram is not None:
+            sign = int(histogram > 0) - int(histogram < 0)
+            previous = self.histogram_signs.get(symbol)
+            if sign:
+                # A histogram touching zero is not a side; +, 0, + is no crossover
+                self.histogram_signs[symbol] = sign
+            if self.macd_cross and previous is not None and sign and sign != previous:
+                reasons.append(f"MACD crossed {'above' if sign > 0 else 'below'} signal")
+
+        if price is None:
+            return reasons
+
+        bands = indicators['volatility']['bollinger_bands']
+        high, low = _value(bands['high']), _value(bands['low'])
+        if self.bollinger and high is not None and low is not None:
+            if price > high:
+                reasons.append("price above upper Bollinger band")
+            elif price < low:
+                reasons.append("price below lower Bollinger band")
+
+        vwap = _value(indicators['volume']['vwap'])
+        if self.vwap_deviation_pct is not None and vwap:
+            deviation_pct = (price - vwap) / vwap * 100
+            if abs(deviation_pct) >= self.vwap_deviation_pct:
+                reasons.append(f"price {deviation_pct:+.1f}% from VWAP")
+        return reasons
+
+    def screen(self, technical_analysis):
+        """{symbol: [reasons]} for every flagged symbol"""
+        flagged = {}
+        for symbol, indicators in technical_analysis.items():
+            reasons = self.signals(symbol, indicators)
+            if reasons:
+                flagged[symbol] = reasons
+        logging.info(f"Screener flagged {len(flagged)} of {len(technical_analysis)} symbols: {sorted(flagged)}")
+        return flagged
@@ -0,0 +1,195 @@
+import json
+import logging
+import math
+import sys
+import time
+
+import numpy as np
+
+from src.backtest.historical_exchange import HistoricalExchange, VirtualClock, historicals_to_arrays
+from src.data.candle_store import CandleStore
+from src.data.market_data import MarketData
+from src.trading.command_parser import parse_and_execute_response
+from src.trading.mock_portfolio import MockPortfolio
+from src.trading.technical_analysis import TechnicalAnalysis
+from src.trading.trade_executor import TradeExecutor
+from src.utils.config import Config
+
+class RsiAdvisor:
+    """
+    Deterministic stand-in for TradingAdvisor: buys oversold symbols with a slice
+    of the cash and sells overbought positions. Emits the same command text the
+    LLM does, so it exercises the real parser and executor.
+    """
+
+    def __init__(self, oversold=30, overbought=70, cash_fraction=0.1):
+        self.oversold = oversold
+        self.overbought = overbought
+        self.cash_fraction = cash_fraction
+
+    def get_advice(self, market_data, portfolio_data, technical_analysis):
+        # Positions worth less than a cent are rounding leftovers, not holdings
+        held = {
+            position['symbol']: position for position in portfolio_data['positions']
+            if position['dollar_amount'] >= 0.01
+        }
+        commands = []
+        for symbol, indicators in technical_analysis.items():
+            if not indicators or symbol not in market_data:
+                continue
+            rsi = indicators['momentum']['rsi']
+            if rsi < self.oversold and symbol not in held:
+                amount = portfolio_data['balance'] * self.cash_fraction
+                commands.append(f'buy_crypto_price("{symbol}", {amount:.2f}, "RSI {rsi:.1f} oversold")')
+            elif rsi > self.overbought and symbol in held:
+                # Round down so the sell never asks for more than is held
+                amount = math.floor(held[symbol]['quantity'] * market_data[symbol]['bid_price'] * 100) / 100
+                commands.append(f'sell_crypto_price("{symbol}", {amount:.2f}, "RSI {rsi:.1f} overbought")')
+        return '\n'.join(commands or ['do_nothing()'])
+
+
+class Backtester:
+    """
+    Replays stored candles through the live decision pipeline (MarketData,
+    TechnicalAnalysis, the advisor, parse_and_execute_response, TradeExecutor and
+    an in-memory MockPortfolio) on a virtual clock.
+
+    `history` is either MarketData.get_historical_data output or per-symbol column
+    arrays as produced by historicals_to_arrays. `lookback` and `indicator_engine`
+    default to the live defaults (CANDLE_LOOKBACK, INDICATOR_ENGINE) so a backtest
+    trades on the same indicator values the bot would.
+    """
+
+    def __init__(self, history, advisor, initial_balance=10000, fee_rate=0.0026, trade_interval=1800,
+                 lookback=720, indicator_engine='streaming', indicator_params=None, spread=0.0, max_position_pct=None):
+        first = next(iter(history.values()))
+        self.arrays = history if isinstance(first, dict) else historicals_to_arrays(history)
+        self.symbols = list(self.arrays)
+        self.advisor = advisor
+        self.initial_balance = initial_balance
+        self.fee_rate = fee_rate
+        self.trade_interval = trade_interval
+        self.lookback = lookback
+        self.indicator_engine = indicator_engine
+        self.indicator_params = indicator_params
+        self.spread = spread
+        self.max_position_pct = max_position_pct  # cap on any one position as % of equity
+
+        self.ai_logger = logging.getLogger('backtest')
+        self.ai_logger.propagate = False
+
+    def _portfolio_data(self, portfolio):
+        return {
+            'balance': float(portfolio.get_balance()),
+            'positions': portfolio.get_positions(),
+            'open_orders': portfolio.get_open_orders(),
+            'trade_history': portfolio.get_trade_history()[-20:],
+            'total_value': float(portfolio.get_total_portfolio_value())
+        }
+
+    def _cap_positions(self, portfolio, equity):
+        """Trim any position that grew beyond max_position_pct of equity"""
+        for position in portfolio.get_positions():
+            excess = position['dollar_amount'] - equity * self.max_position_pct / 100
+            if excess > 0:
+                price = portfolio.last_prices.get(position['symbol'])
+                if price:
+                    portfolio.create_market_sell_order(position['symbol'], excess, price)
+
+    def run(self, start=None, end=None):
+        timeline = np.unique(np.concatenate([columns['timestamp'] for columns in self.arrays.values()]))
+        clock = VirtualClock()
+        exchange = HistoricalExchange(self.arrays, clock, spread=self.spread)
+        timeframe_ms = exchange.timeframe_ms
+
+        # Leave room for the indicator lookback before the first decision
+        first_index = min(self.lookback, len(timeline) - 1)
+        timeline = timeline[first_index:]
+        if start is not None:
+            timeline = timeline[timeline >= start]
+        if end is not None:
+            timeline = timeline[timeline <= end]
+
+        portfolio = MockPortfolio(self.initial_balance, data_file=None, fee_rate=self.fee_rate, clock=clock.now)
+        market_data = MarketData(exchange)
+        technical_analyzer = TechnicalAnalysis(
+            exchange,
+            CandleStore(exchange, lookback=self.lookback),
+            engine=self.indicator_engine,
+            indicator_params=self.indicator_params
+        )
+        trade_executor = TradeExecutor(portfolio, exchange)
+
+        equity_curve = []
+        decisions = 0
+        next_decision = None
+        wall_start = time.time()
+
+        for candle_start in timeline:
+            candle_start = int(candle_start)
+            # The candle starting at candle_start has just closed
+            clock.now_ms = candle_start + timeframe_ms
+            for symbol in self.symbols:
+                candle = exchange.candle_at(symbol, candle_start)
+                if candle is not None:
+                    portfolio.process_candle(symbol, candle)
+
+            if next_decision is None or clock.now_ms >= next_decision:
+                next_decision = clock.now_ms + self.trade_interval * 1000
+                crypto_infos = market_data.get_crypto_infos(self.symbols)
+                technical_analysis = technical_analyzer.get_all_indicators(self.symbols)
+                portfolio_data = self._portfolio_data(portfolio)
+                advice = self.advisor.get_advice(crypto_infos, portfolio_data, technical_analysis)
+                if advice:
+                    parse_and_execute_response(advice, trade_executor, self.ai_logger)
+                if self.max_position_pct:
+                    self._cap_positions(portfolio, portfolio.get_total_portfolio_value())
+                decisions += 1
+
+            equity_curve.append((clock.now_ms, portfolio.get_total_portfolio_value()))
+
+        return self._results(portfolio, equity_curve, decisions, time.time() - wall_start)
+
+    def _results(self, portfolio, equity_curve, decisions, elapsed):
+        values = np.array([value for _, value in equity_curve]) if equity_curve else np.array([self.initial_balance])
+        running_peak = np.maximum.accumulate(values)
+        final_value = float(values[-1])
+        return {
+            'equity_curve': equity_curve,
+            'initial_value': self.initial_balance,
+            'final_value': final_value,
+            'pnl': final_value - self.initial_balance,  # fees are already deducted from cash and positions
+            'pnl_pct': (final_value / self.initial_balance - 1) * 100,
+            'total_fees': portfolio.total_fees,
+            'max_drawdown_pct': float(((running_peak - values) / running_peak).max() * 100),
+            'trades': len(portfolio.get_trade_history()),
+            'decisions': decisions,
+            'candles': len(equity_curve),
+            'elapsed_seconds': elapsed,
+        }
+
+
+def format_results(results):
+    return (
+        f"Replayed {results['candles']} candles ({results['decisions']} decisions) in {results['elapsed_seconds']:.2f}s\n"
+        f"Final value: ${results['final_value']:.2f} (PnL ${results['pnl']:.2f}, {results['pnl_pct']:+.2f}%)\n"
+        f"Fees paid: ${results['total_fees']:.2f} over {results['trades']} trades\n"
+        f"Max drawdown: {results['max_drawdown_pct']:.2f}%"
+    )
+
+
+if __name__ == '__main__':
+    # python -m src.backtest.backtester historicals.json
+    # where historicals.json holds MarketData.get_historical_data output
+    with open(sys.argv[1], 'r') as f:
+        history = json.load(f)
+    config = Config()
+    backtester = Backtester(
+        history,
+        RsiAdvisor(),
+        fee_rate=config.MOCK_FEE_RATE,
+        trade_interval=config.TRADE_INTERVAL,
+        lookback=config.CANDLE_LOOKBACK,
+        indicator_engine=config.INDICATOR_ENGINE
+    )
+    print(format_results(backtester.run()))
@@ -0,0 +1,140 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+DAY_MS = 24 * 60 * 60 * 1000
+
+class VirtualClock:
+    """Simulated time for a backtest, in exchange milliseconds"""
+
+    def __init__(self, start_ms=0):
+        self.now_ms = start_ms
+
+    def milliseconds(self):
+        return self.now_ms
+
+    def now(self):
+        return datetime.fromtimestamp(self.now_ms / 1000, tz=timezone.utc).replace(tzinfo=None)
+
+
+def historicals_to_arrays(historicals):
+    """
+    Convert MarketData.get_historical_data output ({symbol: [{'begins_at', 'open_price', ...}]})
+    into per-symbol column arrays: int64 millisecond timestamps and float64 OHLCV.
+    """
+    arrays = {}
+    for symbol, candles in historicals.items():
+        candles = sorted(candles, key=lambda candle: candle['begins_at'])
+        arrays[symbol] = {
+            'timestamp': np.array([
+                int(datetime.fromisoformat(candle['begins_at'].replace('Z', '+00:00')).timestamp() * 1000)
+                for candle in candles
+            ], dtype=np.int64),
+            'open': np.array([candle['open_price'] for candle in candles], dtype=np.float64),
+            'high': np.array([candle['high_price'] for candle in candles], dtype=np.float64),
+            'low': np.array([candle['low_price'] for candle in candles], dtype=np.float64),
+            'close': np.array([candle['close_price'] for candle in candles], dtype=np.float64),
+            'volume': np.array([candle['volume'] for candle in candles], dtype=np.float64),
+        }
+    return arrays
+
+
+def infer_timeframe_ms(arrays):
+    """Most common spacing between candles across all symbols"""
+    gaps = np.concatenate([np.diff(columns['timestamp']) for columns in arrays.values() if len(columns['timestamp']) > 1])
+    values, counts = np.unique(gaps, return_counts=True)
+    return int(values[np.argmax(counts)])
+
+
+class HistoricalExchange:
+    """
+    Read-only stand-in for the ccxt exchange that serves stored candles up to the
+    virtual clock. A candle becomes visible once it has closed; tickers are derived
+    from the latest visible candle. Timeframe arguments are ignored, the stored
+    candles are served as they are.
+    """
+
+    def __init__(self, arrays, clock, timeframe_ms=None, spread=0.0):
+        # Plain ndarray views: zero-copy over memory-mapped columns, without the
+        # per-element overhead of the np.memmap subclass
+        self.arrays = {
+            symbol: {name: np.asarray(columns[name]) for name in COLUMNS} for symbol, columns in arrays.items()
+        }
+        self.clock = clock
+        self.timeframe_ms = timeframe_ms or infer_timeframe_ms(arrays)
+        self.spread = spread  # fraction of price between bid and ask
+        self.has = {'fetchTickers': True}
+        # Running volume totals make the 24h volume an O(1) lookup
+        self.cumulative_volume = {
+            symbol: np.concatenate(([0.0], np.cumsum(columns['volume']))) for symbol, columns in arrays.items()
+        }
+
+    def milliseconds(self):
+        return self.clock.milliseconds()
+
+    def iso8601(self, timestamp):
+        return datetime.fromtimestamp(timestamp / 1000, tz=timezone.utc).isoformat().replace('+00:00', 'Z')
+
+    def parse_timeframe(self, timeframe):
+        return self.timeframe_ms // 1000
+
+    def _visible(self, symbol):
+        """Number of candles that have closed by the current virtual time"""
+        timestamps = self.arrays[symbol]['timestamp']
+        return int(np.searchsorted(timestamps, self.clock.milliseconds() - self.timeframe_ms, side='right'))
+
+    def fetch_ticker(self, pair):
+        symbol = pair.split('/')[0]
+        if symbol not in self.arrays:
+            raise Exception(f"No historical data for {pair}")
+        end = self._visible(symbol)
+        if end == 0:
+            raise Exception(f"No candles for {pair} before {self.iso8601(self.clock.milliseconds())}")
+
+        columns = self.arrays[symbol]
+        start = int(np.searchsorted(columns['timestamp'], columns['timestamp'][end - 1] - DAY_MS, side='right'))
+        close = float(columns['close'][end - 1])
+        return {
+            'symbol': pair,
+            'timestamp': int(columns['timestamp'][end - 1]) + self.timeframe_ms,
+            'last': close,
+            'bid': close * (1 - self.spread / 2),
+            'ask': close * (1 + self.spread / 2),
+            'open': float(columns['open'][start]),
+            'high': float(columns['high'][start:end].max()),
+            'low': float(columns['low'][start:end].min()),
+            'baseVolume': float(self.cumulative_volume[symbol][end] - self.cumulative_volume[symbol][start]),
+        }
+
+    def fetch_tickers(self, pairs):
+        tickers = {}
+        for pair in pairs:
+            try:
+                tickers[pair] = self.fetch_ticker(pair)
+            except Exception:
+                continue
+        return tickers
+
+    def fetch_ohlcv(self, pair, timeframe=None, since=None, limit=None):
+        symbol = pair.split('/')[0]
+        columns = self.arrays[symbol]
+        end = self._visible(symbol)
+        if since is not None:
+            start = int(np.searchsorted(columns['timestamp'][:end], since, side='left'))
+            if limit:
+                end = min(end, start + limit)
+        else:
+            start = max(0, end - limit) if limit else 0
+        rows = np.column_stack([columns[name][start:end] for name in COLUMNS]).tolist()
+        for row in rows:
+            row[0] = int(row[0])
+        return rows
+
+    def candle_at(self, symbol, timestamp):
+        """The [timestamp, open, high, low, close, volume] row starting at `timestamp`, if any"""
+        columns = self.arrays[symbol]
+        index = int(np.searchsorted(columns['timestamp'], timestamp))
+        if index < len(columns['timestamp']) and columns['timestamp'][index] == timestamp:
+            return [columns[name][index] for name in COLUMNS]
+        return None
@@ -0,0 +1,134 @@
+import inspect
+import itertools
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from src.backtest.backtester import Backtester, RsiAdvisor
+from src.backtest.historical_exchange import COLUMNS, historicals_to_arrays
+from src.trading.indicator_engine import IndicatorState
+
+BACKTEST_PARAMS = set(inspect.signature(Backtester.__init__).parameters) - {'self', 'history', 'advisor'}
+INDICATOR_PARAMS = set(inspect.signature(IndicatorState.__init__).parameters) - {'self'}
+RESULT_COLUMNS = ['final_value', 'pnl', 'pnl_pct', 'total_fees', 'max_drawdown_pct', 'trades', 'decisions', 'elapsed_seconds']
+
+# Candle columns opened by this worker process, set once by _init_worker
+_worker_arrays = None
+
+
+def write_arrays(arrays, directory):
+    """Write per-symbol column arrays as .npy files that workers can memory-map"""
+    for symbol, columns in arrays.items():
+        os.makedirs(os.path.join(directory, symbol), exist_ok=True)
+        for name in COLUMNS:
+            np.save(os.path.join(directory, symbol, f'{name}.npy'), np.ascontiguousarray(columns[name]))
+
+
+def open_arrays(directory):
+    """Open arrays written by write_arrays read-only; the OS page cache is shared by every process"""
+    return {
+        symbol: {name: np.load(os.path.join(directory, symbol, f'{name}.npy'), mmap_mode='r') for name in COLUMNS}
+        for symbol in sorted(os.listdir(directory))
+    }
+
+
+def expand_grid(param_grid):
+    """{'fee_rate': [0.001, 0.0026], 'trade_interval': [900]} -> one dict per combination"""
+    names = list(param_grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(param_grid[name] for name in names))]
+
+
+def advisor_params(advisor_factory):
+    """Keyword arguments `advisor_factory` takes; None when it takes any (**kwargs)"""
+    parameters = inspect.signature(advisor_factory).parameters.values()
+    if any(parameter.kind == parameter.VAR_KEYWORD for parameter in parameters):
+        return None
+    return {parameter.name for parameter in parameters}
+
+
+def split_config(config, advisor_factory=RsiAdvisor):
+    """
+    Route each swept parameter to the Backtester, the indicator windows or the
+    advisor. A name none of them takes (e.g. a typo) raises instead of being
+    passed along, so a sweep can't silently run every config the same way.
+    """
+    accepted = advisor_params(advisor_factory)
+    backtest_kwargs, indicator_params, advisor_kwargs = {}, {}, {}
+    for name, value in config.items():
+        if name in BACKTEST_PARAMS:
+            backtest_kwargs[name] = value
+        elif name in INDICATOR_PARAMS:
+            indicator_params[name] = value
+        elif accepted is None or name in accepted:
+            advisor_kwargs[name] = value
+        else:
+            raise Exception(
+                f"Unknown sweep parameter {name!r}: not a Backtester, IndicatorState or "
+                f"{getattr(advisor_factory, '__name__', 'advisor')} parameter"
+            )
+    if indicator_params:
+        backtest_kwargs['indicator_params'] = {**backtest_kwargs.get('indicator_params', {}), **indicator_params}
+    return backtest_kwargs, advisor_kwargs
+
+
+def _init_worker(directory):
+    global _worker_arrays
+    logging.disable(logging.CRITICAL)  # thousands of runs would otherwise flood stderr
+    _worker_arrays = open_arrays(directory)
+
+
+def _run_config(config, advisor_factory):
+    backtest_kwargs, advisor_kwargs = split_config(config, advisor_factory)
+    results = Backtester(_worker_arrays, advisor_factory(**advisor_kwargs), **backtest_kwargs).run()
+    return {name: results[name] for name in RESULT_COLUMNS}
+
+
+def run_sweep(history, param_grid, advisor_factory=RsiAdvisor, max_workers=None, rank_by='pnl_pct', data_dir=None):
+    """
+    Run one backtest per combination in `param_grid` across a process pool and return
+    the results as a DataFrame ranked by `rank_by`. Candles are written once to
+    memory-mapped .npy files (in `data_dir`, or a temporary directory) instead of
+    being pickled to every worker. `advisor_factory` must be picklable.
+    """
+    arrays = history
+    if not isinstance(next(iter(history.values())), dict):
+        arrays = historicals_to_arrays(history)
+    configs = expand_grid(param_grid)
+    for config in configs:
+        split_config(config, advisor_factory)  # fail before starting any worker
+
+    directory = data_dir or tempfile.mkdtemp(prefix='sweep_')
+    rows = []
+    try:
+        write_arrays(arrays, directory)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(directory,)) as executor:
+            futures = {executor.submit(_run_config, config, advisor_factory): config for config in configs}
+            for future in as_completed(futures):
+                config = futures[future]
+                try:
+                    rows.append({**config, **future.result()})
+                except Exception as e:
+                    logging.error(f"Backtest failed for {config}: {e}")
+    finally:
+        if data_dir is None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    table = pd.DataFrame(rows, columns=list(param_grid) + RESULT_COLUMNS)
+    return table.sort_values(rank_by, ascending=False, ignore_index=True)
+
+
+if __name__ == '__main__':
+    # python -m src.backtest.sweep historicals.json grid.json
+    # where grid.json maps parameter names to lists of values
+    with open(sys.argv[1], 'r') as f:
+        history = json.load(f)
+    with open(sys.argv[2], 'r') as f:
+        param_grid = json.load(f)
+    print(run_sweep(history, param_grid).to_string())
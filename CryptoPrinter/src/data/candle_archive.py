@@ -0,0 +1,144 @@
+import fcntl
+import logging
+import os
+from contextlib import contextmanager
+
+import numpy as np
+
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+DTYPES = {name: np.int64 if name == 'timestamp' else np.float64 for name in COLUMNS}
+ITEM_SIZE = 8  # every column is 8 bytes wide
+
+class CandleArchive:
+    """
+    On-disk history of closed candles, one fixed-width binary file per column under
+    <directory>/<timeframe>/<symbol>/. Files only ever grow, so readers get zero-copy
+    np.memmap views and time ranges are found by binary search on the timestamps.
+
+    Appends write the OHLCV columns first and the timestamp column last; the
+    timestamp file's length is the committed row count. Readers (backtests, sweeps,
+    other processes) only map that many rows of each column and never write, so a
+    read during an append sees the rows committed before it. Writers take an
+    exclusive lock on the symbol and truncate longer columns left by a crash
+    mid-append before adding rows.
+    """
+
+    def __init__(self, exchange, directory, timeframe='15m', page_size=1000):
+        self.exchange = exchange
+        self.directory = directory
+        self.timeframe = timeframe
+        self.page_size = page_size
+        self.views = {}  # {symbol: (row count, {column: memmap})}
+
+    def _path(self, symbol, column):
+        return os.path.join(self.directory, self.timeframe, symbol, f'{column}.bin')
+
+    def symbols(self):
+        root = os.path.join(self.directory, self.timeframe)
+        return sorted(os.listdir(root)) if os.path.isdir(root) else []
+
+    def count(self, symbol):
+        path = self._path(symbol, 'timestamp')
+        return os.path.getsize(path) // ITEM_SIZE if os.path.exists(path) else 0
+
+    @contextmanager
+    def _writing(self, symbol):
+        """Exclusive lock on a symbol's files, shared with writers in other processes"""
+        directory = os.path.dirname(self._path(symbol, 'timestamp'))
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _repair(self, symbol, rows):
+        """Cut columns back to the committed rows; only call while holding the write lock"""
+        for column in COLUMNS[1:]:
+            path = self._path(symbol, column)
+            if os.path.exists(path) and os.path.getsize(path) != rows * ITEM_SIZE:
+                logging.info(f"Truncating {path} to {rows} rows after an interrupted append")
+                with open(path, 'r+b') as f:
+                    f.truncate(rows * ITEM_SIZE)
+
+    def columns(self, symbol):
+        """Read-only memmap of every column for a symbol; empty arrays if nothing is archived"""
+        rows = self.count(symbol)
+        cached = self.views.get(symbol)
+        if cached and cached[0] == rows:
+            return cached[1]
+
+        if rows == 0:
+            views = {column: np.empty(0, dtype=DTYPES[column]) for column in COLUMNS}
+        else:
+            # Columns may run ahead of the timestamps while an append is in progress
+            views = {
+                column: np.memmap(self._path(symbol, column), dtype=DTYPES[column], mode='r', shape=(rows,))
+                for column in COLUMNS
+            }
+        self.views[symbol] = (rows, views)
+        return views
+
+    def last_timestamp(self, symbol):
+        timestamps = self.columns(symbol)['timestamp']
+        return int(timestamps[-1]) if len(timestamps) else None
+
+    def _committed_last_timestamp(self, symbol, rows):
+        if rows == 0:
+            return None
+        with open(self._path(symbol, 'timestamp'), 'rb') as f:
+            f.seek((rows - 1) * ITEM_SIZE)
+            return int(np.frombuffer(f.read(ITEM_SIZE), dtype=DTYPES['timestamp'])[0])
+
+    def append(self, symbol, ohlcv):
+        """Append candles newer than the last archived one; returns how many were written"""
+        if not ohlcv:
+            return 0
+        with self._writing(symbol):
+            # Re-read under the lock: another writer may have appended since our views were mapped
+            committed = self.count(symbol)
+            last = self._committed_last_timestamp(symbol, committed)
+            rows = [candle for candle in ohlcv if last is None or candle[0] > last]
+            if not rows:
+                return 0
+
+            data = np.array(rows, dtype=np.float64)
+            self._repair(symbol, committed)
+            for index, column in reversed(list(enumerate(COLUMNS))):
+                # Timestamp (index 0) goes last so it only ever covers complete rows
+                values = np.array([row[0] for row in rows], dtype=np.int64) if column == 'timestamp' else data[:, index]
+                with open(self._path(symbol, column), 'ab') as f:
+                    f.write(np.ascontiguousarray(values, dtype=DTYPES[column]).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            return len(rows)
+
+    def sync(self, symbol, since):
+        """Fetch closed candles after the last archived one (or from `since` for a new symbol)"""
+        timeframe_ms = self.exchange.parse_timeframe(self.timeframe) * 1000
+        last = self.last_timestamp(symbol)
+        start = since if last is None else max(since, last + timeframe_ms)
+        written = 0
+        while True:
+            ohlcv = self.exchange.fetch_ohlcv(f'{symbol}/USD', self.timeframe, since=start, limit=self.page_size)
+            # The newest candle is still forming; only archive candles that have closed
+            now = self.exchange.milliseconds()
+            closed = [candle for candle in ohlcv if candle[0] + timeframe_ms <= now]
+            appended = self.append(symbol, closed)
+            written += appended
+            if appended == 0 or len(ohlcv) < self.page_size:
+                return written
+            start = self.last_timestamp(symbol) + timeframe_ms
+
+    def range(self, symbol, start_ms=None, end_ms=None):
+        """Zero-copy column slices for candles starting in [start_ms, end_ms)"""
+        columns = self.columns(symbol)
+        timestamps = columns['timestamp']
+        start = int(np.searchsorted(timestamps, start_ms, side='left')) if start_ms is not None else 0
+        end = int(np.searchsorted(timestamps, end_ms, side='left')) if end_ms is not None else len(timestamps)
+        return {column: values[start:end] for column, values in columns.items()}
+
+    def to_arrays(self, symbols=None, start_ms=None, end_ms=None):
+        """Column arrays in the shape Backtester and run_sweep accept"""
+        return {symbol: self.range(symbol, start_ms, end_ms) for symbol in (symbols or self.symbols())}
@@ -0,0 +1,94 @@
+import json
+import logging
+import os
+import threading
+from collections import deque
+
+from src.utils.metrics import metrics
+
+class CandleStore:
+    """
+    Per-symbol OHLCV window that only asks the exchange for new candles. Streamed
+    candles arrive on the market feed's thread, so the windows are guarded by a
+    lock; exchange requests are made outside it.
+    """
+
+    def __init__(self, exchange, timeframe='15m', lookback=720, cache_file=None):
+        self.exchange = exchange
+        self.timeframe = timeframe
+        self.lookback = lookback
+        self.cache_file = cache_file
+        self.candles = {}  # {symbol: deque of [timestamp, open, high, low, close, volume]}
+        self.lock = threading.Lock()
+
+        if cache_file and os.path.exists(cache_file):
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+            if data.get('timeframe') != self.timeframe:
+                logging.info(f"Ignoring candle cache built for {data.get('timeframe')} candles")
+                return
+            for symbol, rows in data.get('candles', {}).items():
+                self.candles[symbol] = deque(rows, maxlen=self.lookback)
+        except Exception as e:
+            logging.error(f"Error loading candle cache: {e}")
+
+    def save(self):
+        if not self.cache_file:
+            return
+        with self.lock:
+            candles = {symbol: list(rows) for symbol, rows in self.candles.items()}
+        try:
+            # Write to a temp file and rename so a crash never leaves a half-written cache
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump({'timeframe': self.timeframe, 'candles': candles}, f, separators=(',', ':'))
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            logging.error(f"Error saving candle cache: {e}")
+
+    def _merge(self, candles, ohlcv):
+        for candle in ohlcv:
+            if candles and candle[0] == candles[-1][0]:
+                # The last stored candle was still open; replace it with the latest values
+                candles[-1] = list(candle)
+            elif not candles or candle[0] > candles[-1][0]:
+                candles.append(list(candle))
+
+    @metrics.timed('candle_update')
+    def update(self, symbol):
+        """Bring a symbol up to date and return its candles, oldest first"""
+        timeframe_ms = self.exchange.parse_timeframe(self.timeframe) * 1000
+        with self.lock:
+            candles = self.candles.get(symbol)
+            last_timestamp = candles[-1][0] if candles else None
+
+        if last_timestamp is not None and self.exchange.milliseconds() - last_timestamp < self.lookback * timeframe_ms:
+            # Ask only for the open candle onwards
+            ohlcv = self.exchange.fetch_ohlcv(f'{symbol}/USD', self.timeframe, since=last_timestamp)
+            full_window = False
+        else:
+            # Nothing stored, or the gap is wider than our window: take a full window
+            ohlcv = self.exchange.fetch_ohlcv(f'{symbol}/USD', self.timeframe, limit=self.lookback)
+            full_window = True
+
+        with self.lock:
+            candles = self.candles.get(symbol)
+            if full_window or candles is None:
+                candles = self.candles[symbol] = deque(maxlen=self.lookback)
+            self._merge(candles, ohlcv)
+            return list(candles)
+
+    def apply_candle(self, symbol, candle):
+        """Merge a streamed candle update into an already loaded symbol"""
+        with self.lock:
+            candles = self.candles.get(symbol)
+            if candles:
+                self._merge(candles, [candle])
+
+    def get_ohlcv(self, symbol):
+        with self.lock:
+            return list(self.candles.get(symbol, []))
@@ -0,0 +1,267 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cycles (
+    id INTEGER PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    strategy TEXT,
+    trigger TEXT,
+    prompt_hash TEXT,
+    response TEXT,
+    success INTEGER,
+    balance REAL,
+    total_value REAL,
+    portfolio TEXT,
+    timings TEXT
+);
+CREATE INDEX IF NOT EXISTS cycles_started_at ON cycles (started_at);
+CREATE INDEX IF NOT EXISTS cycles_prompt_hash ON cycles (prompt_hash);
+
+CREATE TABLE IF NOT EXISTS cycle_symbols (
+    cycle_id INTEGER NOT NULL REFERENCES cycles (id),
+    symbol TEXT NOT NULL,
+    bid REAL,
+    ask REAL,
+    volume REAL,
+    rsi REAL,
+    macd_histogram REAL,
+    stochastic_k REAL,
+    indicators TEXT,
+    PRIMARY KEY (cycle_id, symbol)
+);
+CREATE INDEX IF NOT EXISTS cycle_symbols_symbol ON cycle_symbols (symbol, cycle_id);
+
+CREATE TABLE IF NOT EXISTS cycle_commands (
+    cycle_id INTEGER NOT NULL REFERENCES cycles (id),
+    seq INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    symbol TEXT,
+    amount REAL,
+    limit_price REAL,
+    order_id TEXT,
+    summary TEXT,
+    ok INTEGER,
+    reason TEXT,
+    PRIMARY KEY (cycle_id, seq)
+);
+CREATE INDEX IF NOT EXISTS cycle_commands_symbol ON cycle_commands (symbol, cycle_id);
+"""
+
+
+def _number(value):
+    """Float for SQLite, None for missing or NaN values"""
+    if value is None:
+        return None
+    value = float(value)
+    return None if value != value else value
+
+
+def _dumps(value):
+    return None if value is None else json.dumps(value, default=str, separators=(',', ':'))
+
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class CycleStore:
+    """
+    SQLite record of every consultation: the tickers and indicators it saw, the
+    portfolio, the prompt hash and raw response, the decoded commands with their
+    outcome, and stage timings.
+
+    The database runs in WAL mode, so readers (a notebook, another process) never
+    block the bot. Cycles are buffered and written `batch_size` at a time in one
+    transaction, or sooner once `flush_interval` seconds have passed since the last
+    write. Per-symbol and per-command rows are indexed by symbol, cycles by start time.
+    """
+
+    def __init__(self, db_file, batch_size=50, flush_interval=60):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+
+        if os.path.dirname(db_file):
+            os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        # Consultation and execution run on worker threads; all access goes through self.lock
+        self.connection = sqlite3.connect(db_file, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        columns = {row['name'] for row in self.connection.execute('PRAGMA table_info(cycles)')}
+        if 'strategy' not in columns:  # databases written before strategies were recorded
+            self.connection.execute('ALTER TABLE cycles ADD COLUMN strategy TEXT')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS cycles_strategy ON cycles (strategy, started_at)')
+
+    # --- writing ----------------------------------------------------------
+
+    def record(self, started_at, market_data, technical_analysis, portfolio_data, response=None, strategy=None,
+               trigger=None, prompt_hash=None, results=(), success=None, timings=None):
+        """
+        Queue one cycle. `results` is [(Command, ok, reason)] as collected by
+        ResponseExecutor; `timings` maps stage names to seconds.
+        """
+        cycle = {
+            'started_at': _isoformat(started_at),
+            'strategy': strategy,
+            'trigger': trigger,
+            'prompt_hash': prompt_hash,
+            'response': response,
+            'success': None if success is None else int(bool(success)),
+            'balance': _number(portfolio_data.get('balance')),
+            'total_value': _number(portfolio_data.get('total_value')),
+            'portfolio': _dumps(portfolio_data),
+            'timings': _dumps(timings),
+            'symbols': [],
+            'commands': [],
+        }
+        for symbol in sorted(set(market_data) | set(technical_analysis)):
+            info = market_data.get(symbol) or {}
+            indicators = technical_analysis.get(symbol) or {}
+            momentum = indicators.get('momentum', {})
+            cycle['symbols'].append((
+                symbol,
+                _number(info.get('bid_price')),
+                _number(info.get('ask_price')),
+                _number(info.get('volume')),
+                _number(momentum.get('rsi')),
+                _number(indicators.get('trend', {}).get('macd', {}).get('histogram')),
+                _number(momentum.get('stochastic', {}).get('k')),
+                _dumps(indicators or None),
+            ))
+        for seq, (command, ok, reason) in enumerate(results):
+            cycle['commands'].append((
+                seq,
+                command.name,
+                command.symbol,
+                command.amount,
+                command.limit,
+                None if command.order_id is None else str(command.order_id),
+                command.summary,
+                None if ok is None else int(bool(ok)),
+                reason,
+            ))
+
+        with self.lock:
+            self.pending.append(cycle)
+            due = len(self.pending) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return
+            pending, self.pending = self.pending, []
+            self.last_flush = time.monotonic()
+            try:
+                with self.connection:
+                    for cycle in pending:
+                        cycle_id = self.connection.execute(
+                            'INSERT INTO cycles (started_at, strategy, trigger, prompt_hash, response, success, balance, '
+                            'total_value, portfolio, timings) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                            (cycle['started_at'], cycle['strategy'], cycle['trigger'], cycle['prompt_hash'], cycle['response'],
+                             cycle['success'], cycle['balance'], cycle['total_value'], cycle['portfolio'],
+                             cycle['timings'])
+                        ).lastrowid
+                        self.connection.executemany(
+                            'INSERT INTO cycle_symbols VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                            [(cycle_id, *row) for row in cycle['symbols']]
+                        )
+                        self.connection.executemany(
+                            'INSERT INTO cycle_commands VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                            [(cycle_id, *row) for row in cycle['commands']]
+                        )
+            except sqlite3.Error as e:
+                logging.error(f"Error writing {len(pending)} cycles to {self.db_file}: {e}")
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.connection.close()
+
+    # --- queries ----------------------------------------------------------
+
+    def query(self, sql, params=()):
+        """Rows of an arbitrary read query as dicts; pending cycles are written first"""
+        self.flush()
+        with self.lock:
+            return [dict(row) for row in self.connection.execute(sql, params)]
+
+    @staticmethod
+    def _time_range(column, since, until):
+        clauses, params = [], []
+        if since is not None:
+            clauses.append(f'{column} >= ?')
+            params.append(_isoformat(since))
+        if until is not None:
+            clauses.append(f'{column} < ?')
+            params.append(_isoformat(until))
+        return clauses, params
+
+    def cycles(self, since=None, until=None, limit=None, strategy=None):
+        """Cycle summaries (no snapshots) in time order"""
+        clauses, params = self._time_range('started_at', since, until)
+        if strategy is not None:
+            clauses.append('strategy = ?')
+            params.append(strategy)
+        sql = 'SELECT id, started_at, strategy, trigger, prompt_hash, success, balance, total_value, timings FROM cycles'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY started_at'
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        rows = self.query(sql, params)
+        for row in rows:
+            row['timings'] = json.loads(row['timings']) if row['timings'] else None
+        return rows
+
+    def cycle(self, cycle_id):
+        """Everything recorded for one cycle, JSON columns decoded; None if unknown"""
+        rows = self.query('SELECT * FROM cycles WHERE id = ?', (cycle_id,))
+        if not rows:
+            return None
+        cycle = rows[0]
+        for column in ('portfolio', 'timings'):
+            cycle[column] = json.loads(cycle[column]) if cycle[column] else None
+        cycle['symbols'] = self.query('SELECT * FROM cycle_symbols WHERE cycle_id = ? ORDER BY symbol', (cycle_id,))
+        for row in cycle['symbols']:
+            row['indicators'] = json.loads(row['indicators']) if row['indicators'] else None
+        cycle['commands'] = self.query('SELECT * FROM cycle_commands WHERE cycle_id = ? ORDER BY seq', (cycle_id,))
+        return cycle
+
+    def symbol_history(self, symbol, since=None, until=None):
+        """Per-cycle prices and headline indicators for one symbol, in time order"""
+        clauses, params = self._time_range('c.started_at', since, until)
+        sql = (
+            'SELECT c.id AS cycle_id, c.started_at, s.bid, s.ask, s.volume, s.rsi, s.macd_histogram, s.stochastic_k '
+            'FROM cycle_symbols s JOIN cycles c ON c.id = s.cycle_id WHERE s.symbol = ?'
+        )
+        if clauses:
+            sql += ' AND ' + ' AND '.join(clauses)
+        return self.query(sql + ' ORDER BY c.started_at', [symbol, *params])
+
+    def commands(self, symbol=None, name=None, ok=None, since=None, until=None, strategy=None):
+        """Decoded commands with their outcome and the cycle they came from"""
+        clauses, params = self._time_range('c.started_at', since, until)
+        for column, value in (('m.symbol', symbol), ('m.name', name), ('c.strategy', strategy)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if ok is not None:
+            clauses.append('m.ok = ?')
+            params.append(int(bool(ok)))
+        sql = 'SELECT c.started_at, c.strategy, m.* FROM cycle_commands m JOIN cycles c ON c.id = m.cycle_id'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        return self.query(sql + ' ORDER BY c.started_at, m.seq', params)
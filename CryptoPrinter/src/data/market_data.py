@@ -1,29 +1,117 @@
 import os
+import time
 import requests
 import logging
+from concurrent.futures import ThreadPoolExecutor, wait
 
 class MarketData:
-    def __init__(self, exchange):
+    def __init__(self, exchange, max_workers=8, fetch_timeout=10, market_feed=None, candle_archive=None):
         self.exchange = exchange
+        # Local columnar history; when set, historical data is read from it instead of refetched
+        self.candle_archive = candle_archive
+        # Read tickers from the websocket cache when there is one
+        self.ticker_source = market_feed or exchange
+        self.max_workers = max_workers
+        self.fetch_timeout = fetch_timeout
+        # Seconds spent fetching each symbol's ticker during the last snapshot, timed-out fetches left out
+        self.fetch_timings = {}
 
-    def get_crypto_infos(self, symbols):
+    def _format_ticker(self, symbol, ticker):
+        return {
+            'symbol': symbol,
+            'ask_price': ticker['ask'],
+            'bid_price': ticker['bid'],
+            'high_price': ticker['high'],
+            'low_price': ticker['low'],
+            'volume': ticker['baseVolume']
+        }
+
+    def _fetch_bulk_tickers(self, symbols, timings):
+        """Fetch every symbol in a single tickers request"""
         infos = {}
+        start = time.time()
+        tickers = self.ticker_source.fetch_tickers([f'{symbol}/USD' for symbol in symbols])
+        elapsed = time.time() - start
         for symbol in symbols:
+            ticker = tickers.get(f'{symbol}/USD')
+            if ticker is None:
+                logging.error(f"Bulk ticker response missing {symbol}")
+                continue
+            infos[symbol] = self._format_ticker(symbol, ticker)
+            timings[symbol] = elapsed
+        return infos
+
+    def _fetch_single_ticker(self, symbol):
+        """(ticker info or the error raised, seconds spent); workers share no state with the cycle"""
+        start = time.time()
+        try:
+            info = self._format_ticker(symbol, self.ticker_source.fetch_ticker(f'{symbol}/USD'))
+        except Exception as e:
+            info = e
+        return info, time.time() - start
+
+    def _fetch_parallel_tickers(self, symbols, timings):
+        """Fetch tickers one request per symbol through a bounded thread pool"""
+        infos = {}
+        if not symbols:
+            return infos
+
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(symbols)))
+        try:
+            futures = {executor.submit(self._fetch_single_ticker, symbol): symbol for symbol in symbols}
+            done, not_done = wait(futures, timeout=self.fetch_timeout)
+            for future in done:
+                symbol = futures[future]
+                info, timings[symbol] = future.result()
+                if isinstance(info, Exception):
+                    logging.error(f"Error fetching info for {symbol}: {info}")
+                else:
+                    infos[symbol] = info
+            for future in not_done:
+                logging.error(f"Timed out fetching info for {futures[future]} after {self.fetch_timeout}s")
+        finally:
+            # Don't let a hung request hold up the cycle; its result is never read
+            executor.shutdown(wait=False, cancel_futures=True)
+        return infos
+
+    def get_crypto_infos(self, symbols):
+        timings = {}
+        infos = {}
+        remaining = list(symbols)
+
+        if self.exchange.has.get('fetchTickers'):
             try:
-                ticker = self.exchange.fetch_ticker(f'{symbol}/USD')
-                useful_info = {
-                    'symbol': symbol,
-                    'ask_price': ticker['ask'],
-                    'bid_price': ticker['bid'],
-                    'high_price': ticker['high'],
-                    'low_price': ticker['low'],
-                    'volume': ticker['baseVolume']
-                }
-                infos[symbol] = useful_info
+                infos.update(self._fetch_bulk_tickers(remaining, timings))
+                remaining = [symbol for symbol in remaining if symbol not in infos]
             except Exception as e:
-                logging.error(f"Error fetching info for {symbol}: {e}")
+                logging.error(f"Bulk ticker fetch failed, falling back to per-symbol fetch: {e}")
+
+        infos.update(self._fetch_parallel_tickers(remaining, timings))
+
+        self.fetch_timings = timings
+        if timings:
+            slowest = max(timings, key=timings.get)
+            logging.debug(f"Fetched {len(infos)}/{len(symbols)} tickers, slowest {slowest} in {timings[slowest]:.3f}s")
         return infos
 
+    def _archived_historicals(self, symbol, start_time):
+        self.candle_archive.sync(symbol, since=start_time)
+        columns = self.candle_archive.range(symbol, start_ms=start_time)
+        # Dicts in the legacy shape, built from the archive's columns
+        return [
+            {
+                'begins_at': self.exchange.iso8601(timestamp),
+                'open_price': open_price,
+                'high_price': high_price,
+                'low_price': low_price,
+                'close_price': close_price,
+                'volume': volume,
+            }
+            for timestamp, open_price, high_price, low_price, close_price, volume in zip(
+                *(columns[name].tolist() for name in ('timestamp', 'open', 'high', 'low', 'close', 'volume'))
+            )
+        ]
+
     def get_historical_data(self, symbols):
         historicals = {}
         end_time = self.exchange.milliseconds()
@@ -31,6 +119,10 @@ class MarketData:
 
         for symbol in symbols:
             try:
+                if self.candle_archive:
+                    historicals[symbol] = self._archived_historicals(symbol, start_time)
+                    continue
+
                 ohlcv = self.exchange.fetch_ohlcv(
                     f'{symbol}/USD',
                     '10m',
@@ -0,0 +1,249 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+
+import websockets
+
+KRAKEN_WS_URL = 'wss://ws.kraken.com'
+
+# Kraken's websocket API still uses its legacy asset codes for a few pairs
+WS_ASSET_ALIASES = {'BTC': 'XBT', 'DOGE': 'XDG'}
+
+class MarketFeed:
+    """
+    Kraken public websocket subscriber that keeps the latest ticker, top of book
+    and open candle for each symbol in memory. Exposes fetch_ticker/fetch_tickers
+    with the same shape as ccxt so consumers can read from it in place of the
+    exchange; anything older than `max_age` seconds falls back to REST. The
+    subscribed symbols can change while connected through set_symbols().
+    """
+
+    def __init__(self, exchange, symbols, url=KRAKEN_WS_URL, max_age=5, ohlc_interval=15, book_depth=10):
+        self.exchange = exchange
+        self.symbols = list(symbols)
+        self.url = url
+        self.max_age = max_age
+        self.ohlc_interval = ohlc_interval
+        self.book_depth = book_depth
+
+        self.tickers = {}     # {symbol: ccxt-style ticker dict}
+        self.books = {}       # {symbol: {'bids': {price: volume}, 'asks': {price: volume}}}
+        self.candles = {}     # {symbol: [timestamp, open, high, low, close, volume]}
+        self.updated_at = {}  # {symbol: time.time() of the last ticker/book update}
+        self.on_candle = []   # callbacks(symbol, candle) for every OHLC update
+        self.lock = threading.Lock()
+
+        self.loop = None
+        self.task = None
+        self.thread = None
+        self.ws = None
+
+    def _ws_pair(self, symbol):
+        return f"{WS_ASSET_ALIASES.get(symbol, symbol)}/USD"
+
+    def _symbol(self, ws_pair):
+        asset = ws_pair.split('/')[0]
+        for symbol, alias in WS_ASSET_ALIASES.items():
+            if alias == asset:
+                return symbol
+        return asset
+
+    # --- connection -------------------------------------------------------
+
+    def start(self):
+        """Run the feed on a background thread with its own event loop"""
+        def run():
+            self.loop = asyncio.new_event_loop()
+            self.task = self.loop.create_task(self.run())
+            try:
+                self.loop.run_until_complete(self.task)
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self.loop.close()
+
+        self.thread = threading.Thread(target=run, name='market-feed', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.loop and self.task:
+            self.loop.call_soon_threadsafe(self.task.cancel)
+
+    async def run(self):
+        """Connect, subscribe and apply messages forever, reconnecting with backoff"""
+        backoff = 1
+        while True:
+            try:
+                async with websockets.connect(self.url, ping_interval=20) as ws:
+                    # Published before reading self.symbols, so a concurrent set_symbols() is never lost
+                    self.ws = ws
+                    await self._subscribe(ws, self.symbols)
+                    backoff = 1
+                    async for message in ws:
+                        self.handle_message(json.loads(message))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Market feed disconnected: {e}. Reconnecting in {backoff}s")
+            finally:
+                self.ws = None
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    async def _subscribe(self, ws, symbols, event='subscribe'):
+        if not symbols:
+            return
+        pairs = [self._ws_pair(symbol) for symbol in symbols]
+        for subscription in (
+            {'name': 'ticker'},
+            {'name': 'book', 'depth': self.book_depth},
+            {'name': 'ohlc', 'interval': self.ohlc_interval},
+        ):
+            await ws.send(json.dumps({'event': event, 'pair': pairs, 'subscription': subscription}))
+
+    async def _resubscribe(self, ws, added, removed):
+        try:
+            await self._subscribe(ws, removed, 'unsubscribe')
+            await self._subscribe(ws, added)
+        except Exception as e:
+            # The reconnect subscribes to the current symbols anyway
+            logging.error(f"Error updating market feed subscriptions: {e}")
+
+    def set_symbols(self, symbols):
+        """Follow a new symbol list: subscribe to the added symbols and drop the removed ones"""
+        added = [symbol for symbol in symbols if symbol not in self.symbols]
+        removed = [symbol for symbol in self.symbols if symbol not in symbols]
+        if not added and not removed:
+            return
+        self.symbols = list(symbols)
+        with self.lock:
+            for symbol in removed:
+                for cache in (self.tickers, self.books, self.candles, self.updated_at):
+                    cache.pop(symbol, None)
+        ws = self.ws
+        if self.loop and ws is not None:
+            asyncio.run_coroutine_threadsafe(self._resubscribe(ws, added, removed), self.loop)
+
+    # --- message handling -------------------------------------------------
+
+    def handle_message(self, message):
+        if isinstance(message, dict):
+            if message.get('status') == 'error' or message.get('errorMessage'):
+                logging.error(f"Market feed error: {message.get('errorMessage')}")
+            return
+
+        channel, symbol = message[-2], self._symbol(message[-1])
+        payloads = message[1:-2]
+        candle = None
+        with self.lock:
+            if channel == 'ticker':
+                self._apply_ticker(symbol, payloads[0])
+            elif channel.startswith('book'):
+                for payload in payloads:
+                    self._apply_book(symbol, payload)
+            elif channel.startswith('ohlc'):
+                candle = self._apply_candle(symbol, payloads[0])
+        if candle is not None:
+            for callback in self.on_candle:
+                try:
+                    callback(symbol, candle)
+                except Exception as e:
+                    logging.error(f"Error in candle callback for {symbol}: {e}")
+
+    def _apply_ticker(self, symbol, data):
+        now = time.time()
+        ticker = self.tickers.setdefault(symbol, {'symbol': f'{symbol}/USD'})
+        ticker.update({
+            'timestamp': int(now * 1000),
+            'ask': float(data['a'][0]),
+            'askVolume': float(data['a'][2]),
+            'bid': float(data['b'][0]),
+            'bidVolume': float(data['b'][2]),
+            'last': float(data['c'][0]),
+            'open': float(data['o'][1]),
+            'high': float(data['h'][1]),
+            'low': float(data['l'][1]),
+            'baseVolume': float(data['v'][1]),
+        })
+        self.updated_at[symbol] = now
+
+    def _apply_book(self, symbol, data):
+        book = self.books.setdefault(symbol, {'bids': {}, 'asks': {}})
+        # 'as'/'bs' carry a full snapshot (sent on subscribe and after reconnects)
+        if 'as' in data:
+            book['asks'] = {}
+        if 'bs' in data:
+            book['bids'] = {}
+        for key, side in (('as', 'asks'), ('a', 'asks'), ('bs', 'bids'), ('b', 'bids')):
+            for level in data.get(key, []):
+                price, volume = float(level[0]), float(level[1])
+                if volume == 0:
+                    book[side].pop(price, None)
+                else:
+                    book[side][price] = volume
+
+        # Kraken only maintains `depth` levels; drop anything that fell out of range
+        for side, reverse in (('bids', True), ('asks', False)):
+            if len(book[side]) > self.book_depth:
+                keep = sorted(book[side], reverse=reverse)[:self.book_depth]
+                book[side] = {price: book[side][price] for price in keep}
+
+        ticker = self.tickers.get(symbol)
+        if ticker and book['bids'] and book['asks']:
+            best_bid, best_ask = max(book['bids']), min(book['asks'])
+            ticker.update({
+                'bid': best_bid,
+                'bidVolume': book['bids'][best_bid],
+                'ask': best_ask,
+                'askVolume': book['asks'][best_ask],
+                'timestamp': int(time.time() * 1000),
+            })
+            self.updated_at[symbol] = time.time()
+
+    def _apply_candle(self, symbol, data):
+        # [time, etime, open, high, low, close, vwap, volume, count]; etime is the candle's end
+        start_ms = int(float(data[1]) * 1000) - self.ohlc_interval * 60 * 1000
+        candle = [start_ms, float(data[2]), float(data[3]), float(data[4]), float(data[5]), float(data[7])]
+        self.candles[symbol] = candle
+        return candle
+
+    # --- cache reads ------------------------------------------------------
+
+    def get_ticker(self, symbol, max_age=None):
+        """Cached ticker for a symbol, or None if it is missing or stale"""
+        max_age = self.max_age if max_age is None else max_age
+        with self.lock:
+            updated_at = self.updated_at.get(symbol)
+            if updated_at is None or time.time() - updated_at > max_age:
+                return None
+            return dict(self.tickers[symbol])
+
+    def get_order_book(self, symbol):
+        with self.lock:
+            book = self.books.get(symbol, {'bids': {}, 'asks': {}})
+            return {
+                'bids': sorted(book['bids'].items(), reverse=True),
+                'asks': sorted(book['asks'].items()),
+            }
+
+    def fetch_ticker(self, pair):
+        ticker = self.get_ticker(pair.split('/')[0])
+        if ticker is not None:
+            return ticker
+        logging.debug(f"No fresh websocket ticker for {pair}, falling back to REST")
+        return self.exchange.fetch_ticker(pair)
+
+    def fetch_tickers(self, pairs):
+        tickers = {}
+        missing = []
+        for pair in pairs:
+            ticker = self.get_ticker(pair.split('/')[0])
+            if ticker is not None:
+                tickers[pair] = ticker
+            else:
+                missing.append(pair)
+        if missing:
+            tickers.update(self.exchange.fetch_tickers(missing))
+        return tickers
@@ -0,0 +1,254 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+import ccxt
+
+from src.utils.metrics import metrics
+
+# Request priorities; lower runs first when callers are waiting on the same counter
+ORDER, ACCOUNT, MARKET, BACKGROUND = range(4)
+
+# Kraken private API counter per verification tier: (max counter, decay per second)
+KRAKEN_TIERS = {
+    'starter': (15, 0.33),
+    'intermediate': (20, 0.5),
+    'pro': (20, 1.0),
+}
+
+# ccxt method -> (counter, cost, priority). Kraken counts history calls double on the
+# private counter; order placement and cancels are limited separately by the
+# matching engine, so they get their own counter.
+METHOD_COSTS = {
+    'load_markets': ('public', 1, MARKET),
+    'fetch_ticker': ('public', 1, MARKET),
+    'fetch_tickers': ('public', 1, MARKET),
+    'fetch_order_book': ('public', 1, MARKET),
+    'fetch_ohlcv': ('public', 1, BACKGROUND),
+    'fetch_trades': ('public', 1, BACKGROUND),
+    'fetch_balance': ('private', 1, ACCOUNT),
+    'fetch_open_orders': ('private', 1, ACCOUNT),
+    'fetch_closed_orders': ('private', 2, ACCOUNT),
+    'fetch_order': ('private', 1, ACCOUNT),
+    'fetch_my_trades': ('private', 2, BACKGROUND),
+    'fetch_ledger': ('private', 2, BACKGROUND),
+    'create_order': ('orders', 1, ORDER),
+    'create_market_buy_order': ('orders', 1, ORDER),
+    'create_market_sell_order': ('orders', 1, ORDER),
+    'create_limit_buy_order': ('orders', 1, ORDER),
+    'create_limit_sell_order': ('orders', 1, ORDER),
+    'cancel_order': ('orders', 1, ORDER),
+    'edit_order': ('orders', 1, ORDER),
+}
+
+# Calls that only read, so identical concurrent calls can share one request and be retried safely
+READ_ONLY = {method for method in METHOD_COSTS if method.startswith('fetch_') or method == 'load_markets'}
+
+
+class TokenBucket:
+    """Kraken-style call counter: fills by cost per call, drains at a fixed rate"""
+
+    def __init__(self, capacity, decay):
+        self.capacity = capacity
+        self.decay = decay
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.decay)
+        self.updated = now
+
+    def try_take(self, cost):
+        self._refill()
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+    def time_until(self, cost):
+        self._refill()
+        return max(0.0, (cost - self.tokens) / self.decay)
+
+    def drain(self):
+        """The exchange said we're over the limit; start again from empty"""
+        self.tokens = 0
+        self.updated = time.monotonic()
+
+
+class RequestScheduler:
+    """
+    Central gate for every REST call to the exchange. Each counter (public, private,
+    orders) is a token bucket. Identical read-only calls already in flight are
+    coalesced into one request, and throttling or network errors are retried with
+    exponential backoff.
+
+    Public calls wait in their own queue and run in parallel. Authenticated calls
+    (the private and orders counters) share one queue and go out one at a time:
+    ccxt signs each with an increasing nonce, and Kraken rejects one that arrives
+    after a higher nonce with "EAPI:Invalid nonce". Both queues are served by
+    priority, then arrival, so an order waiting for the lane goes ahead of a
+    background history sync queued before it.
+    """
+
+    def __init__(self, tier='starter', public_rate=1.0, public_burst=2, order_rate=1.0, order_burst=10,
+                 max_retries=4, backoff_base=1.0, backoff_max=30.0):
+        private_capacity, private_decay = KRAKEN_TIERS[tier]
+        self.buckets = {
+            'public': TokenBucket(public_burst, public_rate),
+            'private': TokenBucket(private_capacity, private_decay),
+            'orders': TokenBucket(order_burst, order_rate),
+        }
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.condition = threading.Condition()
+        self.waiting = {'public': [], 'authenticated': []}  # heap of (priority, seq) per queue
+        self.lane_busy = False  # an authenticated call is between acquire() and release()
+        self.sequence = itertools.count()
+        self.in_flight = {}  # (method, args) -> Future, for coalescing
+
+        self.stats = {
+            'requests': 0,
+            'coalesced': 0,
+            'retries': 0,
+            'throttled': 0,
+            'wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+        }
+
+    def acquire(self, bucket_name, cost, priority):
+        """
+        Block until this call may go out; returns the seconds spent waiting. An
+        authenticated call holds the lane until release().
+        """
+        start = time.monotonic()
+        ticket = (priority, next(self.sequence))
+        authenticated = bucket_name != 'public'
+        with self.condition:
+            queue = self.waiting['authenticated' if authenticated else 'public']
+            heapq.heappush(queue, ticket)
+            bucket = self.buckets[bucket_name]
+            while True:
+                ready = queue[0] == ticket and not (authenticated and self.lane_busy)
+                if ready and bucket.try_take(cost):
+                    heapq.heappop(queue)
+                    if authenticated:
+                        self.lane_busy = True
+                    self.condition.notify_all()
+                    break
+                timeout = bucket.time_until(cost) if ready else None
+                self.condition.wait(timeout)
+
+            waited = time.monotonic() - start
+            self.stats['requests'] += 1
+            self.stats['wait_seconds'] += waited
+            self.stats['max_wait_seconds'] = max(self.stats['max_wait_seconds'], waited)
+        metrics.observe('exchange_wait', waited, counter=bucket_name)
+        return waited
+
+    def release(self, bucket_name):
+        """An authenticated call finished; let the next one in the lane go"""
+        if bucket_name == 'public':
+            return
+        with self.condition:
+            self.lane_busy = False
+            self.condition.notify_all()
+
+    def _backoff(self, attempt):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _call_with_retries(self, method, function, args, kwargs):
+        bucket_name, cost, priority = METHOD_COSTS.get(method, ('private', 1, ACCOUNT))
+        for attempt in range(self.max_retries + 1):
+            self.acquire(bucket_name, cost, priority)
+            try:
+                try:
+                    with metrics.span('exchange_request', method=method):
+                        return function(*args, **kwargs)
+                finally:
+                    # Before any backoff sleep, so a retry doesn't hold up the lane
+                    self.release(bucket_name)
+            except ccxt.NetworkError as e:
+                throttled = isinstance(e, ccxt.DDoSProtection)
+                if throttled:
+                    self.stats['throttled'] += 1
+                    metrics.count('exchange_throttled', method=method)
+                    with self.condition:
+                        self.buckets[bucket_name].drain()
+                # An order that timed out may still have been placed; only retry those when refused outright
+                retryable = throttled or method in READ_ONLY
+                if not retryable or attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                self.stats['retries'] += 1
+                metrics.count('exchange_retries', method=method)
+                logging.warning(f"{method} failed ({type(e).__name__}: {e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def call(self, method, function, *args, **kwargs):
+        if method not in READ_ONLY:
+            return self._call_with_retries(method, function, args, kwargs)
+
+        key = (method, repr(args), repr(sorted(kwargs.items())))
+        with self.condition:
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.in_flight[key] = future
+            else:
+                self.stats['coalesced'] += 1
+                metrics.count('exchange_coalesced', method=method)
+        if not owner:
+            return future.result()
+
+        try:
+            result = self._call_with_retries(method, function, args, kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.condition:
+                self.in_flight.pop(key, None)
+
+    def metrics(self):
+        with self.condition:
+            requests = self.stats['requests']
+            return {
+                **self.stats,
+                'mean_wait_seconds': self.stats['wait_seconds'] / requests if requests else 0.0,
+                'queue_depth': {name: len(queue) for name, queue in self.waiting.items()},
+                'in_flight': len(self.in_flight),
+            }
+
+
+class ScheduledExchange:
+    """
+    Wraps a ccxt exchange so every REST call goes through a RequestScheduler.
+    Everything else (milliseconds, iso8601, parse_timeframe, has, markets, ...) is
+    passed through untouched.
+    """
+
+    def __init__(self, exchange, scheduler):
+        # ccxt throttles to one request per `rateLimit` ms by default, which would
+        # serialize every call behind the scheduler's own pacing
+        exchange.enableRateLimit = False
+        self._exchange = exchange
+        self.scheduler = scheduler
+
+    def __getattr__(self, name):
+        attribute = getattr(self._exchange, name)
+        if name in METHOD_COSTS and callable(attribute):
+            def scheduled(*args, **kwargs):
+                return self.scheduler.call(name, attribute, *args, **kwargs)
+            return scheduled
+        return attribute
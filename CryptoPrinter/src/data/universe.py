@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+import threading
+import time
+
+class Universe:
+    """
+    Which symbols to trade. Kraken's market list is loaded once and cached on disk
+    for `markets_ttl` seconds. Every `refresh_interval` seconds all active USD spot
+    pairs are ranked from a single bulk tickers request. Pairs trading less than
+    `min_volume_usd` a day or quoting a spread wider than `max_spread_pct` are
+    dropped, and the `size` most traded of the rest are selected. `pinned` symbols
+    are always included and `exclude` (stablecoins, fiat) never are. A failed
+    refresh is retried after `retry_interval` seconds rather than a full interval.
+    """
+
+    def __init__(self, exchange, cache_file=None, markets_ttl=86400, quote='USD', size=11, min_volume_usd=0,
+                 max_spread_pct=None, refresh_interval=900, pinned=None, exclude=None, retry_interval=60):
+        self.exchange = exchange
+        self.cache_file = cache_file
+        self.markets_ttl = markets_ttl
+        self.quote = quote
+        self.size = size
+        self.min_volume_usd = min_volume_usd
+        self.max_spread_pct = max_spread_pct
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.pinned = list(pinned or [])
+        self.exclude = set(exclude or [])
+
+        self._markets = None
+        self.selection = []
+        self.rankings = []  # [{'symbol', 'volume_usd', 'spread_pct'}] from the last refresh, best first
+        self.refreshed_at = 0  # time of the last successful refresh
+        self.failed_at = 0  # time of the last failed one
+        self.lock = threading.Lock()  # the market and indicator stages may both ask at startup
+
+    # --- markets ----------------------------------------------------------
+
+    def _load_cached_markets(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return None
+        try:
+            with open(self.cache_file, 'r') as f:
+                cached = json.load(f)
+            if time.time() - cached['saved_at'] > self.markets_ttl:
+                return None
+            return cached['markets']
+        except Exception as e:
+            logging.error(f"Error loading markets cache: {e}")
+            return None
+
+    def _save_markets(self, markets):
+        if not self.cache_file:
+            return
+        try:
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump({'saved_at': time.time(), 'markets': markets}, f)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            logging.error(f"Error saving markets cache: {e}")
+
+    def markets(self):
+        """ccxt markets, from the disk cache when it is fresh; the exchange is primed with them either way"""
+        if self._markets is None:
+            markets = self._load_cached_markets()
+            if markets is not None:
+                # ccxt then skips its own load_markets request
+                self.exchange.set_markets(markets)
+            else:
+                markets = self.exchange.load_markets()
+                self._save_markets(markets)
+            self._markets = markets
+        return self._markets
+
+    def candidates(self):
+        """Unified symbols of the active spot pairs quoted in `quote`"""
+        return sorted(
+            symbol for symbol, market in self.markets().items()
+            if market.get('quote') == self.quote and market.get('spot', True) and market.get('active') is not False
+            and not market.get('darkpool') and market.get('base') not in self.exclude
+        )
+
+    # --- ranking ----------------------------------------------------------
+
+    def rank(self, tickers):
+        rankings = []
+        for pair, ticker in tickers.items():
+            bid, ask, last = ticker.get('bid'), ticker.get('ask'), ticker.get('last')
+            if not bid or not ask:
+                continue
+            volume_usd = ticker.get('quoteVolume') or (ticker.get('baseVolume') or 0) * (last or 0)
+            spread_pct = (ask - bid) / ((ask + bid) / 2) * 100
+            if volume_usd < self.min_volume_usd:
+                continue
+            if self.max_spread_pct is not None and spread_pct > self.max_spread_pct:
+                continue
+            rankings.append({'symbol': pair.split('/')[0], 'volume_usd': volume_usd, 'spread_pct': spread_pct})
+        rankings.sort(key=lambda ranking: ranking['volume_usd'], reverse=True)
+        return rankings
+
+    def refresh(self):
+        """Re-rank every candidate pair from one bulk tickers request"""
+        tickers = self.exchange.fetch_tickers(self.candidates())
+        self.rankings = self.rank(tickers)
+        selection = [ranking['symbol'] for ranking in self.rankings[:self.size]]
+        selection += [symbol for symbol in self.pinned if symbol not in selection]
+        if selection != self.selection:
+            logging.info(
+                f"Trading universe: {selection} "
+                f"(top {self.size} of {len(self.rankings)} liquid {self.quote} pairs out of {len(tickers)})"
+            )
+        self.selection = selection
+        self.refreshed_at = time.time()
+        return selection
+
+    def symbols(self):
+        """Current selection, re-ranked when it is older than refresh_interval"""
+        with self.lock:
+            now = time.time()
+            if now - self.refreshed_at >= self.refresh_interval and now - self.failed_at >= self.retry_interval:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    # Keep trading the last selection (or the pinned symbols) until the retry
+                    self.failed_at = now
+                    logging.error(f"Error refreshing trading universe, retrying in {self.retry_interval}s: {e}")
+                    if not self.selection:
+                        self.selection = list(self.pinned)
+            return list(self.selection)
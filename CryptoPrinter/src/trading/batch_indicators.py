@@ -0,0 +1,155 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Field order along the last axis, matching ccxt's OHLCV rows
+TIMESTAMP, OPEN, HIGH, LOW, CLOSE, VOLUME = range(6)
+
+
+def stack_ohlcv(ohlcv_by_symbol, lookback=None):
+    """
+    Pack each symbol's OHLCV rows into one (symbols x candles x fields) array.
+    Series are right-aligned on the latest candle; shorter histories are padded
+    with NaN at the start so every symbol shares the same time axis.
+    """
+    symbols = list(ohlcv_by_symbol)
+    length = max((len(rows) for rows in ohlcv_by_symbol.values()), default=0)
+    if lookback:
+        length = min(length, lookback)
+
+    data = np.full((len(symbols), length, 6), np.nan)
+    for i, symbol in enumerate(symbols):
+        rows = ohlcv_by_symbol[symbol][-length:] if length else []
+        if len(rows):
+            data[i, length - len(rows):] = np.asarray(rows, dtype=float)[:, :6]
+    return symbols, data
+
+
+def _ema(series, alpha, min_periods):
+    """pandas ewm(adjust=False).mean() along axis 1, skipping leading NaNs per row"""
+    out = np.full(series.shape, np.nan)
+    weighted = np.full(series.shape[0], np.nan)
+    count = np.zeros(series.shape[0])
+    old_wt = 1.0 - alpha
+    for t in range(series.shape[1]):
+        x = series[:, t]
+        observed = ~np.isnan(x)
+        with np.errstate(invalid='ignore'):
+            blended = np.where(weighted == x, x, (old_wt * weighted + alpha * x) / (old_wt + alpha))
+        weighted = np.where(observed, np.where(np.isnan(weighted), x, blended), weighted)
+        count += observed
+        out[:, t] = np.where(count >= min_periods, weighted, np.nan)
+    return out
+
+
+def _window(series, window, trailing=1):
+    """The last `trailing` rolling windows of each row, shape (symbols, trailing, window)"""
+    if series.shape[1] < window + trailing - 1:
+        return np.full((series.shape[0], trailing, window), np.nan)
+    return sliding_window_view(series[:, -(window + trailing - 1):], window, axis=1)
+
+
+def compute_indicators(data, macd_fast=12, macd_slow=26, macd_signal=9, ma_window=20,
+                       rsi_window=14, stoch_window=14, stoch_smooth=3,
+                       bb_window=20, bb_dev=2, vwap_window=14):
+    """Latest indicator values for every symbol in a stacked OHLCV array"""
+    high, low, close, volume = data[:, :, HIGH], data[:, :, LOW], data[:, :, CLOSE], data[:, :, VOLUME]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Trend
+        macd = _ema(close, 2.0 / (macd_fast + 1), macd_fast) - _ema(close, 2.0 / (macd_slow + 1), macd_slow)
+        signal = _ema(macd, 2.0 / (macd_signal + 1), macd_signal)[:, -1]
+        macd = macd[:, -1]
+        sma = _window(close, ma_window)[:, -1].mean(axis=1)
+        ema = _ema(close, 2.0 / (ma_window + 1), ma_window)[:, -1]
+
+        # Momentum: the first candle of each series has no diff and counts as a flat move
+        diff = np.diff(close, axis=1, prepend=np.nan)
+        padded = np.isnan(close)
+        up = np.where(padded, np.nan, np.where(diff > 0, diff, 0.0))
+        down = np.where(padded, np.nan, np.where(diff < 0, -diff, 0.0))
+        emaup = _ema(up, 1.0 / rsi_window, rsi_window)[:, -1]
+        emadn = _ema(down, 1.0 / rsi_window, rsi_window)[:, -1]
+        rsi = np.where(emadn == 0, 100.0, 100 - (100 / (1 + emaup / emadn)))
+
+        highest = _window(high, stoch_window, stoch_smooth).max(axis=2)
+        lowest = _window(low, stoch_window, stoch_smooth).min(axis=2)
+        stoch_k = 100 * (close[:, -stoch_smooth:] - lowest) / (highest - lowest)
+        stoch_d = stoch_k.mean(axis=1)
+        stoch_k = stoch_k[:, -1]
+
+        # Volatility
+        bb_window_values = _window(close, bb_window)[:, -1]
+        bb_mid = bb_window_values.mean(axis=1)
+        bb_std = bb_window_values.std(axis=1)
+
+        # Volume
+        typical_pv = (high + low + close) / 3.0 * volume
+        vwap = _window(typical_pv, vwap_window)[:, -1].sum(axis=1) / _window(volume, vwap_window)[:, -1].sum(axis=1)
+
+    return {
+        'macd': macd,
+        'macd_signal': signal,
+        'sma': sma,
+        'ema': ema,
+        'rsi': rsi,
+        'stoch_k': stoch_k,
+        'stoch_d': stoch_d,
+        'bb_high': bb_mid + bb_dev * bb_std,
+        'bb_mid': bb_mid,
+        'bb_low': bb_mid - bb_dev * bb_std,
+        'vwap': vwap,
+        'close': close[:, -1],
+        'open': data[:, -1, OPEN],
+        'high': high[:, -1],
+        'low': low[:, -1],
+    }
+
+
+def get_all_indicators(ohlcv_by_symbol, **indicator_params):
+    """Batched equivalent of TechnicalAnalysis.get_all_indicators, same nested dict shape"""
+    symbols, data = stack_ohlcv(ohlcv_by_symbol)
+    if data.shape[1] == 0:
+        return {symbol: None for symbol in symbols}
+    values = compute_indicators(data, **indicator_params)
+
+    technical_analysis = {}
+    for i, symbol in enumerate(symbols):
+        if np.isnan(data[i, -1, CLOSE]):
+            technical_analysis[symbol] = None
+            continue
+        latest = {name: float(column[i]) for name, column in values.items()}
+        technical_analysis[symbol] = {
+            'trend': {
+                'macd': {
+                    'value': latest['macd'],
+                    'signal': latest['macd_signal'],
+                    'histogram': latest['macd'] - latest['macd_signal']
+                },
+                'sma_20': latest['sma'],
+                'ema_20': latest['ema']
+            },
+            'momentum': {
+                'rsi': latest['rsi'],
+                'stochastic': {
+                    'k': latest['stoch_k'],
+                    'd': latest['stoch_d']
+                }
+            },
+            'volatility': {
+                'bollinger_bands': {
+                    'high': latest['bb_high'],
+                    'mid': latest['bb_mid'],
+                    'low': latest['bb_low']
+                }
+            },
+            'volume': {
+                'vwap': latest['vwap']
+            },
+            'price': {
+                'current': latest['close'],
+                'open': latest['open'],
+                'high': latest['high'],
+                'low': latest['low']
+            }
+        }
+    return technical_analysis
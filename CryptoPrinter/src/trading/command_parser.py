@@ -0,0 +1,290 @@
+import json
+import logging
+import re
+
+COMMANDS = ["buy_crypto_price", "sell_crypto_price", "buy_crypto_limit", "sell_crypto_limit", "cancel_order", "do_nothing"]
+COMMAND_PATTERN = re.compile(r'.*?(buy_crypto_price|sell_crypto_price|buy_crypto_limit|sell_crypto_limit|cancel_order|do_nothing)\((.*)\)')
+
+# Argument names in the order the text format lists them
+COMMAND_ARGS = {
+    "buy_crypto_price": ["symbol", "amount", "summary"],
+    "sell_crypto_price": ["symbol", "amount", "summary"],
+    "buy_crypto_limit": ["symbol", "amount", "summary", "limit"],
+    "sell_crypto_limit": ["symbol", "amount", "summary", "limit"],
+    "cancel_order": ["order_id"],
+    "do_nothing": [],
+}
+
+_ARG_SCHEMAS = {
+    "symbol": {"type": "string", "description": "Ticker symbol, e.g. BTC"},
+    "amount": {"type": "number", "description": "USD amount to trade"},
+    "summary": {"type": "string", "description": "One sentence on why"},
+    "limit": {"type": "number", "description": "Limit price in USD"},
+    "order_id": {"type": "string", "description": "Id of an open order"},
+}
+_DESCRIPTIONS = {
+    "buy_crypto_price": "Buy at market for a USD amount",
+    "sell_crypto_price": "Sell at market for a USD amount",
+    "buy_crypto_limit": "Place a limit buy for a USD amount",
+    "sell_crypto_limit": "Place a limit sell for a USD amount",
+    "cancel_order": "Cancel an open order",
+    "do_nothing": "Take no action this cycle",
+    "summary": "Report the summary of this decision; call it last",
+}
+
+# OpenAI tool definitions for every command, plus one for the closing summary
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": _DESCRIPTIONS[name],
+            "parameters": {
+                "type": "object",
+                "properties": {arg: _ARG_SCHEMAS[arg] for arg in args},
+                "required": args,
+            },
+        },
+    }
+    for name, args in list(COMMAND_ARGS.items()) + [("summary", ["summary"])]
+]
+
+
+class Command:
+    """A validated trading command with typed arguments"""
+
+    def __init__(self, name, symbol=None, amount=None, summary=None, limit=None, order_id=None):
+        self.name = name
+        self.symbol = symbol
+        self.amount = amount
+        self.summary = summary
+        self.limit = limit
+        self.order_id = order_id
+
+    def arguments(self):
+        return {arg: getattr(self, arg) for arg in COMMAND_ARGS[self.name]}
+
+    def to_json(self):
+        """One-line JSON form, readable by decode_line"""
+        return json.dumps({"name": self.name, "arguments": self.arguments()}, separators=(',', ':'))
+
+    def __repr__(self):
+        return f"Command({self.name}, {self.arguments()})"
+
+
+def _positive_number(name, value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number, got {value!r}")
+    if not number > 0:
+        raise ValueError(f"{name} must be positive, got {value!r}")
+    return number
+
+
+def decode_command(name, arguments):
+    """Validate a command name and its arguments into a Command; raises ValueError"""
+    if name not in COMMAND_ARGS:
+        raise ValueError(f"Unknown command {name!r}")
+    missing = [arg for arg in COMMAND_ARGS[name] if arguments.get(arg) in (None, '')]
+    if missing:
+        raise ValueError(f"{name} is missing {', '.join(missing)}")
+
+    command = Command(name)
+    args = COMMAND_ARGS[name]
+    if 'symbol' in args:
+        command.symbol = str(arguments['symbol']).strip().upper()
+    if 'amount' in args:
+        command.amount = _positive_number('amount', arguments['amount'])
+    if 'summary' in args:
+        command.summary = str(arguments['summary'])
+    if 'limit' in args:
+        command.limit = _positive_number('limit', arguments['limit'])
+    if 'order_id' in args:
+        order_id = str(arguments['order_id']).strip()
+        # Mock portfolio ids are integers, exchange ids are strings
+        command.order_id = int(order_id) if order_id.isdigit() else order_id
+    return command
+
+
+def is_command_line(line):
+    return any(cmd in line.lower() for cmd in COMMANDS)
+
+def parse_command(line):
+    """(command, args) for a text command line, or None if it doesn't parse"""
+    match = COMMAND_PATTERN.match(line)
+
+    if not match:
+        logging.error(f"Invalid response format in line: {line}")
+        return None
+
+    command = match.group(1)
+    args_str = match.group(2)
+    args = []
+    current_arg = ''
+    in_quotes = False
+    quote_char = None
+
+    for char in args_str:
+        if char in ['"', "'"]:
+            if not in_quotes:
+                in_quotes = True
+                quote_char = char
+            elif char == quote_char:
+                in_quotes = False
+            current_arg += char
+        elif char == ',' and not in_quotes:
+            args.append(current_arg.strip().strip('"\''))
+            current_arg = ''
+        else:
+            current_arg += char
+
+    if current_arg:
+        args.append(current_arg.strip().strip('"\''))
+    return command, args
+
+def decode_line(line):
+    """
+    Command for one response line, in either the JSON form ({"name": ..., "arguments": {...}})
+    or the text form (buy_crypto_price("BTC", 100, "...")). None for summary lines;
+    ValueError for a command line that doesn't decode.
+    """
+    stripped = line.strip()
+    if stripped.startswith('{'):
+        try:
+            data = json.loads(stripped)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON command: {e}")
+        if not isinstance(data, dict) or not isinstance(data.get('arguments', {}), dict):
+            raise ValueError("JSON command must be an object with an 'arguments' object")
+        return decode_command(data.get('name'), data.get('arguments', {}))
+
+    if not is_command_line(line):
+        return None
+    parsed = parse_command(line)
+    if parsed is None:
+        raise ValueError(f"Unparseable command line: {line}")
+    name, args = parsed
+    names = COMMAND_ARGS[name]
+    if len(args) > len(names):
+        raise ValueError(f"{name} takes {len(names)} arguments, got {len(args)}")
+    return decode_command(name, dict(zip(names, args)))
+
+def execute_command(command, trade_executor):
+    """Run one decoded command; True if it went through"""
+    command_map = {
+        "buy_crypto_price": lambda: trade_executor.execute_buy_market(command.symbol, command.amount, command.summary),
+        "buy_crypto_limit": lambda: trade_executor.execute_buy_limit(command.symbol, command.amount, command.summary, command.limit),
+        "sell_crypto_price": lambda: trade_executor.execute_sell_market(command.symbol, command.amount, command.summary),
+        "sell_crypto_limit": lambda: trade_executor.execute_sell_limit(command.symbol, command.amount, command.summary, command.limit),
+        "cancel_order": lambda: trade_executor.cancel_order(command.order_id),
+        "do_nothing": lambda: None
+    }
+
+    logging.info(f"Executing {command}")
+    try:
+        if command_map[command.name]():
+            return True
+    except Exception as e:
+        logging.error(f"Error executing command {command.name}: {e}")
+    return False
+
+def _log_summary(summary_lines, ai_logger):
+    summary = ""
+    if summary_lines:
+        summary = ' '.join(summary_lines)
+        ai_logger.info("AI summary: %s", summary)
+    return summary
+
+class ResponseExecutor:
+    """
+    Decodes response lines and executes their commands, tallying the outcome. With an
+    ExecutionPipeline, commands are checked and dispatched concurrently: as they arrive,
+    or all together in finish() when `defer` is set.
+    """
+
+    def __init__(self, trade_executor, ai_logger, pipeline=None, defer=False):
+        self.trade_executor = trade_executor
+        self.ai_logger = ai_logger
+        self.pipeline = pipeline
+        self.defer = defer
+        self.commands = []
+        self.results = []  # (command, ok, reason) for every decoded command, once finished
+        self.commands_executed = 0
+        self.success = False
+        self.summary_lines = []
+        self.errors = []
+        if pipeline and not defer:
+            pipeline.begin()
+
+    def handle(self, line):
+        if not line.strip():
+            return
+        try:
+            command = decode_line(line)
+        except ValueError as e:
+            logging.error(f"Rejected command {line.strip()!r}: {e}")
+            self.errors.append(str(e))
+            return
+        if command is None:
+            self.summary_lines.append(line)
+        elif self.pipeline:
+            self.commands.append(command)
+            if not self.defer:
+                self.pipeline.submit(command)
+        else:
+            ok = execute_command(command, self.trade_executor)
+            self.results.append((command, ok, None))
+            if ok:
+                self.commands_executed += 1
+                self.success = True
+
+    def finish(self):
+        if self.pipeline:
+            self.results = self.pipeline.execute(self.commands) if self.defer else self.pipeline.finish()
+            for command, ok, reason in self.results:
+                if ok:
+                    self.commands_executed += 1
+                    self.success = True
+                elif reason and reason != 'execution failed':
+                    self.errors.append(f"{command.name} {command.symbol or command.order_id}: {reason}")
+
+        summary = _log_summary(self.summary_lines, self.ai_logger)
+        if self.errors:
+            self.ai_logger.error("%d command(s) rejected: %s", len(self.errors), '; '.join(self.errors))
+        logging.info(f"Executed {self.commands_executed} commands successfully")
+        return self.success, summary
+
+def parse_and_execute_response(response, trade_executor, ai_logger, pipeline=None, results=None):
+    """Execute every command in a response; `results`, when given, is extended with (command, ok, reason)"""
+    executor = ResponseExecutor(trade_executor, ai_logger, pipeline, defer=True)
+    for line in response.split('\n'):
+        executor.handle(line)
+    outcome = executor.finish()
+    if results is not None:
+        results.extend(executor.results)
+    return outcome
+
+def execute_response_stream(chunks, trade_executor, ai_logger, pipeline=None, results=None):
+    """
+    Same as parse_and_execute_response for a response that arrives as text chunks:
+    each command is executed as soon as its line is complete, while the rest of the
+    response (usually the summary) is still being generated.
+
+    Returns (success, summary, full response text).
+    """
+    executor = ResponseExecutor(trade_executor, ai_logger, pipeline)
+    received = []
+    pending = ''
+    for chunk in chunks:
+        received.append(chunk)
+        pending += chunk
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            executor.handle(line)
+    executor.handle(pending)
+
+    success, summary = executor.finish()
+    if results is not None:
+        results.extend(executor.results)
+    return success, summary, ''.join(received)
@@ -0,0 +1,216 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from src.utils.metrics import metrics
+
+def min_order_amounts_from_markets(markets, quote='USD'):
+    """{base: minimum order size in base units} from ccxt load_markets() output"""
+    return {
+        market['base']: market['limits']['amount']['min']
+        for market in markets.values()
+        if market.get('quote') == quote and (market.get('limits', {}).get('amount') or {}).get('min')
+    }
+
+
+class ExecutionPipeline:
+    """
+    Pre-trade checks and concurrent dispatch for a batch of decoded commands.
+
+    begin() reads cash, holdings, open orders and recent trades once. Each submitted
+    command is checked against that snapshot as updated by the commands accepted
+    before it. The checks cover cash, sellable quantity, minimum order sizes, the
+    trades-per-hour cap and whether a cancelled order exists. Accepted commands are
+    dispatched right away to a single-worker order lane, so they reach the exchange
+    one at a time in submission order: Kraken rejects a private call whose nonce is
+    not above the last one it saw, and concurrent signed requests can arrive out of
+    order. Request pacing is the exchange wrapper's job (ScheduledExchange). Only
+    public ticker fetches run in parallel, on up to `max_workers` threads, and checks
+    overlap with orders already in the lane.
+    finish() waits for everything and returns [(command, ok, reason)].
+    """
+
+    def __init__(self, trade_executor, max_workers=5, max_trades_per_hour=7,
+                 min_order_usd=0.0, min_order_amounts=None, fee_rate=0.0, clock=None):
+        self.trade_executor = trade_executor
+        self.portfolio = trade_executor.portfolio
+        self.max_workers = max_workers
+        self.max_trades_per_hour = max_trades_per_hour
+        self.min_order_usd = min_order_usd
+        self.min_order_amounts = min_order_amounts or {}  # {symbol: minimum base quantity}
+        self.fee_rate = fee_rate
+        self.clock = clock or datetime.now
+
+        self.lane = None
+        self.results = []
+
+    # --- snapshot ---------------------------------------------------------
+
+    def _timestamp(self, value):
+        timestamp = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        # Ledger fills are UTC; mock trades are naive local time like the clock
+        return timestamp.astimezone().replace(tzinfo=None) if timestamp.tzinfo else timestamp
+
+    def _recent_trade_count(self):
+        cutoff = self.clock() - timedelta(hours=1)
+        count = 0
+        for trade in self.portfolio.get_trade_history():
+            try:
+                if self._timestamp(trade['timestamp']) >= cutoff:
+                    count += 1
+            except (KeyError, ValueError):
+                continue
+        return count
+
+    def _open_order_quantity(self, order):
+        """Base units still to trade on an open order"""
+        return order['quantity'] - order.get('filled_quantity', 0)
+
+    def begin(self, symbols=None):
+        """Take the account snapshot; `symbols` prefetches tickers for market orders in one request"""
+        self.cash = self.portfolio.get_balance()
+        self.holdings = {position['symbol']: position['quantity'] for position in self.portfolio.get_positions()}
+        self.open_orders = {str(order['id']): order for order in self.portfolio.get_open_orders()}
+        for order in self.open_orders.values():
+            if order['side'] == 'sell':
+                # Quantity already committed to resting sells can't be sold again
+                self.holdings[order['symbol']] = self.holdings.get(order['symbol'], 0) - self._open_order_quantity(order)
+        self.trades_this_hour = self._recent_trade_count()
+
+        self.tickers = {}
+        if symbols:
+            try:
+                pairs = [f'{symbol}/USD' for symbol in symbols]
+                tickers = self.trade_executor.ticker_source.fetch_tickers(pairs)
+                self.tickers = {pair.split('/')[0]: ticker for pair, ticker in tickers.items()}
+            except Exception as e:
+                logging.error(f"Bulk ticker prefetch failed, fetching them one by one: {e}")
+                self._prefetch_tickers(symbols)
+
+        self.lane = ThreadPoolExecutor(max_workers=1, thread_name_prefix='order')
+        self.results = []
+
+    def _prefetch_tickers(self, symbols):
+        """Fetch tickers in parallel; they're public, so no nonce to keep in order"""
+        source = self.trade_executor.ticker_source
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(symbols)), thread_name_prefix='ticker') as pool:
+            futures = {symbol: pool.submit(source.fetch_ticker, f'{symbol}/USD') for symbol in symbols}
+            for symbol, future in futures.items():
+                try:
+                    self.tickers[symbol] = future.result()
+                except Exception as e:
+                    logging.error(f"Error prefetching ticker for {symbol}, its market orders will fetch their own: {e}")
+
+    def _ticker(self, symbol):
+        if symbol not in self.tickers:
+            self.tickers[symbol] = self.trade_executor.ticker_source.fetch_ticker(f'{symbol}/USD')
+        return self.tickers[symbol]
+
+    # --- checks -----------------------------------------------------------
+
+    def _check_size(self, command, price):
+        if command.amount < self.min_order_usd:
+            return f"${command.amount:.2f} is below the ${self.min_order_usd:.2f} minimum order"
+        minimum = self.min_order_amounts.get(command.symbol)
+        if minimum and command.amount / price < minimum:
+            return f"{command.amount / price:.8f} {command.symbol} is below the exchange minimum of {minimum}"
+        return None
+
+    def check(self, command):
+        """Reason the command can't go through, or None; accepted commands update the snapshot"""
+        if command.name == 'cancel_order':
+            order = self.open_orders.pop(str(command.order_id), None)
+            if order is None:
+                return f"no open order {command.order_id}"
+            if order['side'] == 'sell':
+                self.holdings[order['symbol']] = self.holdings.get(order['symbol'], 0) + self._open_order_quantity(order)
+            # Cash held by a mock buy is only returned once the cancel goes through, so it isn't counted here
+            return None
+
+        if self.trades_this_hour >= self.max_trades_per_hour:
+            return f"already {self.trades_this_hour} trades in the last hour (max {self.max_trades_per_hour})"
+
+        is_buy = command.name.startswith('buy')
+        if command.limit:
+            price = command.limit
+        else:
+            ticker = self._ticker(command.symbol)
+            price = ticker['ask'] if is_buy else ticker['bid']
+
+        reason = self._check_size(command, price)
+        if reason:
+            return reason
+
+        if is_buy:
+            cost = command.amount * (1 + self.fee_rate)
+            if cost > self.cash + 1e-9:
+                return f"needs ${cost:.2f}, ${self.cash:.2f} available"
+            self.cash -= cost
+        else:
+            quantity = command.amount / price
+            available = self.holdings.get(command.symbol, 0)
+            if quantity > available + 1e-12:
+                return f"needs {quantity:.8f} {command.symbol}, {max(available, 0):.8f} available"
+            self.holdings[command.symbol] = available - quantity
+        self.trades_this_hour += 1
+        return None
+
+    # --- dispatch ---------------------------------------------------------
+
+    def _call(self, command):
+        executor = self.trade_executor
+        if command.name == 'buy_crypto_price':
+            return executor.execute_buy_market(command.symbol, command.amount, command.summary, ticker=self.tickers.get(command.symbol))
+        if command.name == 'sell_crypto_price':
+            return executor.execute_sell_market(command.symbol, command.amount, command.summary, ticker=self.tickers.get(command.symbol))
+        if command.name == 'buy_crypto_limit':
+            return executor.execute_buy_limit(command.symbol, command.amount, command.summary, command.limit)
+        if command.name == 'sell_crypto_limit':
+            return executor.execute_sell_limit(command.symbol, command.amount, command.summary, command.limit)
+        return executor.cancel_order(command.order_id)
+
+    def _run(self, command):
+        logging.info(f"Executing {command}")
+        try:
+            with metrics.span('order', command=command.name):
+                return bool(self._call(command))
+        except Exception as e:
+            logging.error(f"Error executing command {command.name}: {e}")
+            return False
+
+    def submit(self, command):
+        """Check a command and, if it passes, dispatch it; returns the rejection reason or None"""
+        if command.name == 'do_nothing':
+            return None
+        try:
+            reason = self.check(command)
+        except Exception as e:
+            reason = f"pre-trade check failed: {e}"
+        if reason:
+            logging.warning(f"Rejected {command}: {reason}")
+            metrics.count('orders_rejected', command=command.name)
+            self.results.append((command, None, reason))
+            return reason
+
+        future = self.lane.submit(self._run, command)
+        self.results.append((command, future, None))
+        return None
+
+    def finish(self):
+        self.lane.shutdown(wait=True)
+        results = []
+        for command, future, reason in self.results:
+            if future is None:
+                results.append((command, False, reason))
+            else:
+                ok = future.result()
+                results.append((command, ok, None if ok else 'execution failed'))
+        return results
+
+    def execute(self, commands):
+        """Check and dispatch a whole batch; returns [(command, ok, reason)]"""
+        market_symbols = {command.symbol for command in commands if command.name in ('buy_crypto_price', 'sell_crypto_price')}
+        self.begin(sorted(market_symbols))
+        for command in commands:
+            self.submit(command)
+        return self.finish()
@@ -0,0 +1,403 @@
+import math
+from collections import deque
+
+NAN = float('nan')
+
+# Each accumulator mirrors the arithmetic pandas uses for the matching `ta`
+# indicator (ewm with adjust=False, Kahan-compensated rolling sums, Welford
+# rolling variance) so the streaming values agree with the `ta` path when both
+# see the same candles. `push` commits a closed value; `peek` returns what the
+# indicator would read if the value were pushed, without changing any state.
+#
+# The `ta` path restarts its EMAs at the oldest candle in the window each cycle,
+# while this engine keeps every candle it has folded in. The difference decays by
+# (1 - alpha) per candle of window (13/14 for RSI, 25/27 for the slow MACD EMA), so
+# with at least PARITY_LOOKBACK candles it is below double precision noise.
+PARITY_LOOKBACK = 400
+
+class EMA:
+    def __init__(self, span=None, alpha=None, min_periods=0):
+        self.alpha = alpha if alpha is not None else 2.0 / (span + 1.0)
+        self.min_periods = min_periods
+        self.count = 0
+        self.weighted = None
+
+    def _next(self, value):
+        if self.weighted is None:
+            return value
+        if self.weighted == value:
+            return value
+        old_wt = 1.0 - self.alpha
+        return (old_wt * self.weighted + self.alpha * value) / (old_wt + self.alpha)
+
+    def _result(self, weighted, count):
+        return weighted if count >= self.min_periods else NAN
+
+    def push(self, value):
+        self.weighted = self._next(value)
+        self.count += 1
+        return self._result(self.weighted, self.count)
+
+    def peek(self, value):
+        return self._result(self._next(value), self.count + 1)
+
+    @property
+    def value(self):
+        if self.weighted is None:
+            return NAN
+        return self._result(self.weighted, self.count)
+
+
+class RollingSum:
+    """
+    Fixed-window sum/mean with separate add/remove Kahan compensation. NaNs take a
+    slot in the window but are left out of the sum and the observation count, so a
+    window holding one is NaN until it slides out, as with pandas' min_periods.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.nobs = 0  # non-NaN values in the window
+        self.sum_x = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.neg_ct = 0
+        self.same_ct = 0
+        self.prev_value = None  # last non-NaN value
+
+    @staticmethod
+    def _kahan(sum_x, comp, value):
+        y = value - comp
+        t = sum_x + y
+        return t, t - sum_x - y
+
+    def _state_after(self, value):
+        nobs, sum_x, comp_remove, neg_ct = self.nobs, self.sum_x, self.comp_remove, self.neg_ct
+        if len(self.values) == self.window:
+            old = self.values[0]
+            if not math.isnan(old):
+                nobs -= 1
+                sum_x, comp_remove = self._kahan(sum_x, comp_remove, -old)
+                if math.copysign(1.0, old) < 0:
+                    neg_ct -= 1
+        comp_add, same_ct, prev_value = self.comp_add, self.same_ct, self.prev_value
+        if not math.isnan(value):
+            nobs += 1
+            sum_x, comp_add = self._kahan(sum_x, comp_add, value)
+            if math.copysign(1.0, value) < 0:
+                neg_ct += 1
+            same_ct = same_ct + 1 if value == prev_value else 1
+            prev_value = value
+        return nobs, sum_x, comp_add, comp_remove, neg_ct, same_ct, prev_value
+
+    def _mean(self, sum_x, nobs, neg_ct, same_ct, last):
+        if nobs < self.window:
+            return NAN
+        if same_ct >= nobs:
+            return last
+        result = sum_x / nobs
+        if neg_ct == 0 and result < 0:
+            return 0.0
+        if neg_ct == nobs and result > 0:
+            return 0.0
+        return result
+
+    def push(self, value):
+        (self.nobs, self.sum_x, self.comp_add, self.comp_remove, self.neg_ct, self.same_ct,
+         self.prev_value) = self._state_after(value)
+        if len(self.values) == self.window:
+            self.values.popleft()
+        self.values.append(value)
+
+    def _sum(self, sum_x, nobs, same_ct, last):
+        if nobs < self.window:
+            return NAN
+        return last * nobs if same_ct >= nobs else sum_x
+
+    def peek_sum(self, value):
+        nobs, sum_x, _, _, _, same_ct, last = self._state_after(value)
+        return self._sum(sum_x, nobs, same_ct, last)
+
+    def peek_mean(self, value):
+        nobs, sum_x, _, _, neg_ct, same_ct, last = self._state_after(value)
+        return self._mean(sum_x, nobs, neg_ct, same_ct, last)
+
+    @property
+    def sum(self):
+        return self._sum(self.sum_x, self.nobs, self.same_ct, self.prev_value)
+
+    @property
+    def mean(self):
+        if not self.values:
+            return NAN
+        return self._mean(self.sum_x, self.nobs, self.neg_ct, self.same_ct, self.prev_value)
+
+
+class RollingVariance:
+    """Fixed-window population variance using Welford add/remove updates"""
+
+    def __init__(self, window, ddof=0):
+        self.window = window
+        self.ddof = ddof
+        self.values = deque()
+        self.mean_x = 0.0
+        self.ssqdm_x = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.same_ct = 0
+        self.prev_value = None
+
+    def _state_after(self, value):
+        nobs = len(self.values)
+        mean_x, ssqdm_x, comp_remove = self.mean_x, self.ssqdm_x, self.comp_remove
+        if nobs == self.window:
+            old = self.values[0]
+            nobs -= 1
+            if nobs:
+                prev_mean = mean_x - comp_remove
+                y = old - comp_remove
+                t = y - mean_x
+                comp_remove = t + mean_x - y
+                mean_x = mean_x - t / nobs
+                ssqdm_x = ssqdm_x - (old - prev_mean) * (old - mean_x)
+            else:
+                mean_x = ssqdm_x = 0.0
+
+        same_ct = self.same_ct + 1 if value == self.prev_value else 1
+        nobs += 1
+        prev_mean = mean_x - self.comp_add
+        y = value - self.comp_add
+        t = y - mean_x
+        comp_add = t + mean_x - y
+        mean_x = mean_x + t / nobs
+        ssqdm_x = ssqdm_x + (value - prev_mean) * (value - mean_x)
+        return nobs, mean_x, ssqdm_x, comp_add, comp_remove, same_ct
+
+    def _variance(self, nobs, ssqdm_x, same_ct):
+        if nobs < self.window or nobs <= self.ddof:
+            return NAN
+        if nobs == 1 or same_ct >= nobs:
+            return 0.0
+        return ssqdm_x / (nobs - self.ddof)
+
+    def push(self, value):
+        nobs, self.mean_x, self.ssqdm_x, self.comp_add, self.comp_remove, self.same_ct = self._state_after(value)
+        if len(self.values) == self.window:
+            self.values.popleft()
+        self.values.append(value)
+        self.prev_value = value
+
+    def peek_std(self, value):
+        nobs, _, ssqdm_x, _, _, same_ct = self._state_after(value)
+        variance = self._variance(nobs, ssqdm_x, same_ct)
+        return math.sqrt(variance) if variance > 0 else (variance if math.isnan(variance) else 0.0)
+
+    @property
+    def std(self):
+        variance = self._variance(len(self.values), self.ssqdm_x, self.same_ct)
+        return math.sqrt(variance) if variance > 0 else (variance if math.isnan(variance) else 0.0)
+
+
+class RollingExtreme:
+    """Rolling max (or min) over a fixed window using a monotonic deque"""
+
+    def __init__(self, window, is_max=True):
+        self.window = window
+        self.is_max = is_max
+        self.index = 0
+        self.candidates = deque()  # (index, value), values monotonic from the front
+
+    def _dominates(self, a, b):
+        return a >= b if self.is_max else a <= b
+
+    def push(self, value):
+        while self.candidates and self._dominates(value, self.candidates[-1][1]):
+            self.candidates.pop()
+        self.candidates.append((self.index, value))
+        if self.candidates[0][0] <= self.index - self.window:
+            self.candidates.popleft()
+        self.index += 1
+
+    def peek(self, value):
+        if self.index + 1 < self.window:
+            return NAN
+        oldest_kept = self.index - self.window + 1
+        for position, candidate in self.candidates:
+            if position >= oldest_kept:
+                return candidate if self._dominates(candidate, value) else value
+        return value
+
+    @property
+    def value(self):
+        if self.index < self.window or not self.candidates:
+            return NAN
+        return self.candidates[0][1]
+
+
+class IndicatorState:
+    """Running indicator state for a single symbol's candle series"""
+
+    def __init__(self, macd_fast=12, macd_slow=26, macd_signal=9, ma_window=20,
+                 rsi_window=14, stoch_window=14, stoch_smooth=3,
+                 bb_window=20, bb_dev=2, vwap_window=14):
+        self.macd_fast = EMA(span=macd_fast, min_periods=macd_fast)
+        self.macd_slow = EMA(span=macd_slow, min_periods=macd_slow)
+        self.macd_signal = EMA(span=macd_signal, min_periods=macd_signal)
+        self.sma = RollingSum(ma_window)
+        self.ema = EMA(span=ma_window, min_periods=ma_window)
+        self.rsi_up = EMA(alpha=1.0 / rsi_window, min_periods=rsi_window)
+        self.rsi_down = EMA(alpha=1.0 / rsi_window, min_periods=rsi_window)
+        self.stoch_high = RollingExtreme(stoch_window, is_max=True)
+        self.stoch_low = RollingExtreme(stoch_window, is_max=False)
+        self.stoch_d = RollingSum(stoch_smooth)
+        self.bb_mean = RollingSum(bb_window)
+        self.bb_var = RollingVariance(bb_window)
+        self.bb_dev = bb_dev
+        self.vwap_pv = RollingSum(vwap_window)
+        self.vwap_volume = RollingSum(vwap_window)
+        self.last_close = None
+        self.last_timestamp = None
+
+    def _macd(self, fast, slow):
+        # The signal EMA only starts once MACD itself is defined
+        return fast - slow if not (math.isnan(fast) or math.isnan(slow)) else NAN
+
+    def _directions(self, close):
+        if self.last_close is None:
+            return 0.0, 0.0
+        diff = close - self.last_close
+        return (diff if diff > 0 else 0.0), (-diff if diff < 0 else 0.0)
+
+    def _stoch_k(self, close, high, low):
+        if math.isnan(high) or math.isnan(low) or high == low:
+            return NAN
+        return 100 * (close - low) / (high - low)
+
+    def _snapshot(self, candle, commit):
+        timestamp, open_, high, low, close, volume = candle[:6]
+        up, down = self._directions(close)
+        typical_pv = (high + low + close) / 3.0 * volume
+
+        if commit:
+            fast = self.macd_fast.push(close)
+            slow = self.macd_slow.push(close)
+            macd = self._macd(fast, slow)
+            signal = self.macd_signal.push(macd) if not math.isnan(macd) else self.macd_signal.value
+            self.sma.push(close)
+            sma = self.sma.mean
+            ema = self.ema.push(close)
+            emaup = self.rsi_up.push(up)
+            emadn = self.rsi_down.push(down)
+            self.stoch_high.push(high)
+            self.stoch_low.push(low)
+            stoch_k = self._stoch_k(close, self.stoch_high.value, self.stoch_low.value)
+            # %K is NaN over a flat (high == low) window; %D stays NaN until that slides out
+            self.stoch_d.push(stoch_k)
+            stoch_d = self.stoch_d.mean
+            self.bb_mean.push(close)
+            self.bb_var.push(close)
+            bb_mid, bb_std = self.bb_mean.mean, self.bb_var.std
+            self.vwap_pv.push(typical_pv)
+            self.vwap_volume.push(volume)
+            total_pv, total_volume = self.vwap_pv.sum, self.vwap_volume.sum
+            self.last_close = close
+            self.last_timestamp = timestamp
+        else:
+            fast = self.macd_fast.peek(close)
+            slow = self.macd_slow.peek(close)
+            macd = self._macd(fast, slow)
+            signal = self.macd_signal.peek(macd) if not math.isnan(macd) else self.macd_signal.value
+            sma = self.sma.peek_mean(close)
+            ema = self.ema.peek(close)
+            emaup = self.rsi_up.peek(up)
+            emadn = self.rsi_down.peek(down)
+            stoch_k = self._stoch_k(close, self.stoch_high.peek(high), self.stoch_low.peek(low))
+            stoch_d = self.stoch_d.peek_mean(stoch_k)
+            bb_mid, bb_std = self.bb_mean.peek_mean(close), self.bb_var.peek_std(close)
+            total_pv, total_volume = self.vwap_pv.peek_sum(typical_pv), self.vwap_volume.peek_sum(volume)
+
+        if emadn == 0:
+            rsi = 100.0
+        else:
+            rsi = 100 - (100 / (1 + emaup / emadn))
+
+        return {
+            'trend': {
+                'macd': {
+                    'value': macd,
+                    'signal': signal,
+                    'histogram': macd - signal
+                },
+                'sma_20': sma,
+                'ema_20': ema
+            },
+            'momentum': {
+                'rsi': rsi,
+                'stochastic': {
+                    'k': stoch_k,
+                    'd': stoch_d
+                }
+            },
+            'volatility': {
+                'bollinger_bands': {
+                    'high': bb_mid + self.bb_dev * bb_std,
+                    'mid': bb_mid,
+                    'low': bb_mid - self.bb_dev * bb_std
+                }
+            },
+            'volume': {
+                'vwap': total_pv / total_volume if total_volume else NAN
+            },
+            'price': {
+                'current': close,
+                'open': open_,
+                'high': high,
+                'low': low
+            }
+        }
+
+    def close_candle(self, candle):
+        """Fold a closed candle into the running state and return its indicators"""
+        return self._snapshot(candle, commit=True)
+
+    def tick(self, candle):
+        """Indicators for a still-open candle; the running state is left untouched"""
+        return self._snapshot(candle, commit=False)
+
+
+class IndicatorEngine:
+    """Keeps an IndicatorState per symbol and feeds it from candle lists"""
+
+    def __init__(self, **indicator_params):
+        self.indicator_params = indicator_params
+        self.states = {}
+
+    def update(self, symbol, ohlcv):
+        """
+        Bring a symbol's state up to date from its candles (oldest first).
+        Every candle but the last is treated as closed; the last one is the
+        currently open candle and is only evaluated, never committed.
+        """
+        if not ohlcv:
+            return None
+        state = self.states.get(symbol)
+        if state is None:
+            state = self.states[symbol] = IndicatorState(**self.indicator_params)
+
+        for candle in ohlcv[:-1]:
+            if state.last_timestamp is None or candle[0] > state.last_timestamp:
+                state.close_candle(candle)
+
+        open_candle = ohlcv[-1]
+        if state.last_timestamp is not None and open_candle[0] <= state.last_timestamp:
+            # The window moved backwards (e.g. the candle store refetched); rebuild from scratch
+            self.reset(symbol)
+            return self.update(symbol, ohlcv)
+        return state.tick(open_candle)
+
+    def reset(self, symbol=None):
+        if symbol is None:
+            self.states = {}
+        else:
+            self.states.pop(symbol, None)
@@ -1,14 +1,87 @@
 from datetime import datetime
 import logging
+import threading
+import time
+
+from src.trading.trade_ledger import TradeLedger
 
 class LivePortfolio:
-    def __init__(self, exchange):
+    def __init__(self, exchange, market_feed=None, cache_ttl=60, ledger_file=None, ledger_lookback_days=7):
         self.exchange = exchange
+        self.ticker_source = market_feed or exchange
         self.trade_history = []
+        self.ledger = TradeLedger(exchange, ledger_file, initial_lookback_days=ledger_lookback_days)
+
+        # Account snapshot shared by balance/position/value reads until it expires
+        # or an order changes it
+        self.cache_ttl = cache_ttl
+        self.snapshot = None
+        self.snapshot_time = 0
+        # Bumped by invalidate(): a fetch that started before an order can't cache what it saw
+        self.generation = 0
+        self.lock = threading.Lock()  # guards the snapshot fields
+        self.fetch_lock = threading.Lock()  # one fetch at a time; concurrent readers share it
+
+    def invalidate(self):
+        """Drop the cached account state; the next read refetches it"""
+        with self.lock:
+            self.snapshot = None
+            self.generation += 1
+
+    def _fetch_snapshot(self):
+        balance = self.exchange.fetch_balance()
+
+        # Skip USD and zero balances, and assets with no USD market (e.g. staking variants)
+        # Loaded once at startup; load_markets() would cost a rate-limit token every snapshot
+        markets = self.exchange.markets or self.exchange.load_markets()
+        assets = [
+            symbol for symbol, amount in balance['total'].items()
+            if symbol not in ('USD', 'ZUSD') and float(amount or 0) > 0
+        ]
+        for symbol in assets:
+            if f'{symbol}/USD' not in markets:
+                logging.debug(f"No USD market for {symbol}, leaving it out of positions")
+        pairs = [f'{symbol}/USD' for symbol in assets if f'{symbol}/USD' in markets]
+
+        tickers = {}
+        if pairs:
+            try:
+                tickers = self.ticker_source.fetch_tickers(pairs)
+            except Exception as e:
+                logging.error(f"Bulk ticker fetch failed, fetching positions one by one: {e}")
+                for pair in pairs:
+                    try:
+                        tickers[pair] = self.ticker_source.fetch_ticker(pair)
+                    except Exception as e:
+                        logging.error(f"Error fetching ticker for {pair}: {e}")
+
+        return {'balance': balance, 'tickers': tickers}
+
+    def _cached_snapshot(self):
+        with self.lock:
+            if self.snapshot is not None and time.time() - self.snapshot_time <= self.cache_ttl:
+                return self.snapshot, self.generation
+            return None, self.generation
+
+    def get_snapshot(self):
+        snapshot, _ = self._cached_snapshot()
+        if snapshot is not None:
+            return snapshot
+        with self.fetch_lock:
+            # Another reader may have fetched while this one waited
+            snapshot, generation = self._cached_snapshot()
+            if snapshot is not None:
+                return snapshot
+            snapshot = self._fetch_snapshot()
+            with self.lock:
+                if self.generation == generation:
+                    self.snapshot = snapshot
+                    self.snapshot_time = time.time()
+            return snapshot
 
     def get_balance(self):
         try:
-            balance = self.exchange.fetch_balance()
+            balance = self.get_snapshot()['balance']
             return float(balance['USD']['free'])
         except Exception as e:
             logging.error(f"Error fetching balance: {e}")
@@ -16,30 +89,29 @@ class LivePortfolio:
 
     def get_positions(self):
         try:
-            balance = self.exchange.fetch_balance()
+            snapshot = self.get_snapshot()
             positions = []
             
-            for symbol, balance_data in balance['total'].items():
-                # Skip USD and zero balances
-                if symbol != 'ZUSD' and float(balance_data) > 0:
-                    try:
-                        ticker = self.exchange.fetch_ticker(f'{symbol}/USD')
-                        positions.append({
-                            'symbol': symbol,
-                            'quantity': float(balance_data),
-                            'dollar_amount': float(balance_data) * ticker['last']
-                        })
-                    except Exception as e:
-                        logging.error(f"Error fetching ticker for {symbol}: {e}")
-                        continue
+            for symbol, balance_data in snapshot['balance']['total'].items():
+                ticker = snapshot['tickers'].get(f'{symbol}/USD')
+                if ticker is None:
+                    continue
+                positions.append({
+                    'symbol': symbol,
+                    'quantity': float(balance_data),
+                    'dollar_amount': float(balance_data) * ticker['last']
+                })
             return positions
         except Exception as e:
             logging.error(f"Error fetching positions: {e}")
             return []
 
+    # Orders are sized in USD like MockPortfolio's; Kraken wants the base quantity
+
     def create_market_buy_order(self, symbol, amount, price):
         try:
-            order = self.exchange.create_market_buy_order(f'{symbol}/USD', amount, {'trading_agreement': 'agree'})
+            order = self.exchange.create_market_buy_order(f'{symbol}/USD', amount / price, {'trading_agreement': 'agree'})
+            self.invalidate()
             return {
                 'symbol': symbol,
                 'amount': float(order['cost']),
@@ -52,7 +124,8 @@ class LivePortfolio:
 
     def create_market_sell_order(self, symbol, amount, price):
         try:
-            order = self.exchange.create_market_sell_order(f'{symbol}/USD', amount, {'trading_agreement': 'agree'})
+            order = self.exchange.create_market_sell_order(f'{symbol}/USD', amount / price, {'trading_agreement': 'agree'})
+            self.invalidate()
             return {
                 'symbol': symbol,
                 'amount': float(order['cost']),
@@ -65,7 +138,8 @@ class LivePortfolio:
 
     def create_limit_buy_order(self, symbol, amount, limit_price):
         try:
-            order = self.exchange.create_limit_buy_order(f'{symbol}/USD', amount, limit_price, {'trading_agreement': 'agree'})
+            order = self.exchange.create_limit_buy_order(f'{symbol}/USD', amount / limit_price, limit_price, {'trading_agreement': 'agree'})
+            self.invalidate()
             return order
         except Exception as e:
             logging.error(f"Error creating limit buy order: {e}")
@@ -73,7 +147,8 @@ class LivePortfolio:
 
     def create_limit_sell_order(self, symbol, amount, limit_price):
         try:
-            order = self.exchange.create_limit_sell_order(f'{symbol}/USD', amount, limit_price, {'trading_agreement': 'agree'})
+            order = self.exchange.create_limit_sell_order(f'{symbol}/USD', amount / limit_price, limit_price, {'trading_agreement': 'agree'})
+            self.invalidate()
             return order
         except Exception as e:
             logging.error(f"Error creating limit sell order: {e}")
@@ -87,7 +162,9 @@ class LivePortfolio:
                 'symbol': order['symbol'].split('/')[0],
                 'type': order['type'],
                 'side': order['side'],
-                'amount': float(order['amount']),
+                'amount': float(order['amount']) * float(order['price']),
+                'quantity': float(order['amount']),
+                'filled_quantity': float(order.get('filled') or 0),
                 'price': float(order['price'])
             } for order in orders]
         except Exception as e:
@@ -96,7 +173,9 @@ class LivePortfolio:
 
     def cancel_order(self, order_id):
         try:
-            return self.exchange.cancel_order(order_id)
+            result = self.exchange.cancel_order(order_id)
+            self.invalidate()
+            return result
         except Exception as e:
             logging.error(f"Error canceling order: {e}")
             return False
@@ -118,33 +197,16 @@ class LivePortfolio:
     def get_trade_history(self):
         """Get recent trade history"""
         try:
-            formatted_trades = []
-            # Get trades for each symbol
-            for symbol in ['BTC/USD', 'ETH/USD', 'XRP/USD', 'SOL/USD', 'DOGE/USD', 
-                          'ADA/USD', 'AVAX/USD', 'LINK/USD', 'SHIB/USD', 'XLM/USD', 'XTZ/USD']:
-                trades = self.exchange.fetch_my_trades(symbol, limit=20)
-                for trade in trades:
-                    formatted_trades.append({
-                        'timestamp': trade['datetime'],
-                        'command': 'market_buy' if trade['side'] == 'buy' else 'market_sell',
-                        'symbol': trade['symbol'].split('/')[0],
-                        'amount': float(trade['cost']),  # USD amount
-                        'quantity': float(trade['amount']),  # Crypto amount
-                        'price': float(trade['price']),
-                        'success': True
-                    })
-            
-            # Sort by timestamp and return most recent 20
-            formatted_trades.sort(key=lambda x: x['timestamp'], reverse=True)
-            return formatted_trades[:20]
+            # Only fills newer than the last one in the ledger are fetched
+            self.ledger.sync()
         except Exception as e:
             logging.error(f"Error fetching trade history: {e}")
-            return []
+        return self.ledger.get_recent()
 
     def get_total_portfolio_value(self):
         """Calculate total portfolio value including cash and all crypto positions"""
         try:
-            # Get cash balance
+            # Both reads come from the same cached snapshot
             total_value = self.get_balance()
             
             # Add value of all crypto positions
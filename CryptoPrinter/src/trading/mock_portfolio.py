@@ -1,47 +1,194 @@
+import functools
+import heapq
 import json
 import logging
 import os
+import threading
 from datetime import datetime
 
+# Quantities below this are treated as fully filled/empty
+DUST = 1e-12
+
+def synchronized(method):
+    """Serialize access to portfolio state between market ticks and order execution"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 class MockPortfolio:
-    def __init__(self, initial_balance=10000, data_file='mock_portfolio_data.json'):
+    def __init__(self, initial_balance=10000, data_file='mock_portfolio_data.json', compact_every=500, fee_rate=0.0, clock=None,
+                 trade_history_limit=None):
+        # data_file=None keeps the portfolio in memory only (e.g. for backtests)
         self.data_file = data_file
-        
+        # Every mutation is appended here as one JSON line; the snapshot in data_file
+        # is only rewritten when the journal is compacted
+        self.journal_file = f"{data_file}.journal" if data_file else None
+        # Compaction rewrites the whole snapshot, so its cost grows with the trade history.
+        # With a limit, older trades move to an append-only JSON lines archive instead;
+        # open orders are only the resting ones and stay in the snapshot.
+        self.trade_history_limit = trade_history_limit
+        self.trade_archive_file = f"{data_file}.trades.jsonl" if data_file else None
+        self.trade_archive_bytes = 0  # archive length the snapshot accounts for
+        self.clock = clock or datetime.now  # timestamps for orders and trades
+        self.compact_every = compact_every
+        self.seq = 0  # sequence number of the last applied mutation
+        self.journal_records = 0  # records appended since the last snapshot
+        self.fee_rate = fee_rate  # fraction of each fill's notional charged as a fee
+        self.lock = threading.RLock()
+
+        self.balance = initial_balance
+        self.positions = {}  # {symbol: {'quantity': float, 'average_price': float}}
+        self.orders = {}  # Resting limit orders by id
+        self.sell_reserved = {}  # {symbol: quantity promised to resting sell orders}
+        self.next_order_id = 0
+        self.total_fees = 0.0
+        self.trade_history = []  # List of executed trades
+        self.last_prices = {}  # {symbol: mid price from the latest tick}
+
+        # Per-symbol order books for matching: buy heaps are keyed on -price so the
+        # best bid is on top; ties fill in arrival order. Cancelled/filled orders are
+        # left in the heap and skipped when they surface.
+        self.books = {}  # {symbol: {'buy': [(-price, id)], 'sell': [(price, id)]}}
+
         # Load existing data or create new portfolio
-        if os.path.exists(data_file):
+        has_snapshot = bool(data_file) and os.path.exists(data_file) and os.path.getsize(data_file) > 0
+        if has_snapshot:
             self.load_portfolio()
-        else:
-            self.balance = initial_balance
-            self.positions = {}  # {symbol: {'quantity': float, 'average_price': float}}
-            self.open_orders = []  # List of open limit orders
-            self.trade_history = []  # List of executed trades
+        if self.journal_file and os.path.exists(self.journal_file):
+            self.replay_journal()
+        for order in self.orders.values():
+            self._add_to_book(order)
+            if order['side'] == 'sell':
+                self._reserve(order['symbol'], order['quantity'] - order['filled_quantity'])
+        if not has_snapshot:
             self.save_portfolio()
-            
+
     def load_portfolio(self):
         with open(self.data_file, 'r') as f:
             data = json.load(f)
             self.balance = data['balance']
             self.positions = data['positions']
-            self.open_orders = data['open_orders']
+            for order in data['open_orders']:
+                self._restore_order(order)
             self.trade_history = data.get('trade_history', [])  # backwards compatibility
-            
+            self.seq = data.get('seq', 0)
+            self.total_fees = data.get('total_fees', 0.0)
+            self.trade_archive_bytes = data.get('trade_archive_bytes', 0)
+            # Older files numbered orders by list position; start past anything seen
+            self.next_order_id = data.get('next_order_id', max([order['id'] + 1 for order in data['open_orders']], default=0))
+
+    def replay_journal(self):
+        """Apply journal records newer than the snapshot"""
+        valid_bytes = 0
+        with open(self.journal_file, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-append leaves a torn last line; everything before it is intact.
+                    # Cut it off so new records don't get glued onto the fragment.
+                    logging.error(f"Discarding torn record at the end of {self.journal_file}")
+                    os.truncate(self.journal_file, valid_bytes)
+                    break
+                valid_bytes += len(line)
+                if record['seq'] > self.seq:
+                    self._apply(record)
+                    self.journal_records += 1
+
+    def _restore_order(self, order):
+        # Orders saved before the matching engine only carried a USD amount
+        order.setdefault('quantity', order['amount'] / order['price'])
+        order.setdefault('filled_quantity', 0.0)
+        # They never held cash back either; a negative reservation is simply paid at fill time
+        order.setdefault('reserved', 0.0)
+        if order['status'] == 'open':
+            self.orders[order['id']] = order
+        else:
+            self.orders.pop(order['id'], None)
+
+    def _apply(self, record):
+        if 'balance' in record:
+            self.balance = record['balance']
+        for symbol, details in record.get('positions', {}).items():
+            self.positions[symbol] = details
+        for order in record.get('orders', []):
+            self._restore_order(order)
+        self.trade_history.extend(record.get('trades', []))
+        self.next_order_id = record.get('next_order_id', self.next_order_id)
+        self.total_fees = record.get('total_fees', self.total_fees)
+        self.seq = record['seq']
+
+    def _journal(self, **changes):
+        """Persist one mutation (already applied in memory) as a single journal line"""
+        try:
+            self.seq += 1
+            if not self.journal_file:
+                return
+            record = {'seq': self.seq, **changes}
+            with open(self.journal_file, 'a') as f:
+                f.write(json.dumps(record, separators=(',', ':')) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.journal_records += 1
+            if self.journal_records >= self.compact_every:
+                self.save_portfolio()
+        except Exception as e:
+            print(f"Error saving portfolio data: {e}")
+
+    def _archive_trades(self):
+        """
+        Append the trades beyond trade_history_limit to the trade archive; returns the
+        trades to keep and the archive's new length. Anything past the length the last
+        snapshot recorded was written by a compaction that crashed before its snapshot
+        and is cut off first, since that snapshot's trade history still holds it.
+        """
+        if self.trade_history_limit is None or len(self.trade_history) <= self.trade_history_limit:
+            return self.trade_history, self.trade_archive_bytes
+        split = len(self.trade_history) - self.trade_history_limit
+        with open(self.trade_archive_file, 'ab') as f:
+            f.truncate(self.trade_archive_bytes)
+            f.write(''.join(json.dumps(trade, separators=(',', ':')) + '\n' for trade in self.trade_history[:split]).encode())
+            f.flush()
+            os.fsync(f.fileno())
+            return self.trade_history[split:], f.tell()
+
+    @synchronized
     def save_portfolio(self):
+        """Write a full snapshot and start a new journal"""
+        if not self.data_file:
+            return
         try:
-            with open(self.data_file, 'w') as f:
+            trade_history, trade_archive_bytes = self._archive_trades()
+            # Write to a temp file and rename so a crash never leaves a half-written snapshot.
+            # The journal is truncated afterwards; records it still holds after a crash in
+            # between are at or below the snapshot's seq and are skipped on replay.
+            tmp_file = f"{self.data_file}.tmp"
+            with open(tmp_file, 'w') as f:
                 json.dump({
+                    'seq': self.seq,
                     'balance': self.balance,
                     'positions': self.positions,
-                    'open_orders': self.open_orders,
-                    'trade_history': self.trade_history,
+                    'open_orders': list(self.orders.values()),
+                    'next_order_id': self.next_order_id,
+                    'total_fees': self.total_fees,
+                    'trade_history': trade_history,
+                    'trade_archive_bytes': trade_archive_bytes,
                     'last_updated': datetime.now().isoformat()
-                }, f, indent=2)
+                }, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.data_file)
+            self.trade_history, self.trade_archive_bytes = trade_history, trade_archive_bytes
+            open(self.journal_file, 'w').close()
+            self.journal_records = 0
         except Exception as e:
             print(f"Error saving portfolio data: {e}")
-            
-    def record_trade(self, command, symbol, amount, quantity, price, summary):
-        """Record a single trade with its result"""
-        trade_record = {
-            'timestamp': datetime.now().isoformat(),
+
+    def _trade_record(self, command, symbol, amount, quantity, price, summary):
+        return {
+            'timestamp': self.clock().isoformat(),
             'command': command,
             'success': True,
             'type': 'market' if 'market' in command else 'limit',
@@ -51,144 +198,294 @@ class MockPortfolio:
             'price': price,
             'ai_reasoning': summary
         }
+
+    @synchronized
+    def record_trade(self, command, symbol, amount, quantity, price, summary):
+        """Record a single trade with its result"""
+        trade_record = self._trade_record(command, symbol, amount, quantity, price, summary)
         self.trade_history.append(trade_record)
-        self.save_portfolio()
-        
+        self._journal(trades=[trade_record])
+
+    @synchronized
     def get_balance(self):
         return float(self.balance)
-        
+
+    def _mark_price(self, symbol, details):
+        return self.last_prices.get(symbol, details['average_price'])
+
+    @synchronized
     def get_positions(self):
         return [
             {
                 'symbol': symbol,
                 'quantity': details['quantity'],
-                'dollar_amount': details['quantity'] * details['average_price']
+                'dollar_amount': details['quantity'] * self._mark_price(symbol, details)
             }
             for symbol, details in self.positions.items()
             if details['quantity'] > 0
         ]
 
+    @synchronized
+    def get_total_portfolio_value(self):
+        """Cash, cash held by resting buy orders, and positions at the latest price"""
+        total_value = self.balance + sum(order['reserved'] for order in self.orders.values())
+        for position in self.get_positions():
+            total_value += position['dollar_amount']
+        return float(total_value)
+
+    def _add_to_position(self, symbol, quantity, cost):
+        if symbol not in self.positions:
+            self.positions[symbol] = {'quantity': 0, 'average_price': 0}
+
+        # Update position with new purchase
+        current_value = self.positions[symbol]['quantity'] * self.positions[symbol]['average_price']
+        total_quantity = self.positions[symbol]['quantity'] + quantity
+
+        self.positions[symbol]['average_price'] = (current_value + cost) / total_quantity
+        self.positions[symbol]['quantity'] = total_quantity
+
+    def _reserve(self, symbol, quantity):
+        """Adjust the quantity promised to resting sells; negative releases it"""
+        reserved = self.sell_reserved.get(symbol, 0.0) + quantity
+        if reserved <= DUST:
+            self.sell_reserved.pop(symbol, None)
+        else:
+            self.sell_reserved[symbol] = reserved
+
+    def _available_quantity(self, symbol):
+        """Position size not already promised to resting sell orders"""
+        return self.positions.get(symbol, {}).get('quantity', 0) - self.sell_reserved.get(symbol, 0.0)
+
+    @synchronized
     def create_market_buy_order(self, symbol, amount, price):
         try:
             # Convert amount to float
             amount = float(amount)
             price = float(price)
-            
+
             if amount > self.balance:
                 raise Exception(f"Insufficient funds: have ${self.balance}, need ${amount}")
-                
-            quantity = amount / price
-            if symbol not in self.positions:
-                self.positions[symbol] = {'quantity': 0, 'average_price': 0}
-                
-            # Update position with new purchase
-            current_value = self.positions[symbol]['quantity'] * self.positions[symbol]['average_price']
-            new_value = amount
-            total_quantity = self.positions[symbol]['quantity'] + quantity
-            
-            self.positions[symbol]['average_price'] = (current_value + new_value) / total_quantity
-            self.positions[symbol]['quantity'] = total_quantity
-            
+
+            # The fee comes out of the amount spent
+            fee = amount * self.fee_rate
+            quantity = (amount - fee) / price
+            self._add_to_position(symbol, quantity, amount)
+
             self.balance -= amount
-            
+            self.total_fees += fee
+
             # Save after updating
-            self.save_portfolio()
-            
+            self._journal(balance=self.balance, positions={symbol: self.positions[symbol]}, total_fees=self.total_fees)
+
             return {
                 'symbol': symbol,
                 'amount': amount,
                 'quantity': quantity,
-                'price': price
+                'price': price,
+                'fee': fee
             }
         except Exception as e:
             print(f"Error executing market buy order: {e}")
             return None
-        
+
+    @synchronized
     def create_market_sell_order(self, symbol, amount, price):
         try:
             # Convert amount to float
             amount = float(amount)
             price = float(price)
-            
+
             if symbol not in self.positions or self.positions[symbol]['quantity'] <= 0:
                 raise Exception("No position to sell")
-                
+
             quantity = amount / price
-            if quantity > self.positions[symbol]['quantity']:
-                raise Exception(f"Insufficient crypto quantity: have {self.positions[symbol]['quantity']}, need {quantity}")
-                
+            if quantity > self._available_quantity(symbol):
+                raise Exception(f"Insufficient crypto quantity: have {self._available_quantity(symbol)}, need {quantity}")
+
+            fee = amount * self.fee_rate
             self.positions[symbol]['quantity'] -= quantity
-            self.balance += amount
-            
+            self.balance += amount - fee
+            self.total_fees += fee
+
             # Save after updating
-            self.save_portfolio()
-            
+            self._journal(balance=self.balance, positions={symbol: self.positions[symbol]}, total_fees=self.total_fees)
+
             return {
                 'symbol': symbol,
                 'amount': amount,
                 'quantity': quantity,
-                'price': price
+                'price': price,
+                'fee': fee
             }
         except Exception as e:
             logging.error(f"Error executing market sell order: {e}")
             return None
-        
-    def create_limit_buy_order(self, symbol, amount, limit_price):
-        if amount > self.balance:
-            raise Exception("Insufficient funds")
-            
+
+    def _add_to_book(self, order):
+        book = self.books.setdefault(order['symbol'], {'buy': [], 'sell': []})
+        key = -order['price'] if order['side'] == 'buy' else order['price']
+        heapq.heappush(book[order['side']], (key, order['id']))
+
+    def _new_order(self, symbol, side, amount, limit_price, reserved):
         order = {
-            'id': len(self.open_orders),
+            'id': self.next_order_id,
             'symbol': symbol,
             'type': 'limit',
-            'side': 'buy',
+            'side': side,
             'amount': amount,
             'price': limit_price,
+            'quantity': amount / limit_price,
+            'filled_quantity': 0.0,
+            'reserved': reserved,
             'status': 'open',
-            'created_at': datetime.now().isoformat()
+            'created_at': self.clock().isoformat()
         }
-        self.open_orders.append(order)
-        self.save_portfolio()
+        self.next_order_id += 1
+        self.orders[order['id']] = order
+        self._add_to_book(order)
+        return order
+
+    @synchronized
+    def create_limit_buy_order(self, symbol, amount, limit_price):
+        # Hold the cash (plus the fee) until the order fills or is cancelled, like the exchange does
+        reserved = amount * (1 + self.fee_rate)
+        if reserved > self.balance:
+            raise Exception("Insufficient funds")
+
+        order = self._new_order(symbol, 'buy', amount, limit_price, reserved)
+        self.balance -= reserved
+        self._journal(balance=self.balance, orders=[order], next_order_id=self.next_order_id)
         return order
-        
+
+    @synchronized
     def create_limit_sell_order(self, symbol, amount, limit_price):
         if symbol not in self.positions or self.positions[symbol]['quantity'] <= 0:
             raise Exception("No position to sell")
-            
-        order = {
-            'id': len(self.open_orders),
-            'symbol': symbol,
-            'type': 'limit',
-            'side': 'sell',
-            'amount': amount,
-            'price': limit_price,
-            'status': 'open',
-            'created_at': datetime.now().isoformat()
-        }
-        self.open_orders.append(order)
-        self.save_portfolio()
+        if amount / limit_price > self._available_quantity(symbol):
+            raise Exception(f"Insufficient crypto quantity: have {self._available_quantity(symbol)}, need {amount / limit_price}")
+
+        order = self._new_order(symbol, 'sell', amount, limit_price, 0.0)
+        self._reserve(symbol, order['quantity'])
+        self._journal(orders=[order], next_order_id=self.next_order_id)
         return order
-        
+
+    @synchronized
     def get_open_orders(self):
         return [
             {
                 'id': order['id'],
+                'symbol': order['symbol'],
                 'type': order['type'],
                 'side': order['side'],
-                'quantity': order['amount'],
+                'amount': order['amount'],
+                'quantity': order['quantity'],
+                'filled_quantity': order['filled_quantity'],
                 'price': order['price']
             }
-            for order in self.open_orders
-            if order['status'] == 'open'
+            for order in self.orders.values()
         ]
-        
+
+    @synchronized
     def cancel_order(self, order_id):
-        for order in self.open_orders:
-            if order['id'] == order_id:
-                order['status'] = 'cancelled'
-                self.save_portfolio()
-                return True
-        return False
-        
+        try:
+            order_id = int(order_id)
+        except (TypeError, ValueError):
+            return False
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return False
+        order['status'] = 'cancelled'
+        if order['side'] == 'sell':
+            self._reserve(order['symbol'], -(order['quantity'] - order['filled_quantity']))
+        self.balance += order['reserved']
+        order['reserved'] = 0.0
+        self._journal(balance=self.balance, orders=[order])
+        return True
+
+    def _fill(self, order, quantity):
+        """Fill part or all of a resting order at its limit price"""
+        symbol, price = order['symbol'], order['price']
+        cost = quantity * price
+        fee = cost * self.fee_rate
+
+        if order['side'] == 'buy':
+            self._add_to_position(symbol, quantity, cost + fee)
+            order['reserved'] -= cost + fee
+        else:
+            self.positions[symbol]['quantity'] -= quantity
+            self.balance += cost - fee
+            self._reserve(symbol, -quantity)
+        order['filled_quantity'] += quantity
+        self.total_fees += fee
+
+        if order['quantity'] - order['filled_quantity'] <= DUST:
+            order['status'] = 'filled'
+            if order['side'] == 'sell':
+                self._reserve(symbol, -(order['quantity'] - order['filled_quantity']))
+            # Return whatever rounding left in the reservation
+            self.balance += order['reserved']
+            order['reserved'] = 0.0
+            del self.orders[order['id']]
+
+        trade_record = self._trade_record(
+            f"{order['side']}_limit", symbol, cost, quantity, price, f"Limit order {order['id']} filled"
+        )
+        trade_record['fee'] = fee
+        self.trade_history.append(trade_record)
+        self._journal(
+            balance=self.balance,
+            positions={symbol: self.positions[symbol]},
+            orders=[order],
+            trades=[trade_record],
+            total_fees=self.total_fees
+        )
+
+    def _match_side(self, symbol, side, crosses, liquidity):
+        heap = self.books.get(symbol, {}).get(side)
+        while heap:
+            key, order_id = heap[0]
+            order = self.orders.get(order_id)
+            if order is None:
+                heapq.heappop(heap)  # cancelled or already filled
+                continue
+            if not crosses(order['price']) or (liquidity is not None and liquidity <= DUST):
+                return
+            remaining = order['quantity'] - order['filled_quantity']
+            if side == 'sell':
+                # Never sell more than is actually held
+                remaining = min(remaining, self.positions.get(symbol, {}).get('quantity', 0))
+                if remaining <= DUST:
+                    return
+            quantity = remaining if liquidity is None else min(remaining, liquidity)
+            self._fill(order, quantity)
+            if liquidity is not None:
+                liquidity -= quantity
+            if order['status'] == 'filled':
+                heapq.heappop(heap)
+
+    @synchronized
+    def process_tick(self, symbol, bid, ask, bid_volume=None, ask_volume=None):
+        """
+        Match resting orders against a new best bid/ask. Buys at or above the ask and
+        sells at or below the bid fill at their limit price, best price first, up to
+        the volume available at the top of the book when it is known.
+        """
+        if bid and ask:
+            self.last_prices[symbol] = (bid + ask) / 2
+        if ask:
+            self._match_side(symbol, 'buy', lambda price: price >= ask, ask_volume)
+        if bid:
+            self._match_side(symbol, 'sell', lambda price: price <= bid, bid_volume)
+
+    @synchronized
+    def process_candle(self, symbol, candle):
+        """Match resting orders against a [timestamp, open, high, low, close, volume] candle"""
+        _, _, high, low, close, _ = candle[:6]
+        self._match_side(symbol, 'buy', lambda price: price >= low, None)
+        self._match_side(symbol, 'sell', lambda price: price <= high, None)
+        self.last_prices[symbol] = close
+
+    @synchronized
     def get_trade_history(self):
-        return self.trade_history
\ No newline at end of file
+        """Trades since the last archived ones (see trade_history_limit)"""
+        return list(self.trade_history)
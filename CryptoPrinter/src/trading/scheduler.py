@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import time
+
+from src.utils.metrics import metrics
+
+async def run_every(interval, stage, name, error_delay):
+    """Run `stage` every `interval` seconds; a failure is logged and retried after `error_delay`"""
+    while True:
+        start_time = time.time()
+        try:
+            with metrics.span('stage', stage=name):
+                await stage()
+        except Exception as e:
+            logging.error(f"Error in {name}: {e}")
+            await asyncio.sleep(error_delay)
+            continue
+        await asyncio.sleep(max(0, interval - (time.time() - start_time)))
+
+
+def mid_price(info):
+    if info.get('bid_price') and info.get('ask_price'):
+        return (info['bid_price'] + info['ask_price']) / 2
+    return None
+
+
+class MarketScheduler:
+    """
+    Collects tickers and indicators for the union of every strategy's symbols, each
+    on its own cadence, so exchange load doesn't grow with the number of strategies.
+    Strategies without a fixed list trade `universe`, whose selection is re-read
+    every market data cycle; the websocket feed follows the union as it changes.
+    Registered TradingSchedulers get every new ticker snapshot.
+    """
+
+    def __init__(self, config, market_data, technical_analyzer, universe=None, market_feed=None):
+        self.config = config
+        self.market_data = market_data
+        self.technical_analyzer = technical_analyzer
+        self.universe = universe
+        self.market_feed = market_feed
+        self.schedulers = []  # TradingSchedulers, notified after every ticker snapshot
+        self.universe_symbols = []
+        self.symbols = None
+
+        # Latest output of each stage
+        self.crypto_infos = None
+        self.technical_analysis = None
+        self.ready_lock = asyncio.Lock()
+
+    def update_symbols(self):
+        self.universe_symbols = self.universe.symbols() if self.universe else []
+        symbols = sorted({symbol for scheduler in self.schedulers for symbol in scheduler.symbols()})
+        if symbols != self.symbols:
+            logging.info(f"Collecting market data for {len(symbols)} symbols: {symbols}")
+            if self.market_feed:
+                self.market_feed.set_symbols(symbols)
+        self.symbols = symbols
+
+    async def collect_market_data(self):
+        await asyncio.to_thread(self.update_symbols)
+        self.crypto_infos = await asyncio.to_thread(self.market_data.get_crypto_infos, self.symbols)
+        for scheduler in self.schedulers:
+            await scheduler.on_market_data(self.crypto_infos)
+
+    async def update_indicators(self):
+        if self.symbols is None:
+            await asyncio.to_thread(self.update_symbols)
+        self.technical_analysis = await asyncio.to_thread(self.technical_analyzer.get_all_indicators, self.symbols)
+
+    async def ensure_ready(self):
+        """Stages may not have produced anything yet on startup; fetch once for everyone waiting"""
+        async with self.ready_lock:
+            if self.crypto_infos is None:
+                await self.collect_market_data()
+            if self.technical_analysis is None:
+                await self.update_indicators()
+
+    def snapshot(self, symbols):
+        """Latest tickers and indicators restricted to `symbols`"""
+        return (
+            {symbol: info for symbol, info in self.crypto_infos.items() if symbol in symbols},
+            {symbol: indicators for symbol, indicators in self.technical_analysis.items() if symbol in symbols},
+        )
+
+    async def run(self):
+        await asyncio.gather(
+            run_every(self.config.MARKET_DATA_INTERVAL, self.collect_market_data, 'market data collection', self.config.ERROR_RETRY_DELAY),
+            run_every(self.config.INDICATOR_INTERVAL, self.update_indicators, 'indicator update', self.config.ERROR_RETRY_DELAY),
+        )
+
+
+class TradingScheduler:
+    """
+    Runs one strategy's stages of the trading cycle as coroutines with their own
+    cadence, on top of a shared MarketScheduler. Blocking exchange/LLM calls run in
+    worker threads so a slow request in one stage (or one strategy) never holds up
+    the others. Consultations happen every trade interval, or earlier when a trigger
+    fires (large price move, a limit order filling).
+    """
+
+    def __init__(self, config, market, strategy):
+        self.config = config
+        self.market = market
+        self.strategy = strategy
+        self.portfolio = strategy.portfolio
+        self.trade_interval = strategy.trade_interval or config.TRADE_INTERVAL
+        market.schedulers.append(self)
+
+        self.portfolio_data = None
+
+        self.consult_event = None
+        self.trigger_reason = None
+        self.advice_queue = None
+        self.last_consult_time = 0
+        self.consult_prices = {}  # mid prices at the last consultation
+        self.open_order_ids = None
+
+    def trigger_consultation(self, reason):
+        """Ask for an early consultation; repeated triggers before it runs are merged"""
+        if self.consult_event is None or self.consult_event.is_set():
+            return
+        logging.info(f"[{self.strategy.name}] Consultation triggered: {reason}")
+        self.trigger_reason = reason
+        self.consult_event.set()
+
+    def symbols(self):
+        """The strategy's own symbols, or the universe plus whatever it still holds so it can exit"""
+        if self.strategy.symbols:
+            return self.strategy.symbols
+        held = [position['symbol'] for position in (self.portfolio_data or {}).get('positions', [])]
+        return list(dict.fromkeys([*self.market.universe_symbols, *held]))
+
+    # --- stages -----------------------------------------------------------
+
+    async def on_market_data(self, crypto_infos):
+        symbols = self.symbols()
+        crypto_infos = {symbol: info for symbol, info in crypto_infos.items() if symbol in symbols}
+
+        # Let a simulated portfolio fill its resting limit orders against the new prices
+        if hasattr(self.portfolio, 'process_tick'):
+            for symbol, info in crypto_infos.items():
+                await asyncio.to_thread(self.portfolio.process_tick, symbol, info['bid_price'], info['ask_price'])
+
+        for symbol, info in crypto_infos.items():
+            price, reference = mid_price(info), self.consult_prices.get(symbol)
+            if price and reference:
+                move_pct = (price - reference) / reference * 100
+                if abs(move_pct) >= self.config.PRICE_TRIGGER_PCT:
+                    self.trigger_consultation(f"{symbol} moved {move_pct:+.2f}% since last consultation")
+                    break
+
+    async def refresh_portfolio(self):
+        self.portfolio_data = await asyncio.to_thread(self.strategy.get_portfolio_data)
+
+        open_order_ids = {order['id'] for order in self.portfolio_data['open_orders']}
+        if self.open_order_ids is not None and self.open_order_ids - open_order_ids:
+            self.trigger_consultation(f"Orders no longer open: {sorted(self.open_order_ids - open_order_ids, key=str)}")
+        self.open_order_ids = open_order_ids
+
+    async def consultation_loop(self):
+        while True:
+            next_scheduled = self.last_consult_time + self.trade_interval
+            try:
+                await asyncio.wait_for(self.consult_event.wait(), timeout=max(0, next_scheduled - time.time()))
+                # Triggered early; don't consult more often than MIN_CONSULT_INTERVAL
+                await asyncio.sleep(max(0, self.last_consult_time + self.config.MIN_CONSULT_INTERVAL - time.time()))
+            except asyncio.TimeoutError:
+                self.trigger_reason = 'scheduled'
+
+            try:
+                await self.market.ensure_ready()
+                if self.portfolio_data is None:
+                    await self.refresh_portfolio()
+
+                logging.info(f"[{self.strategy.name}] Starting consultation ({self.trigger_reason})")
+                self.last_consult_time = time.time()
+                crypto_infos, technical_analysis = self.market.snapshot(self.symbols())
+                self.consult_prices = {symbol: mid_price(info) for symbol, info in crypto_infos.items()}
+                with metrics.span('stage', stage='consultation', strategy=self.strategy.name):
+                    advice, cycle = await asyncio.to_thread(
+                        self.strategy.consult, crypto_infos, technical_analysis, self.portfolio_data, self.trigger_reason
+                    )
+                if advice:
+                    # The cycle travels with its advice; the next consultation may start before this one executes
+                    await self.advice_queue.put((advice, cycle))
+            except Exception as e:
+                logging.error(f"[{self.strategy.name}] Error in consultation: {e}")
+            finally:
+                self.consult_event.clear()
+                self.trigger_reason = None
+
+    async def execution_loop(self):
+        while True:
+            advice, cycle = await self.advice_queue.get()
+            try:
+                start_time = time.time()
+                with metrics.span('stage', stage='execution', strategy=self.strategy.name):
+                    await asyncio.to_thread(self.strategy.execute, advice, cycle)
+                logging.info(f"[{self.strategy.name}] Executed advice in {time.time() - start_time:.2f}s")
+                # Reflect the new orders/positions right away instead of waiting for the next refresh.
+                # Orders we just cancelled shouldn't count as fills, so start a fresh baseline.
+                self.open_order_ids = None
+                await self.refresh_portfolio()
+            except Exception as e:
+                logging.error(f"[{self.strategy.name}] Error executing advice: {e}")
+
+    async def run(self):
+        self.consult_event = asyncio.Event()
+        self.advice_queue = asyncio.Queue()
+        await asyncio.gather(
+            run_every(self.config.PORTFOLIO_INTERVAL, self.refresh_portfolio, f'portfolio refresh ({self.strategy.name})', self.config.ERROR_RETRY_DELAY),
+            self.consultation_loop(),
+            self.execution_loop(),
+        )
+
+
+async def run_strategies(market, schedulers):
+    """Shared market stages plus every strategy's own loops, in one event loop"""
+    await asyncio.gather(market.run(), *(scheduler.run() for scheduler in schedulers))
@@ -0,0 +1,199 @@
+import itertools
+import json
+import logging
+import time
+from datetime import datetime
+
+from src.trading.command_parser import parse_and_execute_response, execute_response_stream
+from src.utils.metrics import metrics
+
+def load_strategy_specs(config):
+    """
+    Strategy definitions from STRATEGIES_FILE, a JSON list of objects with a `name`
+    and optional `symbols`, `mode` ('mock' or 'live'), `initial_balance`,
+    `instructions` (extra prompt text), `model`, `temperature` and `trade_interval`.
+    Without `symbols` a strategy trades the current universe. Without a file there is
+    one strategy built from the global settings.
+    """
+    if not config.STRATEGIES_FILE:
+        return [{
+            'name': 'default',
+            'symbols': config.SYMBOLS,
+            'mode': config.TRADING_MODE,
+            'data_file': config.MOCK_PORTFOLIO_FILE,
+        }]
+
+    with open(config.STRATEGIES_FILE, 'r') as f:
+        specs = json.load(f)
+    names = [spec['name'] for spec in specs]
+    if len(set(names)) != len(names):
+        raise Exception(f"Strategy names must be unique: {names}")
+    # Live strategies would share one exchange account and step on each other's orders
+    live = [spec for spec in specs if spec.get('mode', 'mock') == 'live']
+    if len(live) > 1:
+        raise Exception("At most one strategy can trade live")
+    if live and not (config.KRAKEN_API_KEY and config.KRAKEN_API_SECRET):
+        raise Exception("Kraken API key and secret required for live trading")
+    return specs
+
+
+class Strategy:
+    """
+    One account/strategy: its portfolio, advisor and order pipeline, and the consult
+    and execute steps its TradingScheduler drives. Market data and indicators come
+    from the shared MarketScheduler, already restricted to `symbols` (or, when that
+    is None, to the trading universe plus the positions still held).
+    """
+
+    def __init__(self, name, symbols, portfolio, trade_executor, pipeline, advisor, config,
+                 cycle_store=None, trade_interval=None):
+        self.name = name
+        self.symbols = list(symbols) if symbols else None
+        self.portfolio = portfolio
+        self.trade_executor = trade_executor
+        self.pipeline = pipeline
+        self.advisor = advisor
+        self.config = config
+        self.cycle_store = cycle_store
+        self.trade_interval = trade_interval  # None: config.TRADE_INTERVAL
+
+        # Compact AI interaction log, plus the full per-cycle inputs and outputs in the payload archive
+        self.ai_logger = logging.getLogger(f'ai_interactions.{name}')
+        self.payload_logger = logging.getLogger(f'payloads.{name}')
+        self.cycles = itertools.count(1)
+
+    def get_portfolio_data(self):
+        portfolio = self.portfolio
+        with metrics.span('portfolio', call='balance'):
+            balance = float(portfolio.get_balance())
+        with metrics.span('portfolio', call='positions'):
+            positions = portfolio.get_positions()
+        with metrics.span('portfolio', call='open_orders'):
+            open_orders = portfolio.get_open_orders()
+        with metrics.span('portfolio', call='trade_history'):
+            trade_history = portfolio.get_trade_history()
+        with metrics.span('portfolio', call='total_value'):
+            total_value = float(portfolio.get_total_portfolio_value())
+        return {
+            'balance': balance,
+            'positions': positions,
+            'open_orders': open_orders,
+            'trade_history': trade_history,
+            'total_value': total_value
+        }
+
+    def record_cycle(self, cycle, advice):
+        if not self.cycle_store:
+            return
+        # Latest run of each data stage; this cycle's own consultation and execution are in its timings
+        stage_timings = metrics.latest('stage', 'stage')
+        stage_timings.pop('consultation', None)
+        self.cycle_store.record(
+            cycle['started_at'],
+            *cycle['inputs'],
+            response=advice,
+            strategy=self.name,
+            trigger=cycle['trigger'],
+            prompt_hash=self.advisor.last_prompt_hash,
+            results=cycle['results'],
+            success=cycle['success'],
+            timings={**stage_timings, **cycle['timings']}
+        )
+
+    def consult(self, crypto_infos, technical_analysis, portfolio_data, trigger=None):
+        """
+        Ask the advisor; returns (advice, cycle). `cycle` carries this consultation's
+        inputs, results and timings and must be handed to execute() with the advice,
+        as the next consultation can start before this one is executed.
+        """
+        cycle_id = next(self.cycles)
+        cycle = {
+            'id': cycle_id,
+            'started_at': datetime.now(),
+            'trigger': trigger,
+            'inputs': (crypto_infos, technical_analysis, portfolio_data),
+            'results': [],
+            'success': None,
+            'timings': {},
+        }
+        # Serialized on the logging thread; the stages replace these dicts rather than mutate them
+        self.payload_logger.info('consultation', extra={'payload': {
+            'strategy': self.name,
+            'cycle': cycle_id,
+            'market': crypto_infos,
+            'indicators': technical_analysis,
+            'portfolio': portfolio_data,
+        }})
+        self.ai_logger.info(
+            "[%s] Consultation %d: cash $%.2f of $%.2f, %d positions, %d open orders",
+            self.name, cycle_id, portfolio_data['balance'], portfolio_data['total_value'],
+            len(portfolio_data['positions']), len(portfolio_data['open_orders'])
+        )
+
+        # Get AI advice
+        start_time = time.time()
+        if self.config.LLM_STREAMING:
+            # Commands are executed while the rest of the response is still streaming in
+            success, ai_summary, advice = execute_response_stream(
+                self.advisor.stream_advice(crypto_infos, portfolio_data, technical_analysis),
+                self.trade_executor,
+                self.ai_logger,
+                self.pipeline,
+                results=cycle['results']
+            )
+            cycle['success'] = success
+            self.ai_logger.info("[%s] Execution success: %s", self.name, success)
+        else:
+            advice = self.advisor.get_advice(crypto_infos, portfolio_data, technical_analysis)
+
+        self.payload_logger.info('advice', extra={'payload': {'strategy': self.name, 'cycle': cycle_id, 'response': advice}})
+        self.ai_logger.info("[%s] Response:\n%s", self.name, advice)
+        cycle['timings']['advice'] = time.time() - start_time
+        self.ai_logger.info("[%s] Consultation took %.2fs", self.name, cycle['timings']['advice'])
+        if not advice:
+            # Nothing to execute; record the failed consultation now
+            cycle['success'] = False
+            self.record_cycle(cycle, advice)
+
+        request_scheduler = getattr(self.trade_executor.exchange, 'scheduler', None)
+        if request_scheduler:
+            scheduler_metrics = request_scheduler.metrics()
+            logging.info("Exchange requests: %s", scheduler_metrics)
+            for counter, depth in scheduler_metrics['queue_depth'].items():
+                metrics.gauge('exchange_queue_depth', depth, counter=counter)
+        return advice, cycle
+
+    def execute(self, advice, cycle):
+        """Execute the advice of the consultation `cycle` came from, and record that cycle"""
+        start_time = time.time()
+        if not self.config.LLM_STREAMING:
+            success, ai_summary = parse_and_execute_response(
+                advice, self.trade_executor, self.ai_logger, self.pipeline, results=cycle['results']
+            )
+            cycle['success'] = success
+            self.ai_logger.info("[%s] Execution success: %s", self.name, success)
+        cycle['timings']['execution'] = time.time() - start_time
+        self.record_cycle(cycle, advice)
+
+        # Record the portfolio after all commands
+        updated_portfolio = {
+            'balance': float(self.portfolio.get_balance()),
+            'positions': self.portfolio.get_positions(),
+            'open_orders': self.portfolio.get_open_orders()
+        }
+        self.payload_logger.info('portfolio_after', extra={'payload': {
+            'strategy': self.name, 'cycle': cycle['id'], 'portfolio': updated_portfolio
+        }})
+        self.ai_logger.info(
+            "[%s] After execution: cash $%.2f, positions %s, %d open orders",
+            self.name,
+            updated_portfolio['balance'],
+            ', '.join(f"{position['symbol']} ${float(position['dollar_amount']):.2f}" for position in updated_portfolio['positions']) or 'none',
+            len(updated_portfolio['open_orders'])
+        )
+
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            for series, timing in metrics.summary().items():
+                logging.debug(f"{series}: n={timing['count']} p50={timing['p50']:.3f}s p95={timing['p95']:.3f}s p99={timing['p99']:.3f}s")
+        if self.config.METRICS_FILE:
+            metrics.write(self.config.METRICS_FILE)
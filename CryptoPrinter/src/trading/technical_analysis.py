@@ -6,18 +6,24 @@ from ta.momentum import RSIIndicator, StochasticOscillator
 from ta.volatility import BollingerBands
 from ta.volume import VolumeWeightedAveragePrice
 
+from src.data.candle_store import CandleStore
+from src.trading.indicator_engine import IndicatorEngine
+from src.trading import batch_indicators
+from src.utils.metrics import metrics
+
 class TechnicalAnalysis:
-    def __init__(self, exchange):
+    def __init__(self, exchange, candle_store=None, engine='streaming', indicator_params=None):
         self.exchange = exchange
+        self.candle_store = candle_store or CandleStore(exchange)
+        self.engine = engine
+        # Window overrides (see IndicatorState) for the streaming and batch engines
+        self.indicator_params = indicator_params or {}
+        self.indicator_engine = IndicatorEngine(**self.indicator_params)
 
     def calculate_indicators(self, symbol):
         try:
-            # Fetch historical data
-            ohlcv = self.exchange.fetch_ohlcv(
-                f'{symbol}/USD',
-                '15m',  # 15-minute intervals
-                limit=100  # Last 100 candles
-            )
+            # Fetch only the candles that changed since the last cycle
+            ohlcv = self.candle_store.update(symbol)
             
             # Convert to DataFrame
             df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
@@ -98,9 +104,42 @@ class TechnicalAnalysis:
             print(f"Error calculating technical indicators for {symbol}: {e}")
             return None
 
+    def calculate_streaming_indicators(self, symbol):
+        """Same output as calculate_indicators, updated incrementally from running state"""
+        try:
+            ohlcv = self.candle_store.update(symbol)
+            with metrics.span('indicators', engine='streaming'):
+                return self.indicator_engine.update(symbol, ohlcv)
+        except Exception as e:
+            print(f"Error calculating technical indicators for {symbol}: {e}")
+            return None
+
+    def calculate_batch_indicators(self, symbols):
+        """Compute every symbol at once over a single stacked NumPy array"""
+        ohlcv_by_symbol = {}
+        for symbol in symbols:
+            try:
+                ohlcv_by_symbol[symbol] = self.candle_store.update(symbol)
+            except Exception as e:
+                print(f"Error calculating technical indicators for {symbol}: {e}")
+                ohlcv_by_symbol[symbol] = []
+        with metrics.span('indicators', engine='batch'):
+            return batch_indicators.get_all_indicators(ohlcv_by_symbol, **self.indicator_params)
+
     def get_all_indicators(self, symbols):
         """Calculate technical indicators for all symbols"""
+        if self.engine == 'batch':
+            technical_analysis = self.calculate_batch_indicators(symbols)
+            self.candle_store.save()
+            return technical_analysis
+
         technical_analysis = {}
         for symbol in symbols:
-            technical_analysis[symbol] = self.calculate_indicators(symbol)
+            if self.engine == 'streaming':
+                technical_analysis[symbol] = self.calculate_streaming_indicators(symbol)
+            else:
+                # The ta engine's timing includes its candle update
+                with metrics.span('indicators', engine='ta'):
+                    technical_analysis[symbol] = self.calculate_indicators(symbol)
+        self.candle_store.save()
         return technical_analysis
\ No newline at end of file
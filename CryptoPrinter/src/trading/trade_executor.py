@@ -2,14 +2,17 @@ import logging
 import time
 
 class TradeExecutor:
-    def __init__(self, portfolio, exchange):
+    def __init__(self, portfolio, exchange, market_feed=None):
         self.portfolio = portfolio
         self.exchange = exchange
+        # Read execution prices from the websocket cache when there is one
+        self.ticker_source = market_feed or exchange
 
-    def execute_buy_market(self, symbol, amount, summary):
+    def execute_buy_market(self, symbol, amount, summary, ticker=None):
         amount = float(amount)
         try:
-            ticker = self.exchange.fetch_ticker(f'{symbol}/USD')
+            # The execution pipeline passes in a ticker it already fetched for the batch
+            ticker = ticker or self.ticker_source.fetch_ticker(f'{symbol}/USD')
             order = self.portfolio.create_market_buy_order(symbol, amount, ticker['ask'])
             if order:
                 self.portfolio.record_trade("buy_market", symbol, amount, order['quantity'], ticker['ask'], summary)
@@ -19,10 +22,11 @@ class TradeExecutor:
             logging.error(f"Error buying {symbol}: {e}")
             return None
 
-    def execute_sell_market(self, symbol, amount, summary):
+    def execute_sell_market(self, symbol, amount, summary, ticker=None):
         amount = float(amount)
         try:
-            ticker = self.exchange.fetch_ticker(f'{symbol}/USD')
+            # The execution pipeline passes in a ticker it already fetched for the batch
+            ticker = ticker or self.ticker_source.fetch_ticker(f'{symbol}/USD')
             order = self.portfolio.create_market_sell_order(symbol, amount, ticker['bid'])
             if order:
                 self.portfolio.record_trade("sell_market", symbol, amount, order['quantity'], ticker['bid'], summary)
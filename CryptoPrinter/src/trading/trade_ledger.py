@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+from collections import deque
+
+# Kraken's TradesHistory endpoint returns at most 50 fills per page
+KRAKEN_TRADES_PAGE_SIZE = 50
+
+class TradeLedger:
+    """
+    Account-wide fill history synced incrementally from the exchange. Every new fill
+    is appended to a local JSON-lines file; a bounded, time-ordered tail is kept in
+    memory for the prompt. With an empty ledger only the last `initial_lookback_days`
+    are fetched, so an established account doesn't page through its whole history
+    before the first consultation.
+    """
+
+    def __init__(self, exchange, ledger_file=None, tail_size=20, page_size=KRAKEN_TRADES_PAGE_SIZE,
+                 initial_lookback_days=7):
+        self.exchange = exchange
+        self.ledger_file = ledger_file
+        self.page_size = page_size
+        self.initial_lookback_days = initial_lookback_days
+        self.tail = deque(maxlen=tail_size)  # oldest first
+        self.last_timestamp = None
+        self.last_ids = set()  # ids of fills at last_timestamp, to drop them when the next sync overlaps
+
+        if ledger_file and os.path.exists(ledger_file):
+            self.load()
+
+    def load(self):
+        with open(self.ledger_file, 'r') as f:
+            for line in f:
+                try:
+                    self._remember(json.loads(line))
+                except json.JSONDecodeError:
+                    # A crash mid-append can leave a partial last line
+                    logging.error(f"Skipping unreadable line in {self.ledger_file}")
+
+    def _remember(self, fill):
+        if self.last_timestamp is None or fill['timestamp_ms'] > self.last_timestamp:
+            self.last_timestamp = fill['timestamp_ms']
+            self.last_ids = {fill['id']}
+        elif fill['timestamp_ms'] == self.last_timestamp:
+            self.last_ids.add(fill['id'])
+        self.tail.append(fill)
+
+    def _format(self, trade):
+        return {
+            'id': trade['id'],
+            'order_id': trade.get('order'),
+            'timestamp_ms': trade['timestamp'],
+            'timestamp': trade['datetime'],
+            'command': 'market_buy' if trade['side'] == 'buy' else 'market_sell',
+            'symbol': trade['symbol'].split('/')[0],
+            'amount': float(trade['cost']),  # USD amount
+            'quantity': float(trade['amount']),  # Crypto amount
+            'price': float(trade['price']),
+            'success': True
+        }
+
+    def _fetch_new_trades(self):
+        since = self.last_timestamp
+        if since is None and self.initial_lookback_days is not None:
+            since = self.exchange.milliseconds() - int(self.initial_lookback_days * 86400 * 1000)
+        trades = []
+        offset = 0
+        while True:
+            page = self.exchange.fetch_my_trades(None, since=since, params={'ofs': offset})
+            trades.extend(page)
+            if len(page) < self.page_size:
+                return trades
+            offset += len(page)
+
+    def sync(self):
+        """Fetch fills newer than the last one we have and append them to the ledger"""
+        new_fills = []
+        for trade in self._fetch_new_trades():
+            if self.last_timestamp is not None and (
+                trade['timestamp'] < self.last_timestamp
+                or (trade['timestamp'] == self.last_timestamp and trade['id'] in self.last_ids)
+            ):
+                continue
+            new_fills.append(self._format(trade))
+
+        if not new_fills:
+            return []
+
+        new_fills.sort(key=lambda fill: (fill['timestamp_ms'], fill['id']))
+        if self.ledger_file:
+            with open(self.ledger_file, 'a') as f:
+                for fill in new_fills:
+                    f.write(json.dumps(fill, separators=(',', ':')) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        for fill in new_fills:
+            self._remember(fill)
+        return new_fills
+
+    def get_recent(self, limit=None):
+        """Most recent fills, newest first"""
+        recent = list(reversed(self.tail))
+        return recent[:limit] if limit else recent
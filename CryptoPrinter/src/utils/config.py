@@ -13,19 +13,100 @@ class Config:
         
         # Trading Parameters
         self.TRADE_INTERVAL = int(os.getenv('TRADE_INTERVAL', 1800))
+        self.MAX_TRADES_PER_HOUR = int(os.getenv('MAX_TRADES_PER_HOUR', 7))
+        self.MIN_ORDER_USD = float(os.getenv('MIN_ORDER_USD', 0))
+        self.TICKER_CONCURRENCY = int(os.getenv('TICKER_CONCURRENCY', 5))  # parallel ticker fetches; orders go out one at a time
         
-        # Trading Symbols
-        self.SYMBOLS = ["BTC", "ETH", "XRP", "SOL", "DOGE", "ADA", "AVAX", "LINK", "SHIB", "XLM", "XTZ"]
+        # Scheduler cadences (seconds) and early-consultation triggers
+        self.MARKET_DATA_INTERVAL = int(os.getenv('MARKET_DATA_INTERVAL', 60))
+        self.INDICATOR_INTERVAL = int(os.getenv('INDICATOR_INTERVAL', 300))
+        self.PORTFOLIO_INTERVAL = int(os.getenv('PORTFOLIO_INTERVAL', 300))
+        self.MIN_CONSULT_INTERVAL = int(os.getenv('MIN_CONSULT_INTERVAL', 300))
+        self.PRICE_TRIGGER_PCT = float(os.getenv('PRICE_TRIGGER_PCT', 2.0))
+        self.ERROR_RETRY_DELAY = int(os.getenv('ERROR_RETRY_DELAY', 60))
+        self.PORTFOLIO_CACHE_TTL = int(os.getenv('PORTFOLIO_CACHE_TTL', 60))  # seconds live account state is reused
+        
+        # LLM decision gate and response cache
+        self.LLM_GATE_ENABLED = os.getenv('LLM_GATE_ENABLED', 'true').lower() == 'true'
+        self.LLM_GATE_MAX_DISTANCE = int(os.getenv('LLM_GATE_MAX_DISTANCE', 0))  # buckets any input may move and still skip
+        self.LLM_GATE_PRICE_STEP_PCT = float(os.getenv('LLM_GATE_PRICE_STEP_PCT', 0.5))
+        self.LLM_GATE_INDICATOR_STEP = float(os.getenv('LLM_GATE_INDICATOR_STEP', 5))
+        self.LLM_GATE_MAX_SKIPS = int(os.getenv('LLM_GATE_MAX_SKIPS', 3))  # consecutive skips before a forced consultation
+        self.LLM_CACHE_SIZE = int(os.getenv('LLM_CACHE_SIZE', 256))
+        self.LLM_CACHE_SAVE_INTERVAL = float(os.getenv('LLM_CACHE_SAVE_INTERVAL', 300))  # seconds between cache file rewrites
+        self.LLM_PROTOCOL = os.getenv('LLM_PROTOCOL', 'text')  # 'tools' (function calling) or 'text'
+        self.LLM_STREAMING = os.getenv('LLM_STREAMING', 'false').lower() == 'true'  # execute commands as they stream in
+        
+        # Signal screener: only symbols tripping a rule (plus held ones) reach the LLM; nothing flagged skips the call
+        self.SCREENER_ENABLED = os.getenv('SCREENER_ENABLED', 'true').lower() == 'true'
+        self.SCREENER_RSI_LOW = float(os.getenv('SCREENER_RSI_LOW', 30))  # 0 disables
+        self.SCREENER_RSI_HIGH = float(os.getenv('SCREENER_RSI_HIGH', 70))  # 100 disables
+        self.SCREENER_MACD_CROSS = os.getenv('SCREENER_MACD_CROSS', 'true').lower() == 'true'
+        self.SCREENER_BOLLINGER = os.getenv('SCREENER_BOLLINGER', 'true').lower() == 'true'
+        self.SCREENER_VWAP_DEVIATION_PCT = float(os.getenv('SCREENER_VWAP_DEVIATION_PCT', 2.0)) or None  # 0 disables
+        
+        # Exchange request scheduling
+        self.KRAKEN_TIER = os.getenv('KRAKEN_TIER', 'starter')  # 'starter', 'intermediate' or 'pro'
+        
+        # Logging
+        self.LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+        self.PAYLOAD_ARCHIVE_DAYS = int(os.getenv('PAYLOAD_ARCHIVE_DAYS', 30))  # gzipped days of cycle payloads to keep
+        
+        # Metrics export
+        self.METRICS_PORT = int(os.getenv('METRICS_PORT', 0))  # serve Prometheus /metrics on this port; 0 disables
+        
+        # Market Data Feed
+        self.MARKET_FEED_ENABLED = os.getenv('MARKET_FEED_ENABLED', 'true').lower() == 'true'
+        self.KRAKEN_WS_URL = os.getenv('KRAKEN_WS_URL', 'wss://ws.kraken.com')
+        self.TICKER_MAX_AGE = float(os.getenv('TICKER_MAX_AGE', 5))  # seconds before falling back to REST
+        
+        # Strategies: a JSON list of strategy definitions (see load_strategy_specs); unset runs one from the settings here
+        self.STRATEGIES_FILE = os.getenv('STRATEGIES_FILE')
+        
+        # Trading Symbols: a fixed comma-separated list, or unset to trade the top of the universe below
+        self.SYMBOLS = [symbol.strip() for symbol in os.getenv('SYMBOLS', '').split(',') if symbol.strip()] or None
+        
+        # Trading universe, re-ranked by 24h USD volume and spread from one bulk ticker request
+        self.UNIVERSE_SIZE = int(os.getenv('UNIVERSE_SIZE', 11))  # most liquid pairs to trade
+        self.UNIVERSE_MIN_VOLUME_USD = float(os.getenv('UNIVERSE_MIN_VOLUME_USD', 1000000))
+        self.UNIVERSE_MAX_SPREAD_PCT = float(os.getenv('UNIVERSE_MAX_SPREAD_PCT', 0.5))
+        self.UNIVERSE_REFRESH_INTERVAL = int(os.getenv('UNIVERSE_REFRESH_INTERVAL', 900))  # seconds between re-rankings
+        self.UNIVERSE_PINNED = [symbol.strip() for symbol in os.getenv('UNIVERSE_PINNED', '').split(',') if symbol.strip()]
+        self.UNIVERSE_EXCLUDE = [  # stablecoins and fiat: no trend to trade
+            symbol.strip() for symbol in
+            os.getenv('UNIVERSE_EXCLUDE', 'USDT,USDC,DAI,PYUSD,TUSD,USDG,EURT,EUR,GBP,AUD,CAD,CHF,JPY').split(',')
+            if symbol.strip()
+        ]
+        self.MARKETS_CACHE_TTL = int(os.getenv('MARKETS_CACHE_TTL', 86400))  # seconds Kraken's market list is reused from disk
         
         # File Paths
          # File Paths
         self.BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
         self.MOCK_PORTFOLIO_FILE = os.path.join(self.BASE_DIR, 'data', 'mock_portfolio_data.json')
         self.LOG_FILE = os.path.join(self.BASE_DIR, 'logs', 'trading_bot.log')
+        self.CANDLE_CACHE_FILE = os.path.join(self.BASE_DIR, 'data', 'candle_cache.json')
+        self.TRADE_LEDGER_FILE = os.path.join(self.BASE_DIR, 'data', 'live_trades.jsonl')
+        self.TRADE_LEDGER_LOOKBACK_DAYS = float(os.getenv('TRADE_LEDGER_LOOKBACK_DAYS', 7))  # history fetched into an empty ledger
+        self.LLM_CACHE_FILE = os.path.join(self.BASE_DIR, 'data', 'llm_cache.json')
+        self.MARKETS_CACHE_FILE = os.path.join(self.BASE_DIR, 'data', 'markets.json')
+        self.PAYLOAD_ARCHIVE_DIR = os.getenv('PAYLOAD_ARCHIVE_DIR', os.path.join(self.BASE_DIR, 'logs', 'payloads'))
+        self.METRICS_FILE = os.getenv('METRICS_FILE', os.path.join(self.BASE_DIR, 'logs', 'metrics.prom'))
+        self.CYCLE_DB_FILE = os.getenv('CYCLE_DB_FILE', os.path.join(self.BASE_DIR, 'data', 'cycles.db'))
+        self.CYCLE_DB_BATCH = int(os.getenv('CYCLE_DB_BATCH', 50))  # cycles buffered per write; written sooner once a minute has passed
+        self.CANDLE_ARCHIVE_DIR = os.getenv('CANDLE_ARCHIVE_DIR', os.path.join(self.BASE_DIR, 'data', 'candles'))
+        
+        # Technical Analysis
+        self.CANDLE_TIMEFRAME = os.getenv('CANDLE_TIMEFRAME', '15m')
+        # Kraken serves at most 720 candles. The streaming engine remembers candles that
+        # have left the window; below ~400 its EMA, MACD and RSI differ from ta's visibly.
+        self.CANDLE_LOOKBACK = int(os.getenv('CANDLE_LOOKBACK', 720))
+        self.INDICATOR_ENGINE = os.getenv('INDICATOR_ENGINE', 'streaming')  # 'streaming', 'batch' or 'ta'
         
         # Trading Mode
         self.TRADING_MODE = os.getenv('TRADING_MODE', 'mock')  # 'mock' or 'live'
         self.INITIAL_MOCK_BALANCE = float(os.getenv('INITIAL_MOCK_BALANCE', '10000'))
+        self.MOCK_FEE_RATE = float(os.getenv('MOCK_FEE_RATE', '0.0026'))  # Kraken's base taker fee
+        self.MOCK_TRADE_HISTORY_LIMIT = int(os.getenv('MOCK_TRADE_HISTORY_LIMIT', 1000))  # trades kept in the snapshot; older ones are archived
         
         # Validate configuration
         if self.TRADING_MODE == 'live':
@@ -1,15 +1,91 @@
+import atexit
+import glob
+import gzip
+import json
 import logging
 import os
+import queue
+import shutil
 import logging.handlers
+from datetime import datetime
+
+PAYLOAD_FILE = 'payloads.jsonl'
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One compact JSON object per record; a `payload` passed in `extra` is embedded as is"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        payload = getattr(record, 'payload', None)
+        if payload is not None:
+            entry['payload'] = payload
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener untouched. The stock QueueHandler formats the
+    message in the calling thread; here %-args and payloads are only rendered on the
+    listener thread, so callers must not mutate what they log afterwards.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class ExcludeFilter(logging.Filter):
+    def __init__(self, *names):
+        super().__init__()
+        self.names = names
+
+    def filter(self, record):
+        return not any(record.name == name or record.name.startswith(f'{name}.') for name in self.names)
+
+
+def _gzip_rotator(source, dest):
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def payload_archive_handler(directory, backup_days=30):
+    """Daily-rotated JSON lines; finished days are gzipped as payloads.jsonl.YYYY-MM-DD.gz"""
+    os.makedirs(directory, exist_ok=True)
+    handler = logging.handlers.TimedRotatingFileHandler(
+        os.path.join(directory, PAYLOAD_FILE), when='midnight', backupCount=backup_days
+    )
+    handler.namer = lambda name: f'{name}.gz'
+    handler.rotator = _gzip_rotator
+    return handler
+
+
+def setup_logger(level='INFO', payload_dir='logs/payloads', payload_days=30):
+    """
+    Route all logging through a queue to a background listener thread, so log I/O
+    and formatting never run on the trading threads.
+
+    - trading_bot.log: JSON lines, size-rotated
+    - ai_interactions.log: JSON lines from the 'ai_interactions' logger
+    - console: human-readable, everything except payloads
+    - payload archive: the 'payloads' logger's per-cycle records (see iter_payloads)
+    """
+    global _listener
 
-def setup_logger():
     # Create logs directory if it doesn't exist
     if not os.path.exists('logs'):
         os.makedirs('logs')
 
-    # Set up main logger
-    logger = logging.getLogger()
-    logger.setLevel(logging.DEBUG)
+    json_formatter = JsonFormatter()
 
     # File handler with rotation
     file_handler = logging.handlers.RotatingFileHandler(
@@ -17,12 +93,94 @@ def setup_logger():
         maxBytes=10*1024*1024,  # 10MB
         backupCount=5
     )
-    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-    logger.addHandler(file_handler)
+    file_handler.setFormatter(json_formatter)
+    file_handler.addFilter(ExcludeFilter('payloads'))
 
     # Console handler
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-    logger.addHandler(console_handler)
+    console_handler.addFilter(ExcludeFilter('payloads'))
+
+    ai_handler = logging.handlers.RotatingFileHandler(
+        'logs/ai_interactions.log',
+        maxBytes=10*1024*1024,
+        backupCount=5
+    )
+    ai_handler.setFormatter(json_formatter)
+    ai_handler.addFilter(logging.Filter('ai_interactions'))
+
+    archive_handler = payload_archive_handler(payload_dir, payload_days)
+    archive_handler.setFormatter(json_formatter)
+    archive_handler.addFilter(logging.Filter('payloads'))
+
+    log_queue = queue.SimpleQueue()
+    if _listener:
+        _listener.stop()
+    _listener = logging.handlers.QueueListener(
+        log_queue, file_handler, console_handler, ai_handler, archive_handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(_listener.stop)  # flush what's still queued on exit
+
+    # Set up main logger
+    logger = logging.getLogger()
+    logger.setLevel(level)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(DeferredQueueHandler(log_queue))
+
+    # Payloads are always archived, whatever the console/file level
+    logging.getLogger('payloads').setLevel(logging.INFO)
+    logging.getLogger('ai_interactions').setLevel(logging.INFO)
+
+    return logger
+
+
+def _archive_day(path):
+    """Date a payload file covers, from its rotation suffix; today for the live file"""
+    name = os.path.basename(path)
+    if name == PAYLOAD_FILE:
+        return datetime.now().date()
+    return datetime.strptime(name[len(PAYLOAD_FILE) + 1:].split('.')[0], '%Y-%m-%d').date()
+
+
+def iter_payloads(directory='logs/payloads', since=None, until=None, message=None):
+    """
+    Archived records, oldest first, optionally limited to [since, until] datetimes
+    and to one message kind ('consultation', 'advice', ...). Whole days outside the
+    range are skipped without being opened.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, f'{PAYLOAD_FILE}.*')))
+    paths.append(os.path.join(directory, PAYLOAD_FILE))
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        day = _archive_day(path)
+        if (since and day < since.date()) or (until and day > until.date()):
+            continue
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # partial last line of the live file
+                if message and record['msg'] != message:
+                    continue
+                timestamp = datetime.fromisoformat(record['ts'])
+                if (since and timestamp < since) or (until and timestamp > until):
+                    continue
+                yield record
+
+
+if __name__ == "__main__":
+    import argparse
 
-    return logger
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Print archived cycle payloads as JSON lines")
+    parser.add_argument('--dir', default='logs/payloads')
+    parser.add_argument('--since', type=datetime.fromisoformat)
+    parser.add_argument('--until', type=datetime.fromisoformat)
+    parser.add_argument('--message', help="only this record kind, e.g. consultation or advice")
+    args = parser.parse_args()
+    for record in iter_payloads(args.dir, args.since, args.until, args.message):
+        print(json.dumps(record, separators=(',', ':')))
@@ -0,0 +1,221 @@
+import functools
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUANTILES = (0.5, 0.95, 0.99)
+WINDOW = 1024  # latest samples per series used for the quantiles
+
+
+def _series_key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    """Label value escaping of the Prometheus text format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _quantile(samples, q):
+    """Nearest-rank quantile of an already sorted list"""
+    if not samples:
+        return float('nan')
+    return samples[max(0, math.ceil(q * len(samples)) - 1)]
+
+
+class Timing:
+    """Latency samples for one series: running count and sum, plus a window of recent samples for quantiles"""
+
+    def __init__(self, window=WINDOW):
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=window)
+        self.last = None
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        self.samples.append(seconds)
+        self.last = seconds
+
+
+class Metrics:
+    """
+    Process-wide timings, counters and gauges for the trading cycle.
+
+    span() times a block, timed() a function; both count the calls that raised in
+    `<name>_errors_total`. Timings are exported as Prometheus summaries (p50/p95/p99
+    over the latest WINDOW samples, plus `_sum` and `_count`), counters as
+    `<name>_total`. Recording a sample is a perf_counter() pair and one short lock.
+    """
+
+    def __init__(self, prefix='cryptoprinter'):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.counters = {}
+        self.gauges = {}
+        self.server = None
+
+    # --- recording --------------------------------------------------------
+
+    def observe(self, name, seconds, **labels):
+        key = _series_key(name, labels)
+        with self.lock:
+            timing = self.timings.get(key)
+            if timing is None:
+                timing = self.timings[key] = Timing()
+            timing.observe(seconds)
+
+    def count(self, name, value=1, **labels):
+        key = _series_key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[_series_key(name, labels)] = value
+
+    def span(self, name, **labels):
+        return Span(self, name, labels)
+
+    def timed(self, name, **labels):
+        """Decorator form of span()"""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with Span(self, name, labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # --- export -----------------------------------------------------------
+
+    def snapshot(self):
+        with self.lock:
+            timings = {key: (timing.count, timing.sum, list(timing.samples)) for key, timing in self.timings.items()}
+            return timings, dict(self.counters), dict(self.gauges)
+
+    def latest(self, name, label):
+        """{label value: seconds} of the most recent sample of each `name` series"""
+        with self.lock:
+            return {
+                dict(labels).get(label): timing.last
+                for (series, labels), timing in self.timings.items() if series == name
+            }
+
+    def summary(self):
+        """{series: {count, mean, p50, p95, p99}} in seconds, for logging"""
+        timings, _, _ = self.snapshot()
+        result = {}
+        for (name, labels), (count, total, samples) in sorted(timings.items()):
+            samples.sort()
+            series = name + _format_labels(labels)
+            result[series] = {
+                'count': count,
+                'mean': total / count,
+                **{f'p{int(q * 100)}': _quantile(samples, q) for q in QUANTILES},
+            }
+        return result
+
+    def render(self):
+        """Prometheus text exposition format"""
+        timings, counters, gauges = self.snapshot()
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), (count, total, samples) in sorted(timings.items()):
+            metric = f'{self.prefix}_{name}_seconds'
+            declare(metric, 'summary')
+            samples.sort()
+            for q in QUANTILES:
+                lines.append(f'{metric}{_format_labels(labels, [("quantile", q)])} {_quantile(samples, q):.6g}')
+            lines.append(f'{metric}_sum{_format_labels(labels)} {total:.6g}')
+            lines.append(f'{metric}_count{_format_labels(labels)} {count}')
+
+        for (name, labels), value in sorted(counters.items()):
+            metric = f'{self.prefix}_{name}_total'
+            declare(metric, 'counter')
+            lines.append(f'{metric}{_format_labels(labels)} {value}')
+
+        for (name, labels), value in sorted(gauges.items()):
+            metric = f'{self.prefix}_{name}'
+            declare(metric, 'gauge')
+            lines.append(f'{metric}{_format_labels(labels)} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Write the Prometheus text to a file (e.g. for node_exporter's textfile collector)"""
+        try:
+            tmp_file = f"{path}.tmp"
+            with open(tmp_file, 'w') as f:
+                f.write(self.render())
+            os.replace(tmp_file, path)
+        except Exception as e:
+            logging.error(f"Error writing metrics file: {e}")
+
+    def serve(self, port, host='0.0.0.0'):
+        """Serve /metrics over HTTP from a daemon thread"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # scrapes would flood the trading log
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, name='metrics', daemon=True).start()
+        logging.info(f"Serving metrics on http://{host}:{port}/metrics")
+        return self.server
+
+
+class Span:
+    """Times a with-block into a Metrics timing; a raised exception also counts as an error"""
+
+    __slots__ = ('metrics', 'name', 'labels', 'start')
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        if exc_type is not None:
+            self.metrics.count(f'{self.name}_errors', error=exc_type.__name__, **self.labels)
+        return False
+
+
+# Shared registry; modules record into it directly so nothing has to be threaded through constructors
+metrics = Metrics()
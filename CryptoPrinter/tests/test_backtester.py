@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from src.backtest.backtester import Backtester, RsiAdvisor
+from src.backtest.historical_exchange import HistoricalExchange, VirtualClock
+
+TIMEFRAME_MS = 15 * 60 * 1000
+
+
+def arrays(closes):
+    closes = np.array(closes, dtype=np.float64)
+    opens = np.concatenate(([closes[0]], closes[:-1]))
+    return {
+        'timestamp': np.arange(len(closes), dtype=np.int64) * TIMEFRAME_MS,
+        'open': opens,
+        'high': np.maximum(opens, closes),
+        'low': np.minimum(opens, closes),
+        'close': closes,
+        'volume': np.ones(len(closes)),
+    }
+
+
+def test_historical_exchange_never_serves_a_candle_closing_after_the_clock():
+    clock = VirtualClock()
+    exchange = HistoricalExchange({'BTC': arrays(np.arange(1, 21))}, clock)
+
+    for now in (0, TIMEFRAME_MS - 1, TIMEFRAME_MS, TIMEFRAME_MS + 1, 5 * TIMEFRAME_MS + 7, 20 * TIMEFRAME_MS, 30 * TIMEFRAME_MS):
+        clock.now_ms = now
+        closed = min(now // TIMEFRAME_MS, 20)  # candles whose end is at or before now
+        for kwargs in ({}, {'limit': 3}, {'since': 0}, {'since': 3 * TIMEFRAME_MS}, {'since': 3 * TIMEFRAME_MS, 'limit': 2}):
+            rows = exchange.fetch_ohlcv('BTC/USD', '15m', **kwargs)
+            assert all(row[0] + TIMEFRAME_MS <= now for row in rows), (now, kwargs)
+            if closed and 'since' not in kwargs:
+                assert rows[-1][0] == (closed - 1) * TIMEFRAME_MS  # the latest closed candle is included
+
+        if closed:
+            ticker = exchange.fetch_ticker('BTC/USD')
+            assert ticker['timestamp'] <= now
+            assert ticker['last'] == closed  # close of the latest closed candle
+        else:
+            with pytest.raises(Exception):
+                exchange.fetch_ticker('BTC/USD')
+
+
+def rsi_scenario(warmup):
+    """Flat, a ten-candle slide from 99 to 90, then a jump to 200 that holds"""
+    return {'BTC': arrays([100.0] * warmup + list(range(99, 89, -1)) + [200.0] * 10)}
+
+
+@pytest.mark.parametrize('engine', ['streaming', 'batch', 'ta'])
+def test_rsi_advisor_run(engine):
+    lookback = 720
+    backtester = Backtester(rsi_scenario(lookback + 10), RsiAdvisor(), fee_rate=0.0026,
+                            trade_interval=TIMEFRAME_MS // 1000, indicator_engine=engine)
+    assert backtester.lookback == lookback  # the live CANDLE_LOOKBACK default
+    results = backtester.run()
+
+    # The first down candle drives RSI to 0: buy 10% of cash at 99, 0.26% fee out of it.
+    # The jump to 200 drives it past 70: sell what the position is worth, rounded down to the cent.
+    quantity = (1000 - 2.6) / 99
+    sold = np.floor(quantity * 200 * 100) / 100
+    sell_fee = sold * 0.0026
+    cash = 10000 - 1000 + sold - sell_fee
+    assert results['trades'] == 2
+    assert results['total_fees'] == pytest.approx(2.6 + sell_fee)
+    assert results['final_value'] == pytest.approx(cash + (quantity - sold / 200) * 200)
+    assert results['pnl'] == pytest.approx(results['final_value'] - 10000)
+    # Lowest point: the position bought at 99 marked at 90
+    assert results['max_drawdown_pct'] == pytest.approx((10000 - (9000 + quantity * 90)) / 10000 * 100)
+    assert results['decisions'] == results['candles'] == 30
@@ -0,0 +1,119 @@
+import os
+import threading
+
+import ccxt
+import numpy as np
+
+from src.data import candle_archive
+from src.data.candle_archive import COLUMNS, ITEM_SIZE, CandleArchive
+
+KRAKEN = ccxt.kraken()
+MINUTE = 60 * 1000
+
+
+class FakeKraken:
+    """Serves 15m candles up to `now`, refusing timeframes Kraken doesn't offer"""
+
+    def __init__(self, now):
+        self.now = now
+        self.requests = []
+
+    def parse_timeframe(self, timeframe):
+        return KRAKEN.parse_timeframe(timeframe)
+
+    def milliseconds(self):
+        return self.now
+
+    def fetch_ohlcv(self, pair, timeframe, since=None, limit=None):
+        if timeframe not in KRAKEN.timeframes:
+            raise ccxt.BadRequest(f"kraken does not support {timeframe} timeframe")
+        self.requests.append((pair, timeframe, since))
+        step = self.parse_timeframe(timeframe) * 1000
+        start = -(-since // step) * step
+        times = range(start, self.now, step)
+        return [[t, 1.0, 2.0, 0.5, 1.5, 10.0] for t in times][:limit]
+
+
+def test_default_timeframe_is_one_kraken_serves(tmp_path):
+    exchange = FakeKraken(now=10 * 15 * MINUTE + 5 * MINUTE)
+    archive = CandleArchive(exchange, str(tmp_path))
+
+    assert archive.sync('BTC', since=0) == 10  # the 11th candle is still forming
+    assert exchange.requests == [('BTC/USD', '15m', 0)]
+    assert list(archive.range('BTC')['timestamp']) == [i * 15 * MINUTE for i in range(10)]
+
+    # Picks up after the last archived candle
+    exchange.now += 30 * MINUTE
+    assert archive.sync('BTC', since=0) == 2
+    assert exchange.requests[-1] == ('BTC/USD', '15m', 10 * 15 * MINUTE)
+
+
+def candles(start, count, step=15 * MINUTE):
+    return [[start + i * step, 1.0 + i, 2.0 + i, 0.5 + i, 1.5 + i, 10.0 + i] for i in range(count)]
+
+
+def file_sizes(archive, symbol):
+    return {column: os.path.getsize(archive._path(symbol, column)) for column in COLUMNS}
+
+
+def test_reader_during_an_append_sees_committed_rows_and_leaves_the_files_alone(tmp_path, monkeypatch):
+    writer = CandleArchive(None, str(tmp_path))
+    writer.append('BTC', candles(0, 3))
+
+    # Pause the writer after its OHLCV columns are on disk, before the timestamps
+    ohlcv_written, resume = threading.Event(), threading.Event()
+    fsyncs = []
+    real_fsync = os.fsync
+
+    def fsync(fd):
+        real_fsync(fd)
+        fsyncs.append(fd)
+        if len(fsyncs) == len(COLUMNS) - 1:
+            ohlcv_written.set()
+            resume.wait(5)
+
+    monkeypatch.setattr(candle_archive.os, 'fsync', fsync)
+    thread = threading.Thread(target=writer.append, args=('BTC', candles(3 * 15 * MINUTE, 2)))
+    thread.start()
+    assert ohlcv_written.wait(5)
+
+    reader = CandleArchive(None, str(tmp_path))  # e.g. a backtest in another process
+    before = file_sizes(reader, 'BTC')
+    columns = reader.columns('BTC')
+    assert {column: len(values) for column, values in columns.items()} == {column: 3 for column in COLUMNS}
+    assert list(columns['close']) == [1.5, 2.5, 3.5]
+    assert file_sizes(reader, 'BTC') == before  # nothing truncated under the writer
+
+    resume.set()
+    thread.join()
+    columns = CandleArchive(None, str(tmp_path)).columns('BTC')
+    assert list(columns['timestamp']) == [i * 15 * MINUTE for i in range(5)]
+    assert list(columns['close']) == [1.5, 2.5, 3.5, 1.5, 2.5]
+
+
+def test_writer_repairs_columns_left_by_a_crashed_append(tmp_path):
+    archive = CandleArchive(None, str(tmp_path))
+    archive.append('BTC', candles(0, 2))
+    with open(archive._path('BTC', 'close'), 'ab') as f:
+        f.write(np.array([99.0]).tobytes())  # crash after one column of the next append
+
+    assert archive.append('BTC', candles(2 * 15 * MINUTE, 1)) == 1
+    assert set(file_sizes(archive, 'BTC').values()) == {3 * ITEM_SIZE}
+    assert list(archive.columns('BTC')['close']) == [1.5, 2.5, 1.5]
+
+
+def test_range_boundaries(tmp_path):
+    archive = CandleArchive(None, str(tmp_path))
+    step = 15 * MINUTE
+    archive.append('BTC', candles(0, 5))
+
+    def timestamps(start_ms=None, end_ms=None):
+        return list(archive.range('BTC', start_ms, end_ms)['timestamp'])
+
+    assert timestamps() == [0, step, 2 * step, 3 * step, 4 * step]
+    assert timestamps(step, 3 * step) == [step, 2 * step]  # start inclusive, end exclusive
+    assert timestamps(step + 1, 3 * step + 1) == [2 * step, 3 * step]  # between candles
+    assert timestamps(end_ms=0) == []
+    assert timestamps(start_ms=5 * step) == []
+    assert timestamps(-step, 10 * step) == timestamps()
+    assert archive.range('ETH')['timestamp'].size == 0
@@ -0,0 +1,110 @@
+import json
+import math
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from src.ai.advisor import TradingAdvisor
+from src.ai.decision_gate import DecisionGate, ResponseCache
+
+
+def indicators(rsi=50.0, histogram=0.5, price=100.0):
+    return {
+        'trend': {'macd': {'value': 1.0, 'signal': 1.0 - histogram, 'histogram': histogram}, 'sma_20': price, 'ema_20': price},
+        'momentum': {'rsi': rsi, 'stochastic': {'k': 50.0, 'd': 50.0}},
+        'volatility': {'bollinger_bands': {'high': price * 1.02, 'mid': price, 'low': price * 0.98}},
+        'volume': {'vwap': price},
+        'price': {'current': price, 'open': price, 'high': price, 'low': price},
+    }
+
+
+def inputs(price=100.0, rsi=50.0, histogram=0.5, positions=(), open_orders=()):
+    market = {'BTC': {'bid_price': price, 'ask_price': price}}
+    portfolio = {
+        'balance': 1000.0, 'total_value': 1000.0 + sum(p['dollar_amount'] for p in positions),
+        'positions': list(positions), 'open_orders': list(open_orders), 'trade_history': [],
+    }
+    return market, portfolio, {'BTC': indicators(rsi, histogram, price)}
+
+
+def test_distance_counts_bucket_moves_and_structure_changes():
+    gate = DecisionGate(price_step_pct=0.5, indicator_step=5)
+    base = gate.fingerprint(*inputs())
+    assert gate.distance(base, gate.fingerprint(*inputs(price=100.1))) == 0  # same 0.5% bucket
+    assert gate.distance(base, gate.fingerprint(*inputs(rsi=56))) == 1  # one 5-point bucket
+    assert gate.distance(base, gate.fingerprint(*inputs(rsi=71))) == 4
+    assert gate.distance(base, gate.fingerprint(*inputs(histogram=-0.5))) == 2  # MACD sign flipped
+    held = [{'symbol': 'BTC', 'quantity': 1.0, 'dollar_amount': 100.0}]
+    assert gate.distance(base, gate.fingerprint(*inputs(positions=held))) == math.inf
+    assert gate.distance(base, gate.fingerprint(*inputs(open_orders=[{'id': 7}]))) == math.inf
+    assert gate.distance(base, gate.fingerprint(*inputs(rsi=float('nan')))) == math.inf
+
+
+def test_check_skips_until_max_skips_and_never_replays_trades():
+    gate = DecisionGate(max_distance=1, max_skips=2)
+    fingerprint = gate.fingerprint(*inputs())
+    assert gate.check(fingerprint) is None  # nothing to compare with yet
+
+    gate.record(fingerprint, 'do_nothing()\nQuiet market.')
+    nearby = gate.fingerprint(*inputs(rsi=54))
+    assert gate.check(nearby) == 'do_nothing()\nQuiet market.'
+    assert gate.check(nearby) == 'do_nothing()\nQuiet market.'
+    assert gate.check(nearby) is None  # max_skips reached: consult
+
+    gate.record(fingerprint, 'buy_crypto_price("BTC", 25, "breakout")\nBought.')
+    skipped = gate.check(nearby)
+    assert skipped.startswith('do_nothing()') and 'buy_crypto' not in skipped  # the trade isn't placed again
+    assert gate.check(gate.fingerprint(*inputs(rsi=66))) is None  # too far
+
+
+def test_cache_is_a_bounded_lru():
+    cache = ResponseCache(max_entries=2)
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    assert cache.get('a') == 'A'  # a is now the most recent
+    cache.put('c', 'C')
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == ('A', 'C')
+    assert list(cache.entries) == ['a', 'c']
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_cache_file_is_written_periodically_and_on_save(tmp_path):
+    cache_file = tmp_path / 'cache.json'
+    cache = ResponseCache(max_entries=2, cache_file=str(cache_file), save_interval=3600)
+    for key in 'abc':
+        cache.put(key, key.upper())
+    assert not cache_file.exists()  # not rewritten on every put
+
+    cache.save()
+    assert json.loads(cache_file.read_text()) == [['b', 'B'], ['c', 'C']]
+    reloaded = ResponseCache(max_entries=2, cache_file=str(cache_file))
+    assert reloaded.get('c') == 'C'
+
+    cache.save_interval = 0
+    cache.put('d', 'D')  # due: written right away
+    assert json.loads(cache_file.read_text()) == [['c', 'C'], ['d', 'D']]
+
+
+class CountingClient:
+    def __init__(self):
+        self.requests = []
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, model, messages, temperature, **options):
+        self.requests.append(messages)
+        message = SimpleNamespace(content=f'do_nothing()\nAnswer {len(self.requests)}.', tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def test_cache_key_ignores_the_prompt_timestamp_and_small_moves():
+    now = [datetime(2026, 1, 1, 12, 0, 0, 123456)]
+    client = CountingClient()
+    advisor = TradingAdvisor(client, clock=lambda: now[0], cache=ResponseCache())
+
+    first = advisor.get_advice(*inputs())
+    now[0] += timedelta(minutes=30, microseconds=17)
+    assert advisor.get_advice(*inputs(price=100.1, rsi=51)) == first  # same buckets, later time
+    assert len(client.requests) == 1
+
+    advisor.get_advice(*inputs(price=103))  # price left its bucket
+    assert len(client.requests) == 2
@@ -0,0 +1,176 @@
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+
+from src.data.request_scheduler import RequestScheduler, ScheduledExchange
+from src.trading.execution_pipeline import ExecutionPipeline
+
+
+class FakeKraken:
+    """
+    Signs private calls with an increasing nonce when they start and rejects one that
+    arrives after a higher nonce, like Kraken. Tracks how many calls overlap.
+    """
+
+    def __init__(self, latency=0.02):
+        self.latency = latency
+        self.enableRateLimit = True
+        self.nonces = itertools.count(1)
+        self.last_nonce = 0
+        self.lock = threading.Lock()
+        self.active = {'public': 0, 'private': 0}
+        self.max_active = {'public': 0, 'private': 0}
+        self.orders = []
+
+    def _request(self, kind, signed):
+        with self.lock:
+            nonce = next(self.nonces) if signed else None
+            self.active[kind] += 1
+            self.max_active[kind] = max(self.max_active[kind], self.active[kind])
+        time.sleep(self.latency)
+        with self.lock:
+            self.active[kind] -= 1
+            if signed:
+                if nonce <= self.last_nonce:
+                    raise Exception("EAPI:Invalid nonce")
+                self.last_nonce = nonce
+
+    def fetch_ticker(self, pair):
+        self._request('public', signed=False)
+        return {'bid': 100.0, 'ask': 100.0}
+
+    def fetch_balance(self):
+        self._request('private', signed=True)
+        return {'USD': {'free': 1000.0}, 'total': {}}
+
+    def create_market_buy_order(self, pair, quantity, params=None):
+        self._request('private', signed=True)
+        self.orders.append(pair)
+        return {'id': str(len(self.orders)), 'symbol': pair, 'cost': quantity * 100.0, 'filled': quantity, 'average': 100.0}
+
+
+def scheduled(kraken):
+    scheduler = RequestScheduler(public_rate=1000, public_burst=100, order_rate=1000, order_burst=100, backoff_base=0.01)
+    return ScheduledExchange(kraken, scheduler)
+
+
+def test_private_calls_never_overlap_and_public_calls_do():
+    kraken = FakeKraken()
+    exchange = scheduled(kraken)
+    errors = []
+
+    def run(call):
+        try:
+            call()
+        except Exception as e:
+            errors.append(e)
+
+    calls = [exchange.fetch_balance, lambda: exchange.create_market_buy_order('BTC/USD', 0.1)] * 4
+    calls += [lambda pair=f'{symbol}/USD': exchange.fetch_ticker(pair) for symbol in 'ABCDEFGH']
+    threads = [threading.Thread(target=run, args=(call,)) for call in calls]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert kraken.max_active['private'] == 1
+    assert kraken.max_active['public'] > 1
+    assert kraken.enableRateLimit is False
+
+
+class RecordingExecutor:
+    """Executor whose orders go through the exchange; records the order they ran in"""
+
+    def __init__(self, exchange):
+        self.exchange = exchange
+        self.ticker_source = exchange
+        self.portfolio = SimpleNamespace(
+            get_balance=lambda: 1000.0, get_positions=lambda: [], get_open_orders=lambda: [],
+            get_trade_history=lambda: [],
+        )
+        self.calls = []
+
+    def execute_buy_market(self, symbol, amount, summary, ticker=None):
+        order = self.exchange.create_market_buy_order(f'{symbol}/USD', amount / ticker['ask'])
+        self.calls.append(symbol)
+        return order
+
+
+def test_orders_go_out_one_at_a_time_in_submission_order():
+    kraken = FakeKraken()
+    exchange = scheduled(kraken)
+    # No bulk endpoint on the fake, so the tickers are prefetched one by one in parallel
+    pipeline = ExecutionPipeline(RecordingExecutor(exchange), max_workers=5)
+    symbols = ['ETH', 'BTC', 'SOL', 'ADA', 'DOT', 'XRP']
+    commands = [
+        SimpleNamespace(name='buy_crypto_price', symbol=symbol, amount=10.0, limit=None, summary='', order_id=None)
+        for symbol in symbols
+    ]
+
+    results = pipeline.execute(commands)
+
+    assert [ok for _, ok, _ in results] == [True] * len(symbols)
+    assert pipeline.trade_executor.calls == symbols
+    assert kraken.orders == [f'{symbol}/USD' for symbol in symbols]
+    assert kraken.max_active['private'] == 1
+    assert kraken.max_active['public'] > 1
+
+
+class BlockingKraken:
+    """Holds fetch_balance open until released, recording the order calls reach the exchange"""
+
+    def __init__(self):
+        self.release_balance = threading.Event()
+        self.calls = []
+
+    def fetch_balance(self):
+        self.calls.append('fetch_balance')
+        assert self.release_balance.wait(5)
+        return {}
+
+    def fetch_my_trades(self, since=None):
+        self.calls.append('fetch_my_trades')
+        return []
+
+    def create_order(self, pair, type, side, amount):
+        self.calls.append('create_order')
+        return {}
+
+    def fetch_ticker(self, pair):
+        self.calls.append('fetch_ticker')
+        return {}
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_queued_order_overtakes_an_earlier_background_private_call():
+    kraken = BlockingKraken()
+    exchange = scheduled(kraken)
+    queue = exchange.scheduler.waiting['authenticated']
+
+    balance = threading.Thread(target=exchange.fetch_balance)
+    balance.start()
+    wait_until(lambda: kraken.calls == ['fetch_balance'])  # holds the lane
+
+    history = threading.Thread(target=exchange.fetch_my_trades)
+    history.start()
+    wait_until(lambda: len(queue) == 1)
+    order = threading.Thread(target=exchange.create_order, args=('BTC/USD', 'market', 'buy', 0.1))
+    order.start()
+    wait_until(lambda: len(queue) == 2)
+
+    # Public calls don't wait for the lane
+    exchange.fetch_ticker('BTC/USD')
+    assert kraken.calls == ['fetch_balance', 'fetch_ticker']
+
+    kraken.release_balance.set()
+    for thread in (balance, history, order):
+        thread.join()
+    assert kraken.calls == ['fetch_balance', 'fetch_ticker', 'create_order', 'fetch_my_trades']
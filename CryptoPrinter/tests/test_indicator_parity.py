@@ -0,0 +1,111 @@
+import math
+import random
+
+import pytest
+
+from src.trading import batch_indicators
+from src.trading.indicator_engine import PARITY_LOOKBACK, IndicatorEngine
+from src.trading.technical_analysis import TechnicalAnalysis
+
+
+def random_candles(seed, count=100, start_price=100.0):
+    rng = random.Random(seed)
+    candles, price = [], start_price
+    for i in range(count):
+        open_ = price
+        close = max(open_ * (1 + rng.gauss(0, 0.01)), 1e-9)
+        high = max(open_, close) * (1 + abs(rng.gauss(0, 0.003)))
+        low = min(open_, close) * (1 - abs(rng.gauss(0, 0.003)))
+        candles.append([i * 900_000, open_, high, low, close, rng.uniform(0.1, 50)])
+        price = close
+    return candles
+
+
+class FixedCandles:
+    """CandleStore stand-in serving one fixed window"""
+
+    def __init__(self, candles):
+        self.candles = candles
+
+    def update(self, symbol):
+        return self.candles
+
+    def save(self):
+        pass
+
+
+def flatten(indicators, prefix=''):
+    values = {}
+    for key, value in indicators.items():
+        if isinstance(value, dict):
+            values.update(flatten(value, f'{prefix}{key}.'))
+        else:
+            values[f'{prefix}{key}'] = float(value)
+    return values
+
+
+def assert_matches(actual, expected, rel=1e-9):
+    actual, expected = flatten(actual), flatten(expected)
+    assert actual.keys() == expected.keys()
+    for name, value in expected.items():
+        if math.isnan(value):
+            assert math.isnan(actual[name]), name
+        else:
+            assert actual[name] == pytest.approx(value, rel=rel, abs=1e-9), name
+
+
+@pytest.mark.parametrize('seed,start_price', [(1, 100.0), (2, 0.0001), (3, 65000.0), (4, 2.5)])
+def test_streaming_and_batch_engines_match_ta_on_the_same_window(seed, start_price):
+    candles = random_candles(seed, start_price=start_price)
+    expected = TechnicalAnalysis(None, FixedCandles(candles), engine='ta').calculate_indicators('X')
+
+    assert_matches(IndicatorEngine().update('X', candles), expected)
+    assert_matches(batch_indicators.get_all_indicators({'X': candles})['X'], expected)
+
+
+def test_streaming_engine_matches_ta_as_the_open_candle_updates():
+    candles = random_candles(5)
+    engine = IndicatorEngine()
+    engine.update('X', candles[:-1])
+    for close in (candles[-1][4], candles[-1][4] * 1.02, candles[-1][4] * 0.97):
+        window = candles[:-1] + [candles[-1][:4] + [close, candles[-1][5]]]
+        window[-1][2] = max(window[-1][2], close)
+        window[-1][3] = min(window[-1][3], close)
+        expected = TechnicalAnalysis(None, FixedCandles(window), engine='ta').calculate_indicators('X')
+        assert_matches(engine.update('X', window), expected)
+
+
+def with_flat_stretch(candles, start, length):
+    """A market that stops trading: high == low == close for `length` candles"""
+    candles = [list(candle) for candle in candles]
+    price = candles[start - 1][4]
+    for candle in candles[start:start + length]:
+        candle[1:5] = [price] * 4
+    return candles
+
+
+def test_engines_match_ta_through_a_flat_high_low_window():
+    # 20 flat candles make every 14-candle high == low, so %K is NaN (0/0) and
+    # %D must stay NaN until the NaNs slide out of its 3-candle window
+    candles = with_flat_stretch(random_candles(6, count=90), start=40, length=20)
+    engine = IndicatorEngine()
+    seen_nan_k = False
+    for end in range(35, 90):
+        window = candles[:end]
+        expected = TechnicalAnalysis(None, FixedCandles(window), engine='ta').calculate_indicators('X')
+        seen_nan_k |= math.isnan(float(expected['momentum']['stochastic']['k']))
+        assert_matches(engine.update('X', window), expected)
+        assert_matches(batch_indicators.get_all_indicators({'X': window})['X'], expected)
+    assert seen_nan_k
+
+
+def test_streaming_engine_matches_ta_as_the_window_slides():
+    # The candle store keeps the last CANDLE_LOOKBACK candles; ta restarts its EMAs at
+    # the oldest one each cycle, the streaming engine remembers everything before it
+    lookback = PARITY_LOOKBACK
+    candles = random_candles(7, count=lookback + 300)
+    engine = IndicatorEngine()
+    for end in range(lookback, len(candles) + 1, 20):
+        window = candles[end - lookback:end]
+        expected = TechnicalAnalysis(None, FixedCandles(window), engine='ta').calculate_indicators('X')
+        assert_matches(engine.update('X', window), expected)
@@ -0,0 +1,93 @@
+import threading
+
+from src.trading.live_portfolio import LivePortfolio
+
+
+class FakeExchange:
+    def __init__(self):
+        self.orders = []
+
+    def _order(self, side, pair, quantity, price):
+        self.orders.append((side, pair, quantity, price))
+        return {'cost': quantity * price, 'filled': quantity, 'average': price}
+
+    def create_market_buy_order(self, pair, quantity, params=None):
+        return self._order('buy', pair, quantity, 50000.0)
+
+    def create_market_sell_order(self, pair, quantity, params=None):
+        return self._order('sell', pair, quantity, 50000.0)
+
+    def create_limit_buy_order(self, pair, quantity, price, params=None):
+        return self._order('buy', pair, quantity, price)
+
+    def create_limit_sell_order(self, pair, quantity, price, params=None):
+        return self._order('sell', pair, quantity, price)
+
+
+def test_orders_are_sized_in_usd():
+    exchange = FakeExchange()
+    portfolio = LivePortfolio(exchange)
+
+    buy = portfolio.create_market_buy_order('BTC', 500, 50000.0)
+    portfolio.create_market_sell_order('BTC', 250, 50000.0)
+    portfolio.create_limit_buy_order('BTC', 100, 40000.0)
+    portfolio.create_limit_sell_order('BTC', 120, 60000.0)
+
+    # $500 of BTC is 0.01 BTC, never 500 BTC
+    assert buy['amount'] == 500
+    assert [order[2] for order in exchange.orders] == [0.01, 0.005, 0.0025, 0.002]
+
+
+class BalanceExchange:
+    """fetch_balance() reports the USD balance at the time of the call, pausing the first fetch"""
+
+    markets = {'BTC/USD': {}}
+
+    def __init__(self, usd):
+        self.usd = usd
+        self.fetches = 0
+        self.fetching = threading.Event()
+        self.resume = threading.Event()
+
+    def fetch_balance(self):
+        self.fetches += 1
+        usd = self.usd
+        if self.fetches == 1:
+            self.fetching.set()
+            self.resume.wait(5)
+        return {'USD': {'free': usd}, 'total': {'USD': usd}}
+
+
+def test_invalidate_during_a_fetch_keeps_the_stale_snapshot_out_of_the_cache():
+    exchange = BalanceExchange(1000.0)
+    portfolio = LivePortfolio(exchange, cache_ttl=60)
+    background = threading.Thread(target=portfolio.get_balance)  # e.g. the portfolio stage
+    background.start()
+    assert exchange.fetching.wait(5)
+
+    # An order fills while that fetch is in flight
+    exchange.usd = 400.0
+    portfolio.invalidate()
+    exchange.resume.set()
+    background.join(5)
+
+    assert portfolio.get_balance() == 400.0
+    assert exchange.fetches == 2
+    assert portfolio.get_balance() == 400.0  # now cached
+    assert exchange.fetches == 2
+
+
+def test_concurrent_readers_share_one_fetch():
+    exchange = BalanceExchange(1000.0)
+    portfolio = LivePortfolio(exchange, cache_ttl=60)
+    balances = []
+    readers = [threading.Thread(target=lambda: balances.append(portfolio.get_balance())) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    assert exchange.fetching.wait(5)
+    exchange.resume.set()
+    for reader in readers:
+        reader.join(5)
+
+    assert balances == [1000.0] * 4
+    assert exchange.fetches == 1
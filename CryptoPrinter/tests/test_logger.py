@@ -0,0 +1,103 @@
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime
+
+import pytest
+
+from src.utils import logger
+from src.utils.logger import DeferredQueueHandler, JsonFormatter, iter_payloads, payload_archive_handler
+
+
+def record(msg='hello %s', args=('world',), name='test', payload=None, **extra):
+    fields = {'name': name, 'msg': msg, 'args': args, 'levelname': 'INFO', 'levelno': logging.INFO, **extra}
+    if payload is not None:
+        fields['payload'] = payload
+    return logging.makeLogRecord(fields)
+
+
+def test_deferred_queue_handler_leaves_formatting_to_the_listener():
+    log_queue = queue.SimpleQueue()
+    payload = {'market': {'BTC': 1.0}}
+    DeferredQueueHandler(log_queue).emit(record(payload=payload))
+
+    queued = log_queue.get_nowait()
+    # The stock QueueHandler would have merged the args into msg and dropped them
+    assert queued.msg == 'hello %s' and queued.args == ('world',)
+    assert queued.payload is payload
+    assert json.loads(JsonFormatter().format(queued))['msg'] == 'hello world'
+
+
+def test_json_formatter():
+    formatted = json.loads(JsonFormatter().format(
+        record(name='payloads.default', payload={'when': datetime(2024, 1, 2, 3, 4, 5), 'n': 1}, created=0)
+    ))
+    assert formatted == {
+        'ts': datetime.fromtimestamp(0).isoformat(timespec='milliseconds'),
+        'level': 'INFO',
+        'logger': 'payloads.default',
+        'msg': 'hello world',
+        'payload': {'when': '2024-01-02 03:04:05', 'n': 1},  # unserializable values become strings
+    }
+
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        with_exc = json.loads(JsonFormatter().format(record(exc_info=sys.exc_info())))
+    assert 'payload' not in with_exc
+    assert 'ValueError: boom' in with_exc['exc']
+
+
+def test_rollover_gzips_the_finished_day(tmp_path):
+    handler = payload_archive_handler(str(tmp_path))
+    handler.setFormatter(JsonFormatter())
+    handler.emit(record(msg='consultation', args=(), payload={'cycle': 1}))
+    handler.doRollover()
+    handler.emit(record(msg='advice', args=()))
+    handler.close()
+
+    archived = [name for name in os.listdir(tmp_path) if name.endswith('.gz')]
+    assert len(archived) == 1 and archived[0].startswith('payloads.jsonl.')
+    with gzip.open(tmp_path / archived[0], 'rt') as f:
+        assert [json.loads(line)['payload'] for line in f] == [{'cycle': 1}]
+    with open(tmp_path / 'payloads.jsonl') as f:
+        assert json.loads(f.read())['msg'] == 'advice'
+
+
+def write_day(directory, day, messages):
+    lines = ''.join(json.dumps({'ts': f'{day}T12:00:00.000', 'msg': message}) + '\n' for message in messages)
+    with gzip.open(os.path.join(directory, f'payloads.jsonl.{day}.gz'), 'wt') as f:
+        f.write(lines)
+
+
+def test_iter_payloads_skips_days_outside_the_range_unopened(tmp_path, monkeypatch):
+    write_day(tmp_path, '2024-01-01', ['consultation'])
+    write_day(tmp_path, '2024-01-02', ['consultation', 'advice'])
+    write_day(tmp_path, '2024-01-03', ['advice'])
+    with open(tmp_path / 'payloads.jsonl.2024-01-04.gz', 'wb') as f:
+        f.write(b'not gzip')  # would raise if it were opened
+    today = datetime.now().date().isoformat()
+    with open(tmp_path / 'payloads.jsonl', 'w') as f:
+        f.write(json.dumps({'ts': f'{today}T00:00:00.000', 'msg': 'advice'}) + '\n{"ts": "partial')
+
+    opened = []
+    real_open = gzip.open
+    monkeypatch.setattr(logger.gzip, 'open', lambda path, *args: opened.append(os.path.basename(path)) or real_open(path, *args))
+
+    records = list(iter_payloads(str(tmp_path), since=datetime(2024, 1, 2), until=datetime(2024, 1, 3, 23)))
+    assert [(record['ts'][:10], record['msg']) for record in records] == [
+        ('2024-01-02', 'consultation'), ('2024-01-02', 'advice'), ('2024-01-03', 'advice')
+    ]
+    assert opened == ['payloads.jsonl.2024-01-02.gz', 'payloads.jsonl.2024-01-03.gz']
+
+    # Within a day, by timestamp and message kind
+    assert list(iter_payloads(str(tmp_path), since=datetime(2024, 1, 2, 13), until=datetime(2024, 1, 3, 23))) == [
+        {'ts': '2024-01-03T12:00:00.000', 'msg': 'advice'}
+    ]
+    assert [record['ts'][:10] for record in iter_payloads(str(tmp_path), since=datetime(2024, 1, 5), message='advice')] == [today]
+    with pytest.raises(gzip.BadGzipFile):
+        list(iter_payloads(str(tmp_path), since=datetime(2024, 1, 4), until=datetime(2024, 1, 4, 23)))
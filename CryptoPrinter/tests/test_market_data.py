@@ -0,0 +1,76 @@
+import threading
+import time
+
+from src.data.market_data import MarketData
+
+
+def ticker(pair, bid=1.0):
+    return {'symbol': pair, 'bid': bid, 'ask': bid + 0.1, 'high': 2.0, 'low': 0.5, 'baseVolume': 100.0}
+
+
+class FakeExchange:
+    def __init__(self, bulk=True, missing=(), failing=()):
+        self.has = {'fetchTickers': bulk}
+        self.missing = set(missing)  # left out of bulk responses
+        self.failing = set(failing)
+        self.bulk_requests = []
+        self.single_requests = []
+        self.hooks = {}  # {pair: called before the single ticker is returned}
+
+    def fetch_tickers(self, pairs):
+        self.bulk_requests.append(pairs)
+        return {pair: ticker(pair) for pair in pairs if pair not in self.missing}
+
+    def fetch_ticker(self, pair):
+        self.single_requests.append(pair)
+        if pair in self.hooks:
+            self.hooks[pair]()
+        if pair in self.failing:
+            raise Exception("exchange error")
+        return ticker(pair, bid=2.0)
+
+
+def test_bulk_path_fetches_every_symbol_in_one_request():
+    exchange = FakeExchange()
+    market_data = MarketData(exchange)
+    infos = market_data.get_crypto_infos(['BTC', 'ETH'])
+
+    assert exchange.bulk_requests == [['BTC/USD', 'ETH/USD']]
+    assert exchange.single_requests == []
+    assert infos['ETH'] == {
+        'symbol': 'ETH', 'ask_price': 1.1, 'bid_price': 1.0, 'high_price': 2.0, 'low_price': 0.5, 'volume': 100.0
+    }
+    assert set(market_data.fetch_timings) == {'BTC', 'ETH'}
+
+
+def test_symbols_missing_from_the_bulk_response_are_fetched_one_by_one():
+    exchange = FakeExchange(missing={'ETH/USD', 'SOL/USD'}, failing={'SOL/USD'})
+    market_data = MarketData(exchange)
+    infos = market_data.get_crypto_infos(['BTC', 'ETH', 'SOL'])
+
+    assert sorted(exchange.single_requests) == ['ETH/USD', 'SOL/USD']
+    assert infos['BTC']['bid_price'] == 1.0 and infos['ETH']['bid_price'] == 2.0
+    assert 'SOL' not in infos
+    assert set(market_data.fetch_timings) == {'BTC', 'ETH', 'SOL'}  # the failure still took time
+
+
+def test_a_timed_out_fetch_is_left_out_and_cannot_touch_the_next_cycle():
+    exchange = FakeExchange(bulk=False)
+    market_data = MarketData(exchange, fetch_timeout=0.2)
+    hung, released = threading.Event(), threading.Event()
+    exchange.hooks['SLOW/USD'] = lambda: (hung.set(), released.wait(5))
+
+    start = time.time()
+    infos = market_data.get_crypto_infos(['BTC', 'SLOW'])
+    assert time.time() - start < 2  # the cycle doesn't wait for the hung request
+    assert set(infos) == {'BTC'}
+    assert set(market_data.fetch_timings) == {'BTC'}
+
+    # The hung request finishes in the middle of the next cycle
+    def finish_hung_request():
+        released.set()
+        time.sleep(0.1)
+    exchange.hooks = {'BTC/USD': finish_hung_request}
+    infos = market_data.get_crypto_infos(['BTC'])
+    assert set(infos) == {'BTC'}
+    assert set(market_data.fetch_timings) == {'BTC'}
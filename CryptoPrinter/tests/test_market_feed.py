@@ -0,0 +1,189 @@
+import asyncio
+import json
+import sys
+import threading
+import time
+
+import websockets
+
+from src.data.candle_store import CandleStore
+from src.data.market_feed import MarketFeed
+
+
+class FakeKrakenServer:
+    """Local websocket server speaking Kraken's v1 public API for the channels MarketFeed uses"""
+
+    def __init__(self):
+        self.subscriptions = []
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(websockets.serve(self.handler, '127.0.0.1', 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.ready.set()
+        self.loop.run_forever()
+
+    def start(self):
+        self.thread.start()
+        self.ready.wait(5)
+        return f'ws://127.0.0.1:{self.port}'
+
+    async def _close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._close(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        self.loop.close()
+
+    async def handler(self, ws):
+        async for message in ws:
+            request = json.loads(message)
+            self.subscriptions.append(request)
+            if request['event'] == 'unsubscribe':
+                continue
+            for pair in request['pair']:
+                channel = request['subscription']['name']
+                if channel == 'ticker':
+                    await ws.send(json.dumps([1, {
+                        'a': ['50010.0', 1, '1.5'], 'b': ['50000.0', 2, '2.5'], 'c': ['50005.0', '0.1'],
+                        'v': ['10', '120.5'], 'l': ['49000', '48000'], 'h': ['51000', '52000'], 'o': ['49500', '49400'],
+                    }, 'ticker', pair]))
+                elif channel == 'book':
+                    await ws.send(json.dumps([2, {
+                        'as': [['50008.0', '0.7', '1'], ['50020.0', '1.0', '1']],
+                        'bs': [['50002.0', '0.4', '1'], ['49990.0', '3.0', '1']],
+                    }, 'book-10', pair]))
+                elif channel == 'ohlc':
+                    # Candle ending at 900s, i.e. the 15m candle that opened at 0
+                    await ws.send(json.dumps([3, [
+                        '899.0', '900.0', '100', '110', '95', '105', '102', '12.5', 40,
+                    ], 'ohlc-15', pair]))
+
+
+class CountingExchange:
+    def __init__(self):
+        self.rest_calls = 0
+
+    def fetch_ticker(self, pair):
+        self.rest_calls += 1
+        return {'symbol': pair, 'bid': 1.0, 'ask': 1.1}
+
+    def fetch_tickers(self, pairs):
+        return {pair: self.fetch_ticker(pair) for pair in pairs}
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_feed_caches_ticker_book_and_candles_from_websocket():
+    server = FakeKrakenServer()
+    url = server.start()
+    exchange = CountingExchange()
+    feed = MarketFeed(exchange, ['BTC'], url=url, max_age=5)
+    streamed = []
+    feed.on_candle.append(lambda symbol, candle: streamed.append((symbol, candle)))
+    feed.start()
+    try:
+        assert wait_for(lambda: feed.get_ticker('BTC') and feed.candles.get('BTC'))
+
+        # The legacy XBT pair name is mapped back, and the book overrides the ticker's top of book
+        ticker = feed.fetch_ticker('BTC/USD')
+        assert ticker['bid'] == 50002.0 and ticker['ask'] == 50008.0
+        assert ticker['last'] == 50005.0 and ticker['baseVolume'] == 120.5
+        assert feed.get_order_book('BTC')['bids'][0] == (50002.0, 0.4)
+        assert streamed == [('BTC', [0, 100.0, 110.0, 95.0, 105.0, 12.5])]
+        assert exchange.rest_calls == 0
+        assert {request['subscription']['name'] for request in server.subscriptions} == {'ticker', 'book', 'ohlc'}
+        assert all(request['pair'] == ['XBT/USD'] for request in server.subscriptions)
+
+        # Stale or unknown symbols fall back to REST
+        assert feed.fetch_ticker('ETH/USD')['bid'] == 1.0
+        assert feed.get_ticker('BTC', max_age=0) is None
+        assert exchange.rest_calls == 1
+    finally:
+        feed.stop()
+        feed.thread.join(5)
+        server.stop()
+
+
+def test_set_symbols_resubscribes_and_drops_removed_symbols():
+    server = FakeKrakenServer()
+    url = server.start()
+    feed = MarketFeed(CountingExchange(), ['BTC'], url=url, max_age=5)
+    feed.start()
+    try:
+        assert wait_for(lambda: feed.get_ticker('BTC') and feed.candles.get('BTC'))
+        subscribed = len(server.subscriptions)
+
+        feed.set_symbols(['ETH'])
+        assert feed.get_ticker('BTC') is None and 'BTC' not in feed.candles and 'BTC' not in feed.books
+        assert wait_for(lambda: feed.get_ticker('ETH') and feed.candles.get('ETH'))
+
+        changes = server.subscriptions[subscribed:]
+        unsubscribed = [request for request in changes if request['event'] == 'unsubscribe']
+        assert {request['subscription']['name'] for request in unsubscribed} == {'ticker', 'book', 'ohlc'}
+        assert all(request['pair'] == ['XBT/USD'] for request in unsubscribed)
+        assert changes.index(unsubscribed[-1]) < len(unsubscribed)  # unsubscribes go out first
+        assert all(request['pair'] == ['ETH/USD'] for request in changes[len(unsubscribed):])
+        assert 'BTC' not in feed.tickers  # no late BTC update re-added it
+    finally:
+        feed.stop()
+        feed.thread.join(5)
+        server.stop()
+
+
+def test_streamed_candles_merge_into_candle_store_from_another_thread():
+    class Exchange:
+        def parse_timeframe(self, timeframe):
+            return 900
+
+        def milliseconds(self):
+            return 0  # never far enough ahead to need a full window again
+
+        def fetch_ohlcv(self, pair, timeframe, since=None, limit=None):
+            # The open candle onwards; a few more have formed since the last update
+            start = 0 if since is None else since // 900_000
+            return [[i * 900_000, 1, 1, 1, 1, 1] for i in range(start, start + 20)]
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads as often as possible to expose races
+    store = CandleStore(Exchange(), lookback=100_000)
+    store.update('BTC')
+    errors = []
+    done = threading.Event()
+
+    def stream():
+        # The websocket thread opens the same new candles as they form
+        while not done.is_set():
+            try:
+                last = store.get_ohlcv('BTC')[-1][0]
+                store.apply_candle('BTC', [last + 900_000, 2, 2, 2, 2, 2])
+            except Exception as e:
+                errors.append(e)
+                return
+
+    thread = threading.Thread(target=stream)
+    thread.start()
+    try:
+        for _ in range(300):
+            store.update('BTC')
+    finally:
+        done.set()
+        thread.join()
+        sys.setswitchinterval(switch_interval)
+
+    timestamps = [candle[0] for candle in store.get_ohlcv('BTC')]
+    assert not errors
+    assert timestamps == sorted(set(timestamps))
@@ -0,0 +1,89 @@
+import math
+
+import pytest
+
+from src.utils.metrics import WINDOW, Metrics
+
+
+def test_span_times_the_block_and_counts_errors():
+    metrics = Metrics()
+    with metrics.span('stage', stage='market'):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.span('stage', stage='market'):
+            raise ValueError("boom")
+
+    timings, counters, _ = metrics.snapshot()
+    count, total, samples = timings[('stage', (('stage', 'market'),))]
+    assert count == 2 and len(samples) == 2 and total >= 0  # the failed run is timed too
+    assert counters == {('stage_errors', (('error', 'ValueError'), ('stage', 'market'))): 1}
+
+
+def test_timed_wraps_a_function_like_span():
+    metrics = Metrics()
+
+    @metrics.timed('fetch', call='ticker')
+    def fetch(fail=False):
+        """Docstring kept"""
+        if fail:
+            raise KeyError('BTC')
+        return 42
+
+    assert fetch() == 42
+    with pytest.raises(KeyError):
+        fetch(fail=True)
+    assert fetch.__doc__ == "Docstring kept"
+    timings, counters, _ = metrics.snapshot()
+    assert timings[('fetch', (('call', 'ticker'),))][0] == 2
+    assert counters == {('fetch_errors', (('call', 'ticker'), ('error', 'KeyError'))): 1}
+
+
+def test_quantiles_are_nearest_rank_over_the_latest_window():
+    metrics = Metrics()
+    for value in range(1, 101):
+        metrics.observe('llm', float(value))
+    summary = metrics.summary()['llm']
+    assert (summary['p50'], summary['p95'], summary['p99']) == (50.0, 95.0, 99.0)
+    assert summary['count'] == 100 and summary['mean'] == 50.5
+
+    # Count and sum cover every sample; the quantiles only the latest WINDOW
+    extra = 2 * WINDOW
+    for value in range(101, 101 + extra):
+        metrics.observe('llm', float(value))
+    summary = metrics.summary()['llm']
+    oldest = 101 + extra - WINDOW
+    assert summary['count'] == 100 + extra
+    assert summary['mean'] == pytest.approx((100 + extra + 1) / 2)
+    assert summary['p50'] == oldest + WINDOW // 2 - 1
+    assert summary['p99'] == oldest + math.ceil(0.99 * WINDOW) - 1
+
+
+def test_render_prometheus_text():
+    metrics = Metrics(prefix='bot')
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        metrics.observe('stage', seconds, stage='market data')
+    metrics.count('llm_consultations', outcome='cached')
+    metrics.count('llm_consultations', 2, outcome='requested')
+    metrics.gauge('portfolio_value', 1234.5, strategy='a "quoted" \\ name\nwith newline')
+
+    assert metrics.render().split('\n') == [
+        '# TYPE bot_stage_seconds summary',
+        'bot_stage_seconds{stage="market data",quantile="0.5"} 0.2',
+        'bot_stage_seconds{stage="market data",quantile="0.95"} 0.4',
+        'bot_stage_seconds{stage="market data",quantile="0.99"} 0.4',
+        'bot_stage_seconds_sum{stage="market data"} 1',
+        'bot_stage_seconds_count{stage="market data"} 4',
+        '# TYPE bot_llm_consultations_total counter',
+        'bot_llm_consultations_total{outcome="cached"} 1',
+        'bot_llm_consultations_total{outcome="requested"} 2',
+        '# TYPE bot_portfolio_value gauge',
+        'bot_portfolio_value{strategy="a \\"quoted\\" \\\\ name\\nwith newline"} 1234.5',
+        '',
+    ]
+
+
+def test_render_without_labels_or_samples():
+    metrics = Metrics(prefix='bot')
+    metrics.count('cycles')
+    assert metrics.render() == '# TYPE bot_cycles_total counter\nbot_cycles_total 1\n'
+    assert Metrics().render() == '\n'
@@ -0,0 +1,71 @@
+import sys
+import threading
+
+from src.trading.mock_portfolio import MockPortfolio
+
+
+def promised(portfolio, symbol):
+    """Reference computation: scan every resting sell"""
+    return sum(
+        order['quantity'] - order['filled_quantity']
+        for order in portfolio.orders.values()
+        if order['symbol'] == symbol and order['side'] == 'sell'
+    )
+
+
+def test_reserved_sell_quantity_tracks_fills_and_cancels(tmp_path):
+    data_file = str(tmp_path / 'portfolio.json')
+    portfolio = MockPortfolio(10000, data_file=data_file)
+    portfolio.create_market_buy_order('BTC', 1000, 100)  # 10 BTC
+
+    first = portfolio.create_limit_sell_order('BTC', 300, 100)  # 3 BTC
+    second = portfolio.create_limit_sell_order('BTC', 440, 110)  # 4 BTC
+    assert portfolio._available_quantity('BTC') == 10 - 7
+
+    portfolio.process_tick('BTC', 101, 102, bid_volume=1)  # 1 BTC of the first fills
+    assert abs(portfolio.sell_reserved['BTC'] - promised(portfolio, 'BTC')) < 1e-9
+    portfolio.cancel_order(second['id'])
+    portfolio.process_tick('BTC', 101, 102)  # the rest of the first fills
+    assert first['status'] == 'filled'
+    assert 'BTC' not in portfolio.sell_reserved
+    assert abs(portfolio._available_quantity('BTC') - 7) < 1e-9
+
+    portfolio.create_limit_sell_order('BTC', 240, 120)  # 2 BTC
+    reloaded = MockPortfolio(10000, data_file=data_file)
+    assert abs(reloaded.sell_reserved['BTC'] - 2) < 1e-9
+
+
+def test_readers_are_safe_while_ticks_fill_orders():
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads as often as possible to expose races
+    portfolio = MockPortfolio(1_000_000, data_file=None)
+    errors = []
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            try:
+                portfolio.get_positions()
+                portfolio.get_open_orders()
+                portfolio.get_total_portfolio_value()
+            except Exception as e:  # e.g. dictionary changed size during iteration
+                errors.append(e)
+                return
+
+    threads = [threading.Thread(target=reader) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    try:
+        for _ in range(20):
+            for i in range(200):
+                portfolio.create_limit_buy_order(f'S{i}', 10, 100)
+            for i in range(200):
+                portfolio.process_tick(f'S{i}', 99, 99.5)
+    finally:
+        done.set()
+        for thread in threads:
+            thread.join()
+        sys.setswitchinterval(switch_interval)
+
+    assert not errors
+    assert not portfolio.orders
@@ -0,0 +1,166 @@
+import json
+import os
+
+from src.trading.mock_portfolio import MockPortfolio
+
+
+def state(portfolio):
+    return {
+        'seq': portfolio.seq,
+        'balance': portfolio.balance,
+        'positions': portfolio.positions,
+        'orders': portfolio.orders,
+        'sell_reserved': portfolio.sell_reserved,
+        'next_order_id': portfolio.next_order_id,
+        'total_fees': portfolio.total_fees,
+        'trade_history': portfolio.trade_history,
+    }
+
+
+def trade(portfolio):
+    """A mix of every journalled mutation: market fills, resting orders, partial fills, cancels"""
+    portfolio.create_market_buy_order('BTC', 1000, 100)
+    portfolio.record_trade('buy_market', 'BTC', 1000, 10, 100, 'breakout')
+    portfolio.create_market_buy_order('ETH', 500, 50)
+    sell = portfolio.create_limit_sell_order('BTC', 330, 110)
+    buy = portfolio.create_limit_buy_order('ETH', 200, 40)
+    portfolio.process_tick('BTC', 111, 112, bid_volume=1)  # partial fill of the sell
+    portfolio.cancel_order(buy['id'])
+    portfolio.create_market_sell_order('ETH', 100, 55)
+    portfolio.create_limit_buy_order('BTC', 150, 90)
+    return sell
+
+
+def test_replay_rebuilds_the_state_at_the_last_mutation(tmp_path):
+    data_file = str(tmp_path / 'portfolio.json')
+    portfolio = MockPortfolio(10000, data_file=data_file, fee_rate=0.001)
+    trade(portfolio)
+    expected = state(portfolio)
+    assert os.path.getsize(f"{data_file}.journal") > 0
+    del portfolio
+
+    assert state(MockPortfolio(10000, data_file=data_file, fee_rate=0.001)) == expected
+
+
+def test_replay_after_compaction_skips_records_in_the_snapshot(tmp_path):
+    data_file = str(tmp_path / 'portfolio.json')
+    portfolio = MockPortfolio(10000, data_file=data_file, compact_every=3)
+    trade(portfolio)
+    expected = state(portfolio)
+    journal = open(f"{data_file}.journal").read()
+    del portfolio
+
+    # Simulate a crash between the snapshot rename and the journal truncation:
+    # the old records come back ahead of the new ones and must be skipped
+    with open(f"{data_file}.journal", 'w') as f:
+        f.write('{"seq":1,"balance":0}\n' + journal)
+    assert state(MockPortfolio(10000, data_file=data_file, compact_every=3)) == expected
+
+
+def test_torn_last_line_is_dropped_and_cut_off(tmp_path):
+    data_file = str(tmp_path / 'portfolio.json')
+    journal_file = f"{data_file}.journal"
+    portfolio = MockPortfolio(10000, data_file=data_file)
+    trade(portfolio)
+    expected = state(portfolio)
+    intact_bytes = os.path.getsize(journal_file)
+    del portfolio
+
+    with open(journal_file, 'a') as f:
+        f.write('{"seq":99,"balance":12')  # crash mid-append
+    reloaded = MockPortfolio(10000, data_file=data_file)
+    assert state(reloaded) == expected
+    assert os.path.getsize(journal_file) == intact_bytes
+
+    # New records land on a clean line and replay with the rest
+    reloaded.create_market_buy_order('SOL', 100, 20)
+    expected = state(reloaded)
+    del reloaded
+    assert state(MockPortfolio(10000, data_file=data_file)) == expected
+
+
+def test_journal_write_cost_stays_flat_as_history_grows(tmp_path):
+    data_file = str(tmp_path / 'portfolio.json')
+    journal_file = f"{data_file}.journal"
+    portfolio = MockPortfolio(100000, data_file=data_file, compact_every=10**6)
+
+    appended = []
+    for i in range(300):
+        before = os.path.getsize(journal_file)
+        portfolio.create_market_buy_order('BTC', 10, 100 + i % 7)
+        portfolio.record_trade('buy_market', 'BTC', 10, 0.1, 100 + i % 7, 'dip')
+        appended.append(os.path.getsize(journal_file) - before)
+
+    # A full snapshot (the old per-trade write) grows with the trade history;
+    # a journal record is the same size for the first trade and the last
+    portfolio.save_portfolio()
+    snapshot_bytes = os.path.getsize(data_file)
+    assert sum(appended[-10:]) < sum(appended[:10]) * 1.5
+    assert appended[-1] * 50 < snapshot_bytes
+
+
+def archived(portfolio):
+    if not os.path.exists(portfolio.trade_archive_file):
+        return []
+    with open(portfolio.trade_archive_file) as f:
+        return [json.loads(line) for line in f]
+
+
+def record_trades(portfolio, start, count):
+    for i in range(start, start + count):
+        portfolio.record_trade('buy_market', 'BTC', 10, 0.1, 100, f'trade {i}')
+
+
+def test_compaction_archives_trades_beyond_the_limit(tmp_path):
+    data_file = str(tmp_path / 'portfolio.json')
+    portfolio = MockPortfolio(10000, data_file=data_file, compact_every=5, trade_history_limit=3)
+    record_trades(portfolio, 0, 12)
+
+    # Compacted after trades 5 and 10: the snapshot keeps the latest three, the journal the two since
+    with open(data_file) as f:
+        snapshot = json.load(f)
+    assert [trade['ai_reasoning'] for trade in snapshot['trade_history']] == ['trade 7', 'trade 8', 'trade 9']
+    assert [trade['ai_reasoning'] for trade in archived(portfolio)] == [f'trade {i}' for i in range(7)]
+    assert [trade['ai_reasoning'] for trade in portfolio.get_trade_history()] == [f'trade {i}' for i in range(7, 12)]
+
+    # Reloading replays the journal on top of the trimmed snapshot
+    reloaded = MockPortfolio(10000, data_file=data_file, compact_every=5, trade_history_limit=3)
+    assert reloaded.get_trade_history() == portfolio.get_trade_history()
+    assert state(reloaded) == state(portfolio)
+
+
+def test_archive_written_by_a_crashed_compaction_is_not_duplicated(tmp_path, monkeypatch):
+    data_file = str(tmp_path / 'portfolio.json')
+    portfolio = MockPortfolio(10000, data_file=data_file, compact_every=5, trade_history_limit=3)
+    record_trades(portfolio, 0, 5)  # compaction: trades 0-1 archived
+    record_trades(portfolio, 5, 4)
+
+    # The next compaction crashes after appending to the archive, before its snapshot is in place
+    def crash(source, dest):
+        raise OSError("disk full")
+    monkeypatch.setattr(os, 'replace', crash)
+    record_trades(portfolio, 9, 1)
+    assert len(archived(portfolio)) == 2 + 5
+    monkeypatch.undo()
+
+    # After a restart the old snapshot still holds those trades; the next compaction
+    # (the journal is already full) cuts them off the archive before appending
+    portfolio = MockPortfolio(10000, data_file=data_file, compact_every=5, trade_history_limit=3)
+    record_trades(portfolio, 10, 5)
+    assert [trade['ai_reasoning'] for trade in archived(portfolio)] == [f'trade {i}' for i in range(8)]
+    assert [trade['ai_reasoning'] for trade in portfolio.get_trade_history()] == [f'trade {i}' for i in range(8, 15)]
+
+
+def test_compaction_cost_stays_flat_with_a_trade_history_limit(tmp_path):
+    data_file = str(tmp_path / 'portfolio.json')
+    unlimited_file = str(tmp_path / 'unlimited.json')
+    portfolio = MockPortfolio(10000, data_file=data_file, compact_every=50, trade_history_limit=20)
+    unlimited = MockPortfolio(10000, data_file=unlimited_file, compact_every=50)
+    sizes, unlimited_sizes = [], []
+    for batch in range(6):
+        record_trades(portfolio, batch * 50, 50)
+        record_trades(unlimited, batch * 50, 50)
+        sizes.append(os.path.getsize(data_file))
+        unlimited_sizes.append(os.path.getsize(unlimited_file))
+    assert max(sizes) < min(sizes) * 1.05  # only longer trade numbers
+    assert unlimited_sizes[-1] > 5 * unlimited_sizes[0]
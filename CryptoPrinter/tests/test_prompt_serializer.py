@@ -0,0 +1,70 @@
+import math
+from types import SimpleNamespace
+
+from src.ai.prompt_serializer import (
+    MARKET_COLUMNS, count_tokens, price_decimals, serialize_market, serialize_open_orders, tick_sizes_from_markets
+)
+from src.trading.live_portfolio import LivePortfolio
+from src.trading.mock_portfolio import MockPortfolio
+
+
+def test_price_decimals_follow_the_tick_size_or_significant_digits():
+    assert price_decimals(64123.4, 0.1) == 1
+    assert price_decimals(0.1234, 0.00001) == 5
+    assert price_decimals(3000, 1) == 0
+    # Unknown tick size: five significant digits
+    assert price_decimals(64123.4) == 0
+    assert price_decimals(2.5) == 4
+    assert price_decimals(0.000012345) == 9
+    assert price_decimals(None) == 2
+
+
+def test_tick_sizes_from_usd_markets():
+    markets = {
+        'BTC/USD': {'base': 'BTC', 'quote': 'USD', 'precision': {'price': 0.1}},
+        'BTC/EUR': {'base': 'BTC', 'quote': 'EUR', 'precision': {'price': 1}},
+        'NEW/USD': {'base': 'NEW', 'quote': 'USD', 'precision': {}},
+    }
+    assert tick_sizes_from_markets(markets) == {'BTC': 0.1}
+
+
+def test_market_table_rows():
+    market_data = {
+        'BTC': {'bid_price': 64000.12, 'ask_price': 64000.2, 'high_price': 65000, 'low_price': 63000, 'volume': 1234567},
+        'DOGE': {'bid_price': 0.123456, 'ask_price': 0.1235, 'high_price': None, 'low_price': math.nan, 'volume': 950},
+    }
+    technical_analysis = {'BTC': {
+        'trend': {'macd': {'value': 12.34567, 'signal': 10.0, 'histogram': 2.34567}, 'sma_20': 63900, 'ema_20': 63950.55},
+        'momentum': {'rsi': 55.55, 'stochastic': {'k': 80.04, 'd': 75}},
+        'volatility': {'bollinger_bands': {'high': 65000, 'mid': 64000, 'low': 63000}},
+        'volume': {'vwap': 63990.456},
+    }}
+    rows = serialize_market(market_data, technical_analysis, {'BTC': 0.1}).split('\n')
+    assert rows[0] == '|'.join(MARKET_COLUMNS)
+    assert rows[1] == (
+        'BTC|64000.1|64000.2|65000.0|63000.0|1.2M|12.346|10.000|2.346|63900.0|63950.6|'
+        '55.5|80.0|75.0|65000.0|64000.0|63000.0|63990.5'
+    )
+    # No tick size or indicators: significant digits, '-' for missing values
+    assert rows[2] == 'DOGE|0.12346|0.12350|-|-|950.0|' + '|'.join(['-'] * 12)
+
+
+def test_open_orders_are_listed_in_usd_for_mock_and_live_portfolios():
+    mock = MockPortfolio(10000, data_file=None)
+    mock.create_market_buy_order('BTC', 5000, 50000)
+    mock.create_limit_sell_order('BTC', 1000, 62500)
+
+    exchange = SimpleNamespace(fetch_open_orders=lambda: [
+        {'id': 'O1', 'symbol': 'BTC/USD', 'type': 'limit', 'side': 'sell', 'amount': 0.016, 'price': 62500.0, 'filled': 0.0},
+    ])
+    live = LivePortfolio(exchange, None)
+
+    tables = [serialize_open_orders(portfolio.get_open_orders(), {'BTC': 0.1}) for portfolio in (mock, live)]
+    assert tables[0] == 'id|sym|side|type|usd|price\n0|BTC|sell|limit|1000.00|62500.0'
+    assert tables[1] == 'id|sym|side|type|usd|price\nO1|BTC|sell|limit|1000.00|62500.0'
+    assert serialize_open_orders([]) == 'none'
+
+
+def test_token_count_is_positive_without_tiktoken():
+    assert count_tokens('') == 0
+    assert count_tokens('x' * 40) >= 1
@@ -0,0 +1,126 @@
+import asyncio
+import selectors
+from types import SimpleNamespace
+
+import pytest
+
+from src.trading import scheduler
+from src.trading.scheduler import MarketScheduler, TradingScheduler
+
+START = 1_000_000.0
+
+
+class VirtualSelector(selectors.DefaultSelector):
+    """Jumps the loop's clock to the next timer instead of waiting for it"""
+
+    def __init__(self, loop):
+        super().__init__()
+        self.loop = loop
+
+    def select(self, timeout=None):
+        events = super().select(0)
+        if not events and timeout:
+            self.loop.now += timeout
+        return events
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    def __init__(self):
+        self.now = START
+        super().__init__(selector=VirtualSelector(self))
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def run_for(monkeypatch):
+    """Run a coroutine for `seconds` of virtual time; the scheduler reads the same clock"""
+    loop = VirtualTimeLoop()
+    monkeypatch.setattr(scheduler, 'time', SimpleNamespace(time=loop.time))
+
+    async def to_thread(function, *args):
+        return function(*args)  # no real threads: everything runs on the virtual clock
+    monkeypatch.setattr(scheduler.asyncio, 'to_thread', to_thread)
+
+    def run(coroutine, seconds):
+        try:
+            loop.run_until_complete(asyncio.wait_for(coroutine, timeout=seconds))
+        except asyncio.TimeoutError:
+            pass
+
+    yield run
+    loop.close()
+
+
+def config(**overrides):
+    return SimpleNamespace(**{
+        'MARKET_DATA_INTERVAL': 60, 'INDICATOR_INTERVAL': 300, 'PORTFOLIO_INTERVAL': 300,
+        'ERROR_RETRY_DELAY': 45, 'TRADE_INTERVAL': 1800, 'MIN_CONSULT_INTERVAL': 300, 'PRICE_TRIGGER_PCT': 2.0,
+        **overrides,
+    })
+
+
+class FakeMarketData:
+    def __init__(self, price_at, failures=0):
+        self.price_at = price_at  # seconds since START -> BTC mid price
+        self.failures = failures
+        self.calls = []
+
+    def get_crypto_infos(self, symbols):
+        elapsed = scheduler.time.time() - START
+        self.calls.append(elapsed)
+        if len(self.calls) <= self.failures:
+            raise Exception("exchange unavailable")
+        price = self.price_at(elapsed)
+        return {symbol: {'bid_price': price, 'ask_price': price} for symbol in symbols}
+
+
+class FakeAnalyzer:
+    def __init__(self):
+        self.calls = []
+
+    def get_all_indicators(self, symbols):
+        self.calls.append(scheduler.time.time() - START)
+        return {symbol: {} for symbol in symbols}
+
+
+def test_a_failing_stage_backs_off_without_delaying_the_others(run_for):
+    market_data, analyzer = FakeMarketData(lambda elapsed: 100.0, failures=2), FakeAnalyzer()
+    market = MarketScheduler(config(), market_data, analyzer)
+
+    run_for(market.run(), 700)
+
+    # Two failures retried after ERROR_RETRY_DELAY, then back on the 60s cadence
+    assert market_data.calls == [0, 45, 90, 150, 210, 270, 330, 390, 450, 510, 570, 630, 690]
+    assert analyzer.calls == [0, 300, 600]
+
+
+class FakeStrategy:
+    name = 'test'
+    symbols = ['BTC']
+    trade_interval = None
+
+    def __init__(self):
+        self.portfolio = SimpleNamespace()
+        self.consultations = []
+
+    def get_portfolio_data(self):
+        return {'balance': 1000.0, 'positions': [], 'open_orders': [], 'trade_history': [], 'total_value': 1000.0}
+
+    def consult(self, crypto_infos, technical_analysis, portfolio_data, trigger):
+        self.consultations.append((scheduler.time.time() - START, trigger))
+        return None, None
+
+
+def test_a_price_move_triggers_an_early_consultation_no_sooner_than_the_minimum_interval(run_for):
+    # BTC jumps 3% at 100s, seen by the market data run at 120s
+    market_data = FakeMarketData(lambda elapsed: 103.0 if elapsed >= 100 else 100.0)
+    market = MarketScheduler(config(), market_data, FakeAnalyzer())
+    strategy = FakeStrategy()
+    trading = TradingScheduler(config(), market, strategy)
+
+    run_for(scheduler.run_strategies(market, [trading]), 1000)
+
+    # Not at 120s (MIN_CONSULT_INTERVAL) and not at the scheduled 1800s
+    assert strategy.consultations == [(0, 'scheduled'), (300, 'BTC moved +3.00% since last consultation')]
@@ -0,0 +1,83 @@
+import math
+
+from src.ai.signal_screener import SignalScreener
+
+
+def indicators(price=100.0, rsi=50.0, histogram=0.5, bb_high=110.0, bb_low=90.0, vwap=100.0):
+    return {
+        'price': {'current': price},
+        'momentum': {'rsi': rsi},
+        'trend': {'macd': {'histogram': histogram}},
+        'volatility': {'bollinger_bands': {'high': bb_high, 'low': bb_low}},
+        'volume': {'vwap': vwap},
+    }
+
+
+def test_macd_cross_fires_once_per_sign_change():
+    screener = SignalScreener()
+    histograms = [-0.5, -0.2, 0.3, 0.4, 0.0, 0.1, -0.1, -0.3, math.nan, 0.2]
+    fired = [screener.signals('BTC', indicators(histogram=histogram)) for histogram in histograms]
+    assert fired == [
+        [],  # first screen: nothing to compare with
+        [],
+        ['MACD crossed above signal'],
+        [],  # still above: no repeat
+        [],
+        [],  # touched zero and stayed above: no cross
+        ['MACD crossed below signal'],
+        [],
+        [],  # no value yet / gap: keeps the last sign
+        ['MACD crossed above signal'],
+    ]
+    # Each symbol is tracked separately
+    assert screener.signals('ETH', indicators(histogram=0.2)) == []
+
+
+def test_macd_cross_can_be_disabled_but_still_tracks_the_sign():
+    screener = SignalScreener(macd_cross=False)
+    assert screener.signals('BTC', indicators(histogram=-1)) == []
+    assert screener.signals('BTC', indicators(histogram=1)) == []
+    screener.macd_cross = True
+    assert screener.signals('BTC', indicators(histogram=1)) == []  # no stale cross fires on re-enable
+
+
+def test_rsi_thresholds_flag_and_unflag():
+    screener = SignalScreener(rsi_low=25, rsi_high=75)
+    flags = [screener.signals('BTC', indicators(rsi=rsi)) for rsi in (50, 25, 26, 74.9, 75, 80, 60)]
+    assert flags == [[], ['RSI 25 oversold'], [], [], ['RSI 75 overbought'], ['RSI 80 overbought'], []]
+    assert SignalScreener(rsi_low=None, rsi_high=None).signals('BTC', indicators(rsi=1)) == []
+    assert SignalScreener().signals('BTC', indicators(rsi=math.nan)) == []
+
+
+def test_bollinger_rule():
+    screener = SignalScreener()
+    assert screener.signals('BTC', indicators(price=110.0, vwap=110.0)) == []  # on the band is inside
+    assert screener.signals('BTC', indicators(price=110.5, vwap=110.5)) == ['price above upper Bollinger band']
+    assert screener.signals('BTC', indicators(price=89.0, vwap=89.0)) == ['price below lower Bollinger band']
+    assert screener.signals('BTC', indicators(price=100.0)) == []
+    assert SignalScreener(bollinger=False).signals('BTC', indicators(price=120.0, vwap=120.0)) == []
+    assert screener.signals('BTC', indicators(price=120.0, vwap=120.0, bb_high=math.nan)) == []
+
+
+def test_vwap_deviation_rule():
+    screener = SignalScreener(vwap_deviation_pct=2.0)
+    assert screener.signals('BTC', indicators(price=101.9)) == []
+    assert screener.signals('BTC', indicators(price=102.0)) == ['price +2.0% from VWAP']
+    assert screener.signals('BTC', indicators(price=97.0)) == ['price -3.0% from VWAP']
+    assert screener.signals('BTC', indicators(price=101.0)) == []
+    assert SignalScreener(vwap_deviation_pct=None).signals('BTC', indicators(price=105.0)) == []
+    assert screener.signals('BTC', indicators(price=105.0, vwap=None)) == []
+
+
+def test_screen_returns_only_flagged_symbols():
+    screener = SignalScreener()
+    flagged = screener.screen({
+        'BTC': indicators(rsi=20),
+        'ETH': indicators(),
+        'NEW': None,  # not enough candles for indicators yet
+        'SOL': indicators(price=120.0, rsi=80, vwap=100.0),
+    })
+    assert flagged == {
+        'BTC': ['RSI 20 oversold'],
+        'SOL': ['RSI 80 overbought', 'price above upper Bollinger band', 'price +20.0% from VWAP'],
+    }
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+from src.data.cycle_store import CycleStore
+from src.trading.execution_pipeline import ExecutionPipeline
+from src.trading.mock_portfolio import MockPortfolio
+from src.trading.strategy import Strategy
+from src.trading.trade_executor import TradeExecutor
+
+
+class FakeExchange:
+    def fetch_ticker(self, pair):
+        return {'bid': 100.0, 'ask': 100.0}
+
+    def fetch_tickers(self, pairs):
+        return {pair: self.fetch_ticker(pair) for pair in pairs}
+
+
+class ScriptedAdvisor:
+    last_prompt_hash = None
+
+    def __init__(self, responses):
+        self.responses = iter(responses)
+
+    def get_advice(self, market_data, portfolio_data, technical_analysis):
+        return next(self.responses)
+
+
+def test_execution_is_recorded_against_its_own_consultation(tmp_path):
+    config = SimpleNamespace(LLM_STREAMING=False, METRICS_FILE=None)
+    portfolio = MockPortfolio(1000, data_file=None)
+    executor = TradeExecutor(portfolio, FakeExchange())
+    advisor = ScriptedAdvisor([
+        'buy_crypto_price("BTC", 10, "first")\nfirst summary',
+        'buy_crypto_price("ETH", 20, "second")\nsecond summary',
+    ])
+    store = CycleStore(str(tmp_path / 'cycles.db'), batch_size=1)
+    strategy = Strategy('test', ['BTC', 'ETH'], portfolio, executor, ExecutionPipeline(executor), advisor, config,
+                        cycle_store=store)
+
+    def portfolio_data():
+        return {'balance': portfolio.get_balance(), 'total_value': portfolio.get_total_portfolio_value(),
+                'positions': portfolio.get_positions(), 'open_orders': [], 'trade_history': []}
+
+    market = {'BTC': {'bid_price': 100.0, 'ask_price': 100.0}, 'ETH': {'bid_price': 100.0, 'ask_price': 100.0}}
+    # The second consultation starts before the first one's advice has been executed
+    first = strategy.consult(market, {}, portfolio_data(), 'scheduled')
+    second = strategy.consult(market, {}, portfolio_data(), 'price move')
+    strategy.execute(*first)
+    strategy.execute(*second)
+
+    cycles = store.cycles()
+    assert [(cycle['trigger'], cycle['success']) for cycle in cycles] == [('scheduled', 1), ('price move', 1)]
+    commands = store.commands()
+    assert [(command['cycle_id'], command['symbol']) for command in commands] == [
+        (cycles[0]['id'], 'BTC'), (cycles[1]['id'], 'ETH')
+    ]
+    assert 'first' in store.cycle(cycles[0]['id'])['response']
+    store.close()
@@ -0,0 +1,101 @@
+import logging
+from types import SimpleNamespace
+
+from src.ai.advisor import TradingAdvisor
+from src.trading.command_parser import execute_response_stream
+
+PORTFOLIO = {'balance': 1000.0, 'total_value': 1000.0, 'positions': [], 'open_orders': [], 'trade_history': []}
+MARKET = {'BTC': {'bid_price': 100.0, 'ask_price': 100.1}}
+
+
+def chunk(content=None, tool_calls=None):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content, tool_calls=tool_calls))])
+
+
+def tool_fragment(index, name=None, arguments=None):
+    return SimpleNamespace(index=index, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+class FakeStreamingClient:
+    """OpenAI-style client whose completions stream the given chunks, counting how many were consumed"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.sent = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, model, messages, temperature, stream=False, **options):
+        assert stream
+        for item in self.chunks:
+            self.sent += 1
+            yield item
+
+
+class RecordingExecutor:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def _record(self, *call):
+        # How much of the stream had been consumed when the command ran
+        self.calls.append((*call, self.client.sent))
+        return True
+
+    def execute_buy_market(self, symbol, amount, summary):
+        return self._record('buy_market', symbol, amount)
+
+    def execute_sell_market(self, symbol, amount, summary):
+        return self._record('sell_market', symbol, amount)
+
+    def execute_buy_limit(self, symbol, amount, summary, limit):
+        return self._record('buy_limit', symbol, amount, limit)
+
+    def execute_sell_limit(self, symbol, amount, summary, limit):
+        return self._record('sell_limit', symbol, amount, limit)
+
+    def cancel_order(self, order_id):
+        return self._record('cancel', order_id)
+
+
+def run(protocol, chunks):
+    client = FakeStreamingClient(chunks)
+    advisor = TradingAdvisor(client, protocol=protocol)
+    executor = RecordingExecutor(client)
+    success, summary, response = execute_response_stream(
+        advisor.stream_advice(MARKET, PORTFOLIO, {}), executor, logging.getLogger('test')
+    )
+    return executor.calls, success, summary, response
+
+
+def test_text_commands_split_across_chunks_execute_once_in_order():
+    chunks = [chunk(text) for text in (
+        'buy_crypto_pri', 'ce("BTC", 25, "brea', 'kout")\nsell_crypto_limit("ETH", 30',
+        '0, "take profit", 2250)\ncancel_order(', '12)\n', 'All done ', 'for now.',
+    )]
+    calls, success, summary, response = run('text', chunks)
+
+    assert [call[:-1] for call in calls] == [
+        ('buy_market', 'BTC', 25.0), ('sell_limit', 'ETH', 300.0, 2250.0), ('cancel', 12),
+    ]
+    # Each command ran as soon as its line was complete, before the summary streamed in
+    assert [call[-1] for call in calls] == [3, 4, 5]
+    assert success and summary == 'All done for now.'
+    assert response == ''.join(item.choices[0].delta.content for item in chunks)
+
+
+def test_tool_call_fragments_execute_once_in_order():
+    chunks = [
+        chunk(tool_calls=[tool_fragment(0, 'buy_crypto_price', '{"symbol": "BT')]),
+        chunk(tool_calls=[tool_fragment(0, None, 'C", "amount": 25, "summ')]),
+        chunk(tool_calls=[tool_fragment(0, None, 'ary": "breakout"}')]),
+        chunk(tool_calls=[tool_fragment(1, 'sell_crypto_limit', '{"symbol": "ETH", "amount": 300, ')]),
+        chunk(tool_calls=[tool_fragment(1, None, '"summary": "take profit", "limit": 2250}')]),
+        chunk(tool_calls=[tool_fragment(2, 'summary', '{"summary": "Bought the ')]),
+        chunk(tool_calls=[tool_fragment(2, None, 'breakout, trimmed ETH."}')]),
+    ]
+    calls, success, summary, response = run('tools', chunks)
+
+    assert [call[:-1] for call in calls] == [('buy_market', 'BTC', 25.0), ('sell_limit', 'ETH', 300.0, 2250.0)]
+    # A call is complete once the next one starts
+    assert [call[-1] for call in calls] == [4, 6]
+    assert success and summary == 'Bought the breakout, trimmed ETH.'
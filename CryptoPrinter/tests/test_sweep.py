@@ -0,0 +1,42 @@
+import pytest
+
+from src.backtest.backtester import Backtester, RsiAdvisor
+from src.backtest.sweep import run_sweep, split_config
+from test_backtester import TIMEFRAME_MS, rsi_scenario
+
+
+def test_split_config_routes_each_parameter():
+    backtest_kwargs, advisor_kwargs = split_config(
+        {'fee_rate': 0.001, 'trade_interval': 900, 'rsi_window': 7, 'bb_window': 10, 'cash_fraction': 0.2}
+    )
+    assert backtest_kwargs == {'fee_rate': 0.001, 'trade_interval': 900, 'indicator_params': {'rsi_window': 7, 'bb_window': 10}}
+    assert advisor_kwargs == {'cash_fraction': 0.2}
+
+    with pytest.raises(Exception, match='rsi_windw'):
+        split_config({'rsi_windw': 7})
+
+    # A factory taking **kwargs accepts anything left over
+    assert split_config({'threshold': 1}, lambda **kwargs: None) == ({}, {'threshold': 1})
+
+
+def test_run_sweep_ranks_configs_and_routes_their_parameters(tmp_path):
+    history = rsi_scenario(730)
+    grid = {'trade_interval': [TIMEFRAME_MS // 1000], 'rsi_window': [7], 'cash_fraction': [0.1, 0.2]}
+    table = run_sweep(history, grid, max_workers=1, data_dir=str(tmp_path))
+
+    # Twice the stake on the same winning trade ranks first
+    assert list(table['cash_fraction']) == [0.2, 0.1]
+    assert list(table['pnl_pct']) == sorted(table['pnl_pct'], reverse=True)
+    for row in table.to_dict('records'):
+        expected = Backtester(
+            history, RsiAdvisor(cash_fraction=row['cash_fraction']),
+            trade_interval=TIMEFRAME_MS // 1000, indicator_params={'rsi_window': 7}
+        ).run()
+        assert row['pnl'] == pytest.approx(expected['pnl'])
+        assert row['trades'] == expected['trades'] == 2
+
+
+def test_run_sweep_rejects_an_unknown_parameter_before_running(tmp_path):
+    with pytest.raises(Exception, match='oversld'):
+        run_sweep(rsi_scenario(10), {'oversld': [20, 30]}, max_workers=1, data_dir=str(tmp_path))
+    assert not any(tmp_path.iterdir())  # nothing was written or run
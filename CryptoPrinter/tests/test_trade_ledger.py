@@ -0,0 +1,42 @@
+from src.trading.trade_ledger import TradeLedger
+
+DAY_MS = 86400 * 1000
+NOW_MS = 1_000 * DAY_MS
+
+
+class FakeExchange:
+    """Account with one fill an hour for the last 1000 days, served in pages of 50"""
+
+    def __init__(self):
+        self.trades = [self._trade(NOW_MS - hours * 3600 * 1000, hours) for hours in range(24 * 1000, 0, -1)]
+        self.requests = []
+
+    @staticmethod
+    def _trade(timestamp, number):
+        return {'id': f'T{number}', 'order': f'O{number}', 'timestamp': timestamp, 'datetime': str(timestamp),
+                'side': 'buy', 'symbol': 'BTC/USD', 'cost': 10.0, 'amount': 0.001, 'price': 10000.0}
+
+    def milliseconds(self):
+        return NOW_MS
+
+    def fetch_my_trades(self, symbol=None, since=None, params=None):
+        self.requests.append(since)
+        matching = [trade for trade in self.trades if since is None or trade['timestamp'] >= since]
+        offset = params.get('ofs', 0)
+        return matching[offset:offset + 50]
+
+
+def test_first_sync_only_fetches_the_lookback_window(tmp_path):
+    exchange = FakeExchange()
+    ledger = TradeLedger(exchange, str(tmp_path / 'ledger.jsonl'), initial_lookback_days=2)
+
+    fills = ledger.sync()
+
+    assert len(fills) == 48
+    assert all(since == NOW_MS - 2 * DAY_MS for since in exchange.requests)
+    assert len(exchange.requests) == 1  # one short page instead of 480 full ones
+
+    # Later syncs continue from the newest fill
+    exchange.trades.append(FakeExchange._trade(NOW_MS + 1000, 0))
+    assert [fill['id'] for fill in ledger.sync()] == ['T0']
+    assert exchange.requests[-1] == NOW_MS - 3600 * 1000
@@ -0,0 +1,143 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src.data import universe as universe_module
+from src.data.universe import Universe
+from src.trading.scheduler import MarketScheduler
+
+
+def market(base, quote='USD', **extra):
+    return {'base': base, 'quote': quote, 'spot': True, 'active': True, **extra}
+
+
+MARKETS = {
+    'BTC/USD': market('BTC'),
+    'ETH/USD': market('ETH'),
+    'SOL/USD': market('SOL'),
+    'DOGE/USD': market('DOGE'),
+    'USDT/USD': market('USDT'),
+    'ETH/EUR': market('ETH', quote='EUR'),
+    'OLD/USD': market('OLD', active=False),
+    'DARK/USD': market('DARK', darkpool=True),
+    'FUT/USD': market('FUT', spot=False),
+}
+
+
+def ticker(bid, ask, quote_volume=None, base_volume=None, last=None):
+    return {'bid': bid, 'ask': ask, 'quoteVolume': quote_volume, 'baseVolume': base_volume, 'last': last}
+
+
+class FakeExchange:
+    def __init__(self, tickers=None):
+        self.tickers = tickers or {}
+        self.load_calls = 0
+        self.primed = None
+        self.fail = False
+
+    def load_markets(self):
+        self.load_calls += 1
+        return MARKETS
+
+    def set_markets(self, markets):
+        self.primed = markets
+
+    def fetch_tickers(self, pairs):
+        if self.fail:
+            raise Exception("exchange unavailable")
+        return {pair: self.tickers[pair] for pair in pairs if pair in self.tickers}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1_000_000.0)
+    monkeypatch.setattr(universe_module.time, 'time', lambda: now.value)
+    return now
+
+
+def test_candidates_are_active_spot_usd_pairs_minus_exclusions():
+    universe = Universe(FakeExchange(), exclude=['USDT'])
+    assert universe.candidates() == ['BTC/USD', 'DOGE/USD', 'ETH/USD', 'SOL/USD']
+
+
+def test_rank_applies_volume_and_spread_rules():
+    universe = Universe(FakeExchange(), min_volume_usd=1000, max_spread_pct=0.5)
+    rankings = universe.rank({
+        'BTC/USD': ticker(100.0, 100.1, quote_volume=5000),
+        'ETH/USD': ticker(10.0, 10.01, base_volume=900, last=10.0),  # 9000 USD from base volume * last
+        'SOL/USD': ticker(1.0, 1.02, quote_volume=50000),  # ~2% spread
+        'DOGE/USD': ticker(0.1, 0.1001, quote_volume=500),  # too thin
+        'XRP/USD': ticker(None, 0.5, quote_volume=50000),  # no bid
+    })
+    assert [ranking['symbol'] for ranking in rankings] == ['ETH', 'BTC']
+    assert rankings[0]['volume_usd'] == 9000
+    assert rankings[1]['spread_pct'] == pytest.approx(0.1 / 100.05 * 100)
+
+
+def test_refresh_selects_the_most_traded_plus_pinned(clock):
+    exchange = FakeExchange({
+        'BTC/USD': ticker(100, 100.1, quote_volume=3000),
+        'ETH/USD': ticker(10, 10.01, quote_volume=2000),
+        'SOL/USD': ticker(1, 1.001, quote_volume=1000),
+        'DOGE/USD': ticker(0.1, 0.1001, quote_volume=500),
+    })
+    universe = Universe(exchange, size=2, pinned=['DOGE', 'ETH'], refresh_interval=900)
+    assert universe.symbols() == ['BTC', 'ETH', 'DOGE']  # ETH is already in the top two
+
+    exchange.tickers['SOL/USD']['quoteVolume'] = 10000
+    clock.value += 899
+    assert universe.symbols() == ['BTC', 'ETH', 'DOGE']  # not re-ranked yet
+    clock.value += 1
+    assert universe.symbols() == ['SOL', 'BTC', 'DOGE', 'ETH']
+
+
+def test_failed_first_refresh_is_retried_after_retry_interval(clock):
+    exchange = FakeExchange({'BTC/USD': ticker(100, 100.1, quote_volume=3000)})
+    exchange.fail = True
+    universe = Universe(exchange, refresh_interval=900, retry_interval=60)
+    assert universe.symbols() == []
+
+    exchange.fail = False
+    clock.value += 59
+    assert universe.symbols() == []  # waits for the retry delay, not hammering the exchange
+    clock.value += 1
+    assert universe.symbols() == ['BTC']  # not the full 900s refresh interval
+
+    # A later failure keeps the last selection
+    exchange.fail = True
+    clock.value += 900
+    assert universe.symbols() == ['BTC']
+
+
+def test_markets_are_cached_on_disk_for_their_ttl(tmp_path, clock):
+    cache_file = str(tmp_path / 'markets.json')
+    exchange = FakeExchange()
+    assert Universe(exchange, cache_file=cache_file, markets_ttl=3600).markets() == MARKETS
+    assert exchange.load_calls == 1
+    assert json.load(open(cache_file))['markets'] == MARKETS
+
+    clock.value += 3599
+    exchange = FakeExchange()
+    assert Universe(exchange, cache_file=cache_file, markets_ttl=3600).markets() == MARKETS
+    assert exchange.load_calls == 0 and exchange.primed == MARKETS  # ccxt skips its own load
+
+    clock.value += 2
+    exchange = FakeExchange()
+    Universe(exchange, cache_file=cache_file, markets_ttl=3600).markets()
+    assert exchange.load_calls == 1
+
+
+def test_market_scheduler_resubscribes_the_feed_when_the_universe_changes():
+    universe = SimpleNamespace(selection=['BTC', 'ETH'])
+    universe.symbols = lambda: list(universe.selection)
+    feed = SimpleNamespace(calls=[])
+    feed.set_symbols = feed.calls.append
+    market = MarketScheduler(SimpleNamespace(), None, None, universe, feed)
+    market.schedulers.append(SimpleNamespace(symbols=lambda: [*market.universe_symbols, 'ADA']))
+
+    market.update_symbols()
+    market.update_symbols()  # unchanged: no resubscription
+    universe.selection = ['ETH', 'SOL']
+    market.update_symbols()
+    assert feed.calls == [['ADA', 'BTC', 'ETH'], ['ADA', 'ETH', 'SOL']]